@@ -1,27 +1,66 @@
 """Chat API."""
-from fastapi import APIRouter, HTTPException
+import json
+from collections.abc import AsyncIterator
 
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from backend.app.core import metrics
 from backend.app.services import chat_service
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
 
-@router.post("/chat")
-def chat(body: dict):
+def _parse_body(body: dict) -> tuple[str, str, bool, list]:
     session_id = body.get("session_id")
     message = body.get("message", "").strip()
     if not session_id or not message:
         raise HTTPException(status_code=400, detail="session_id and message are required")
-    use_rag = body.get("use_rag", False)
-    file_ids = body.get("file_ids") or []
-    try:
-        out = chat_service.chat(session_id=session_id, message=message, use_rag=use_rag, file_ids=file_ids)
-    except ValueError as e:
-        if str(e) == "session not found":
-            raise HTTPException(status_code=404, detail="session not found")
-        raise HTTPException(status_code=400, detail=str(e))
+    return session_id, message, body.get("use_rag", False), body.get("file_ids") or []
+
+
+def _raise_for(e: ValueError):
+    if str(e) == "session not found":
+        raise HTTPException(status_code=404, detail="session not found")
+    raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/chat")
+async def chat(body: dict, response: Response):
+    """Reply with a Server-Timing header breaking the turn down into db, retrieve, embed, llm, ..."""
+    session_id, message, use_rag, file_ids = _parse_body(body)
+    with metrics.request_timings() as timings:
+        try:
+            out = await chat_service.achat(session_id=session_id, message=message, use_rag=use_rag, file_ids=file_ids)
+        except ValueError as e:
+            _raise_for(e)
+    response.headers["Server-Timing"] = metrics.server_timing(timings)
     return {
         "assistant_message": out["assistant_message"],
         "citations": out["citations"],
         "token_usage": out["token_usage"],
     }
+
+
+async def _sse(events: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[str]:
+    try:
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band.
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(body: dict):
+    """Server-Sent Events: token*, citations, done (or error)."""
+    session_id, message, use_rag, file_ids = _parse_body(body)
+    try:
+        events = await chat_service.achat_stream(session_id=session_id, message=message, use_rag=use_rag, file_ids=file_ids)
+    except ValueError as e:
+        _raise_for(e)
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
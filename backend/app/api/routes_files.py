@@ -1,47 +1,114 @@
 """File upload API."""
+import asyncio
+import hashlib
 import uuid
 from pathlib import Path
+from typing import Callable
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.routing import APIRoute
 
-from backend.app.core.config import MAX_FILE_SIZE_MB, UPLOADS_DIR
+from backend.app.core.config import MAX_FILE_SIZE_MB, UPLOAD_BLOCK_SIZE, UPLOADS_DIR
 from backend.app.db import repo
-from backend.app.services import rag_service
-
-router = APIRouter(prefix="/api", tags=["files"])
+from backend.app.services import file_service, index_service
 
 MAX_BYTES = int(MAX_FILE_SIZE_MB * 1024 * 1024)
+# Multipart boundaries, part headers and the session_id field on top of the file itself.
+FORM_OVERHEAD_BYTES = 64 * 1024
 ALLOWED_SUFFIXES = {".txt", ".pdf"}
 
 
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail=f"File too large (max {MAX_FILE_SIZE_MB}MB)")
+
+
+class _SizeLimitedRoute(APIRoute):
+    """Reject a request by its Content-Length before FastAPI reads and parses the form.
+
+    FastAPI spools the whole multipart body before the endpoint runs, so a limit checked
+    in the endpoint only applies after the upload has been received. A declared length is
+    checked up front; chunked requests still fall through to the check in _save_upload.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def limited(request: Request) -> Response:
+            declared = request.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > MAX_BYTES + FORM_OVERHEAD_BYTES:
+                raise _too_large()
+            return await handler(request)
+
+        return limited
+
+
+router = APIRouter(prefix="/api", tags=["files"], route_class=_SizeLimitedRoute)
+
+
+async def _save_upload(file: UploadFile, tmp_path: Path) -> tuple[int, str]:
+    """Copy the spooled upload to tmp_path block by block; return (size, sha256 hex).
+
+    By now the body has already been received (see _SizeLimitedRoute); this enforces the
+    exact file-size limit, e.g. for chunked requests, and removes the partial copy.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while block := await file.read(UPLOAD_BLOCK_SIZE):
+                size += len(block)
+                if size > MAX_BYTES:
+                    raise _too_large()
+                digest.update(block)
+                await asyncio.to_thread(out.write, block)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
 @router.post("/files")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), session_id: str | None = Form(None)):
     if not file.filename:
         raise HTTPException(status_code=400, detail="filename required")
     safe_name = Path(file.filename).name
     suffix = Path(safe_name).suffix.lower()
     if suffix not in ALLOWED_SUFFIXES:
         raise HTTPException(status_code=400, detail="Unsupported file type. Use .txt or .pdf")
-    content = await file.read()
-    if len(content) > MAX_BYTES:
-        raise HTTPException(status_code=400, detail=f"File too large (max {MAX_FILE_SIZE_MB}MB)")
+    if session_id and not await asyncio.to_thread(repo.get_session, session_id):
+        raise HTTPException(status_code=404, detail="session not found")
     UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
-    out_path = UPLOADS_DIR / f"{uuid.uuid4().hex}_{safe_name}"
-    out_path.write_bytes(content)
+    tmp_path = UPLOADS_DIR / f"{uuid.uuid4().hex}.part"
+    size, content_hash = await _save_upload(file, tmp_path)
     try:
-        rec = repo.create_file(filename=safe_name, path=str(out_path), mime_type=file.content_type)
+        # A write transaction, a rename and a job enqueue: keep them off the event loop.
+        out = await asyncio.to_thread(
+            file_service.store_upload,
+            tmp_path,
+            filename=safe_name,
+            content_hash=content_hash,
+            size_bytes=size,
+            mime_type=file.content_type,
+            session_id=session_id or None,
+        )
     except Exception as e:
-        out_path.unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=str(e))
-    indexed = True
-    try:
-        rag_service.index_file(file_id=rec["id"], file_path=str(out_path))
-    except Exception:
-        # Keep file record and path; indexing can be retried later
-        indexed = False
+    # Parsing and embedding happen in the background; poll GET /api/files/{file_id}.
     return {
-        "file_id": rec["id"],
-        "filename": rec["filename"],
-        "status": "indexed" if indexed else "uploaded",
-        "indexed": indexed,
+        "file_id": out["file"]["id"],
+        "filename": out["file"]["filename"],
+        "status": out["status"],
+        "job_id": out["job_id"],
+        "deduplicated": out["deduplicated"],
+        "size_bytes": size,
+        "sha256": content_hash,
     }
+
+
+@router.get("/files/{file_id}")
+def get_file_status(file_id: str):
+    out = index_service.file_status(file_id)
+    if out is None:
+        raise HTTPException(status_code=404, detail="file not found")
+    return out
@@ -1,7 +1,7 @@
 """Session and history API."""
 from __future__ import annotations
 
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Query
 
 from backend.app.services import session_service
 
@@ -16,9 +16,24 @@ def create_session(body: dict | None = Body(None)):
 
 
 @router.get("/sessions")
-def list_sessions():
-    items = session_service.list_sessions()
-    return {"items": [{"session_id": s["session_id"], "title": s["title"], "created_at": s["created_at"], "updated_at": s["updated_at"]} for s in items]}
+def list_sessions(limit: int = Query(50, ge=1, le=200), cursor: str | None = None):
+    try:
+        items, next_cursor = session_service.list_sessions(limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return {
+        "items": [
+            {
+                "session_id": s["session_id"],
+                "title": s["title"],
+                "created_at": s["created_at"],
+                "updated_at": s["updated_at"],
+                "last_message_at": s["last_message_at"],
+            }
+            for s in items
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.delete("/sessions/{session_id}")
@@ -29,6 +44,18 @@ def delete_session(session_id: str):
 
 
 @router.get("/history")
-def get_history(session_id: str, limit: int = 50, before: str | None = None):
-    items = session_service.get_history(session_id=session_id, limit=limit, before=before)
-    return {"items": [{"role": i["role"], "content": i["content"], "created_at": i["created_at"]} for i in items]}
+def get_history(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    after: str | None = None,
+):
+    try:
+        page = session_service.get_history(session_id=session_id, limit=limit, cursor=cursor, after=after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return {
+        "items": [{"role": i["role"], "content": i["content"], "created_at": i["created_at"]} for i in page["items"]],
+        "next_cursor": page["next_cursor"],
+        "newest_cursor": page["newest_cursor"],
+    }
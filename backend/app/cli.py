@@ -0,0 +1,79 @@
+"""Maintenance commands: ``python -m backend.app.cli <command>``."""
+from __future__ import annotations
+
+import argparse
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from backend.app.db.database import init_db
+
+
+def _rebuild_index(args: argparse.Namespace) -> None:
+    from backend.app.services import rag_service
+
+    count = rag_service.rebuild_ann_index(nlist=args.nlist)
+    print(f"ANN index rebuilt: {count} vectors")
+
+
+def _rebuild_fts(args: argparse.Namespace) -> None:
+    from backend.app.db import repo
+
+    count = repo.rebuild_chunks_fts()
+    print(f"Full-text index rebuilt: {count} chunks")
+
+
+def _quantize(args: argparse.Namespace) -> None:
+    from backend.app.services import rag_service
+
+    count = rag_service.requantize(args.storage)
+    print(f"Embedding codes rewritten: {count} chunks")
+
+
+def _gc(args: argparse.Namespace) -> None:
+    from backend.app.services import retention_service
+
+    ttls = {"session_ttl_days": args.session_ttl_days, "file_ttl_days": args.file_ttl_days}
+    if args.dry_run:
+        for name, count in retention_service.find_garbage(**ttls).items():
+            print(f"{name}: {count}")
+        return
+    report = retention_service.collect_garbage(batch_size=args.batch_size, **ttls)
+    report.update(retention_service.compact(full=args.vacuum))
+    for name, value in report.items():
+        print(f"{name}: {value}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-index", help="rebuild the ANN index under FAISS_DIR from SQLite")
+    p.add_argument("--nlist", type=int, default=None, help="number of IVF lists (forces training)")
+    p.set_defaults(func=_rebuild_index)
+
+    p = sub.add_parser("rebuild-fts", help="re-index chunk text for hybrid retrieval (e.g. after VACUUM)")
+    p.set_defaults(func=_rebuild_fts)
+
+    p = sub.add_parser("quantize", help="re-encode chunk embedding codes after changing EMBEDDING_STORAGE")
+    p.add_argument("--storage", choices=["float32", "int8"], default=None, help="override EMBEDDING_STORAGE")
+    p.set_defaults(func=_quantize)
+
+    p = sub.add_parser("gc", help="delete expired sessions/uploads and orphans, then compact the database")
+    p.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+    p.add_argument("--session-ttl-days", type=float, default=None, help="override RETENTION_SESSION_TTL_DAYS")
+    p.add_argument("--file-ttl-days", type=float, default=None, help="override RETENTION_FILE_TTL_DAYS")
+    p.add_argument("--batch-size", type=int, default=None, help="override RETENTION_BATCH_SIZE")
+    p.add_argument("--vacuum", action="store_true", help="full VACUUM instead of an incremental one (blocks writers)")
+    p.set_defaults(func=_gc)
+
+    args = parser.parse_args(argv)
+    init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
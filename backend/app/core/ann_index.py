@@ -0,0 +1,358 @@
+"""Persistent IVF (inverted file) approximate nearest-neighbour index for chunk embeddings.
+
+Layout under the index directory (FAISS_DIR by default):
+
+    centroids.npy            coarse quantizer, (nlist, dim) float32; absent until trained
+    segments/<file_id>.npz   one segment per file: chunk ids, unit vectors, list assignment
+
+A query scores only the rows of the ``nprobe`` lists nearest to it, so work grows
+with nprobe / nlist of the corpus instead of all of it. Until the index is trained
+(ANN_MIN_TRAIN_SIZE vectors) every query is an exact in-memory scan.
+SQLite stays the source of truth: ids returned here are re-read from ``chunks``.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+from backend.app.core.config import ANN_ENABLED, ANN_MIN_TRAIN_SIZE, ANN_NLIST, ANN_NPROBE, FAISS_DIR
+from backend.app.core.vector_search import normalize, normalize_rows, top_k_indices
+
+_KMEANS_ITERS = 10
+_KMEANS_SAMPLE_PER_LIST = 64
+_ASSIGN_BATCH = 16384
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product on unit vectors) for each row."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for lo in range(0, len(vectors), _ASSIGN_BATCH):
+        out[lo:lo + _ASSIGN_BATCH] = np.argmax(vectors[lo:lo + _ASSIGN_BATCH] @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(data: np.ndarray, k: int, iters: int = _KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns (k, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _assign(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(k))
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(data[order], bounds[~empty])
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def _as_matrix(vectors: Iterable, n: int) -> np.ndarray:
+    """Copy vectors into a fresh (n, dim) float32 matrix of unit rows."""
+    mat = np.array(vectors, dtype=np.float32)
+    if n == 0:
+        return mat.reshape(0, mat.shape[-1] if mat.ndim == 2 else 0)
+    return normalize_rows(mat.reshape(n, -1))
+
+
+def _atomic_save(path: Path, **arrays: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        if len(arrays) == 1 and "array" in arrays:
+            np.save(fh, arrays["array"])
+        else:
+            np.savez(fh, **arrays)
+    os.replace(tmp, path)
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors, persisted per file, filterable by file id."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        nprobe: int | None = None,
+        nlist: int | None = None,
+        min_train_size: int | None = None,
+    ):
+        self.directory = Path(directory)
+        self.nprobe = nprobe or ANN_NPROBE
+        self.nlist = nlist if nlist is not None else ANN_NLIST
+        self.min_train_size = min_train_size if min_train_size is not None else ANN_MIN_TRAIN_SIZE
+        self._lock = threading.RLock()
+        self._stamp: tuple | None = None
+        self._reset()
+
+    # -- state --------------------------------------------------------------
+
+    def _reset(self) -> None:
+        self.dim: int | None = None
+        self._centroids: np.ndarray | None = None
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._lists = np.empty(0, dtype=np.int32)
+        self._owner = np.empty(0, dtype=np.int32)
+        self._alive = np.empty(0, dtype=bool)
+        self._ids: list[str] = []
+        self._n = 0
+        self._dead = 0
+        self._files: dict[str, tuple[int, int, int]] = {}  # file_id -> (slot, start, stop)
+        self._next_slot = 0
+        self._inverted: tuple[np.ndarray, np.ndarray] | None = None
+
+    @property
+    def _segment_dir(self) -> Path:
+        return self.directory / "segments"
+
+    @property
+    def _centroids_path(self) -> Path:
+        return self.directory / "centroids.npy"
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._n - self._dead
+
+    def _disk_stamp(self) -> tuple:
+        def mtime(p: Path) -> int:
+            try:
+                return p.stat().st_mtime_ns
+            except FileNotFoundError:
+                return 0
+        return (mtime(self._segment_dir), mtime(self._centroids_path))
+
+    def _sync(self) -> None:
+        """Reload from disk if another process changed the index since we last looked."""
+        stamp = self._disk_stamp()
+        if stamp != self._stamp:
+            self._load()
+            self._stamp = stamp
+
+    def _load(self) -> None:
+        self._reset()
+        if self._centroids_path.exists():
+            self._centroids = np.load(self._centroids_path)
+            self.dim = self._centroids.shape[1]
+        if not self._segment_dir.exists():
+            return
+        for path in sorted(self._segment_dir.glob("*.npz")):
+            with np.load(path) as seg:
+                self._append(path.stem, list(seg["ids"]), seg["vectors"], seg["lists"])
+
+    def _append(self, file_id: str, chunk_ids: list[str], vectors: np.ndarray, lists: np.ndarray) -> None:
+        n_new = len(chunk_ids)
+        if self.dim is None and n_new:
+            self.dim = vectors.shape[1]
+        need = self._n + n_new
+        dim = self.dim or 0
+        if need > len(self._alive) or self._vectors.shape[1] != dim:
+            cap = max(need, 2 * len(self._alive), 1024)
+            vec = np.empty((cap, dim), dtype=np.float32)
+            if self._vectors.shape[1] == dim:
+                vec[:self._n] = self._vectors[:self._n]
+            self._vectors = vec
+            self._lists = np.resize(self._lists, cap)
+            self._owner = np.resize(self._owner, cap)
+            alive = np.zeros(cap, dtype=bool)
+            alive[:self._n] = self._alive[:self._n]
+            self._alive = alive
+        start, stop = self._n, need
+        slot = self._next_slot
+        self._next_slot += 1
+        if n_new:
+            self._vectors[start:stop] = vectors
+            self._lists[start:stop] = lists
+            self._owner[start:stop] = slot
+            self._alive[start:stop] = True
+            self._ids.extend(str(c) for c in chunk_ids)
+        self._n = need
+        self._files[file_id] = (slot, start, stop)
+        self._inverted = None
+
+    def _drop(self, file_id: str) -> None:
+        entry = self._files.pop(file_id, None)
+        if entry is None:
+            return
+        _, start, stop = entry
+        self._alive[start:stop] = False
+        self._dead += stop - start
+        self._inverted = None
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[:self._n])
+        ids = self._ids
+        files = sorted(self._files.items(), key=lambda kv: kv[1][1])
+        vectors, lists = self._vectors[keep], self._lists[keep]
+        centroids, dim = self._centroids, self.dim
+        self._reset()
+        self._centroids, self.dim = centroids, dim
+        for file_id, (_, start, stop) in files:
+            lo, hi = np.searchsorted(keep, [start, stop])
+            self._append(file_id, ids[start:stop], vectors[lo:hi], lists[lo:hi])
+
+    def _build_inverted(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._inverted is None:
+            rows = np.flatnonzero(self._alive[:self._n])
+            order = rows[np.argsort(self._lists[rows], kind="stable")]
+            offsets = np.searchsorted(self._lists[order], np.arange(len(self._centroids) + 1))
+            self._inverted = (order, offsets)
+        return self._inverted
+
+    def _write_segment(self, file_id: str) -> None:
+        _, start, stop = self._files[file_id]
+        self._segment_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_save(
+            self._segment_dir / f"{file_id}.npz",
+            ids=np.array(self._ids[start:stop], dtype=str),
+            vectors=self._vectors[start:stop],
+            lists=self._lists[start:stop],
+        )
+
+    # -- public API -----------------------------------------------------------
+
+    def covers(self, file_ids: list[str] | None, dim: int) -> bool:
+        """True if a query of this dimension over file_ids can be answered from the index.
+
+        file_ids=None (all files) is only served once the index is trained, since
+        files indexed before the index existed are unknown to it.
+        """
+        with self._lock:
+            self._sync()
+            if self.dim is not None and self.dim != dim:
+                return False
+            if file_ids is None:
+                return self.is_trained
+            return all(f in self._files for f in file_ids)
+
+    def add(self, file_id: str, chunk_ids: list[str], vectors: Iterable) -> None:
+        """Add (or replace) all vectors of one file; trains the index once it is large enough."""
+        mat = _as_matrix(vectors, len(chunk_ids))
+        with self._lock:
+            self._sync()
+            if len(chunk_ids) and self.dim is not None and mat.shape[1] != self.dim:
+                raise ValueError(f"embedding dim {mat.shape[1]} != index dim {self.dim}; rebuild the index")
+            lists = _assign(mat, self._centroids) if self.is_trained else np.full(len(chunk_ids), -1, np.int32)
+            self._drop(file_id)
+            self._append(file_id, chunk_ids, mat, lists)
+            self._write_segment(file_id)
+            if not self.is_trained and self._n - self._dead >= self.min_train_size:
+                self.train()
+            self._stamp = self._disk_stamp()
+
+    def remove_files(self, file_ids: Iterable[str]) -> None:
+        """Drop all vectors of the given files (unknown ids are ignored)."""
+        with self._lock:
+            self._sync()
+            for fid in file_ids:
+                self._drop(fid)
+                (self._segment_dir / f"{fid}.npz").unlink(missing_ok=True)
+            if self._dead and self._dead * 2 > self._n:
+                self._compact()
+            self._stamp = self._disk_stamp()
+
+    def train(self, nlist: int | None = None) -> None:
+        """(Re)train the coarse quantizer on current vectors and reassign every segment."""
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._n])
+            if not len(rows):
+                return
+            k = nlist or self.nlist or int(4 * math.sqrt(len(rows)))
+            k = max(1, min(k, len(rows)))
+            sample_size = min(len(rows), k * _KMEANS_SAMPLE_PER_LIST)
+            sample = np.random.default_rng(0).choice(rows, size=sample_size, replace=False)
+            self._centroids = _kmeans(self._vectors[np.sort(sample)], k)
+            self._lists[rows] = _assign(self._vectors[rows], self._centroids)
+            self._inverted = None
+            for fid in self._files:
+                self._write_segment(fid)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            _atomic_save(self._centroids_path, array=self._centroids)
+            self._stamp = self._disk_stamp()
+
+    def search(
+        self,
+        query: list[float],
+        top_k: int,
+        file_ids: list[str] | None = None,
+        nprobe: int | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return [(chunk_id, cosine)] best first, optionally restricted to file_ids."""
+        q = normalize(query)
+        with self._lock:
+            self._sync()
+            if self.dim is None or q.shape[0] != self.dim:
+                return []
+            if file_ids is None:
+                slots = None
+                selected = self._n - self._dead
+            else:
+                entries = [self._files[f] for f in file_ids if f in self._files]
+                slots = np.array([e[0] for e in entries], dtype=np.int32)
+                selected = sum(e[2] - e[1] for e in entries)
+            probe = min(nprobe or self.nprobe, len(self._centroids)) if self.is_trained else 0
+            expected = (self._n - self._dead) * probe / len(self._centroids) if probe else 0
+            if not probe or (slots is not None and selected <= expected):
+                # Small selection (or untrained): exact scan of the selected files is cheaper.
+                if slots is None:
+                    rows = np.flatnonzero(self._alive[:self._n])
+                else:
+                    rows = np.concatenate(
+                        [np.arange(e[1], e[2]) for e in entries] or [np.empty(0, dtype=np.int64)]
+                    )
+            else:
+                order, offsets = self._build_inverted()
+                lists = top_k_indices(self._centroids @ q, probe)
+                rows = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in lists])
+                if slots is not None:
+                    rows = rows[np.isin(self._owner[rows], slots)]
+            scores = self._vectors[rows] @ q
+            best = top_k_indices(scores, top_k)
+            return [(self._ids[rows[i]], float(scores[i])) for i in best]
+
+    def rebuild(self, records: Iterable[tuple[str, list[str], np.ndarray]], nlist: int | None = None) -> int:
+        """Replace the whole index with records of (file_id, chunk_ids, vectors); returns vector count.
+
+        Trains when the corpus reaches min_train_size, or whenever nlist is given.
+        """
+        with self._lock:
+            for path in self._segment_dir.glob("*.npz") if self._segment_dir.exists() else []:
+                path.unlink()
+            self._centroids_path.unlink(missing_ok=True)
+            self._reset()
+            for file_id, chunk_ids, vectors in records:
+                mat = _as_matrix(vectors, len(chunk_ids))
+                if len(chunk_ids) and self.dim is not None and mat.shape[1] != self.dim:
+                    continue
+                self._append(file_id, chunk_ids, mat, np.full(len(chunk_ids), -1, np.int32))
+                self._write_segment(file_id)
+            count = self._n
+            if count and (nlist or count >= self.min_train_size):
+                self.train(nlist)
+            self._stamp = self._disk_stamp()
+            return count
+
+
+_default_index: IVFIndex | None = None
+
+
+def get_ann_index() -> IVFIndex | None:
+    """Process-wide index under FAISS_DIR, or None when ANN_ENABLED is off."""
+    global _default_index
+    if _default_index is None and ANN_ENABLED:
+        _default_index = IVFIndex(FAISS_DIR)
+    return _default_index
+
+
+def set_ann_index(index: IVFIndex | None) -> None:
+    global _default_index
+    _default_index = index
@@ -1,24 +1,109 @@
 """Text chunking for RAG."""
 from __future__ import annotations
 
-from backend.app.core.config import CHUNK_SIZE, CHUNK_OVERLAP
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from backend.app.core.config import CHUNK_OVERLAP, CHUNK_SIZE, CHUNK_TOLERANCE
+
+# A sentence ends after CJK/Latin terminators (plus closing quotes), a Latin period
+# followed by whitespace, or a line break.
+_SENTENCE_END = re.compile(r"[。！？!?]+[”’」』）)\"']*|\.(?=\s)[”’)\"']*|\n+")
+
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    start: int  # offset of text[0] in the concatenated source
+    end: int  # offset just past text[-1]
 
 
 def chunk_text(text: str, chunk_size: int | None = None, overlap: int | None = None) -> list[str]:
     """Split text into overlapping chunks. Defaults from config."""
+    return list(chunk_stream([text], chunk_size=chunk_size, overlap=overlap))
+
+
+def chunk_stream(
+    segments: Iterable[str],
+    chunk_size: int | None = None,
+    overlap: int | None = None,
+) -> Iterator[str]:
+    """iter_chunks() without offsets: just the chunk texts."""
+    for chunk in iter_chunks(segments, chunk_size=chunk_size, overlap=overlap):
+        yield chunk.text
+
+
+def iter_chunks(
+    segments: Iterable[str],
+    chunk_size: int | None = None,
+    overlap: int | None = None,
+    tolerance: float | None = None,
+) -> Iterator[Chunk]:
+    """Chunk the concatenation of segments lazily, preferring to cut at sentence ends.
+
+    A chunk is at most chunk_size characters. It ends at the last sentence end within
+    the final tolerance * chunk_size characters, else at exactly chunk_size. The next
+    chunk re-reads about overlap characters, starting at a sentence start when one falls
+    inside the overlap. Output does not depend on how the text is split into segments,
+    and only the unchunked tail of the text is buffered.
+    """
     size = chunk_size or CHUNK_SIZE
     overlap = overlap if overlap is not None else CHUNK_OVERLAP
-    if not text or not text.strip():
-        return []
-    text = text.strip()
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + size
-        chunk = text[start:end]
-        if chunk.strip():
-            chunks.append(chunk.strip())
-        start = end - overlap
-        if start >= len(text):
+    slack = int(size * (tolerance if tolerance is not None else CHUNK_TOLERANCE))
+    buf = ""
+    base = 0  # source offset of buf[0]
+    for seg in segments:
+        buf += seg
+        # Text is settled up to the last non-space character; trailing space may end the document.
+        end = len(buf.rstrip())
+        pos = 0
+        while pos + size < end:
+            cut = _cut(buf, pos, size, slack)
+            chunk = _make_chunk(buf, pos, cut, base)
+            if chunk is not None:
+                yield chunk
+            pos = _next_start(buf, pos, cut, overlap)
+        if pos:
+            buf = buf[pos:]
+            base += pos
+    tail = buf.rstrip()
+    pos = 0
+    while pos < len(tail):
+        cut = _cut(tail, pos, size, slack) if pos + size < len(tail) else len(tail)
+        chunk = _make_chunk(tail, pos, cut, base)
+        if chunk is not None:
+            yield chunk
+        if cut == len(tail):
+            break
+        pos = _next_start(tail, pos, cut, overlap)
+
+
+def _cut(buf: str, pos: int, size: int, slack: int) -> int:
+    """End of the chunk starting at pos: the last sentence end in (limit - slack, limit], else limit."""
+    limit = pos + size
+    cut = limit
+    for m in _SENTENCE_END.finditer(buf, max(pos + 1, limit - slack), limit + 1):
+        if m.end() > limit:
             break
-    return chunks
+        cut = m.end()
+    return cut
+
+
+def _next_start(buf: str, pos: int, cut: int, overlap: int) -> int:
+    """Start of the chunk after [pos, cut): overlap characters back, moved to a sentence start if possible."""
+    start = max(cut - overlap, pos + 1)
+    if overlap > 0:
+        m = _SENTENCE_END.search(buf, start, min(cut + 1, len(buf)))
+        if m is not None and m.end() < cut:
+            start = m.end()
+    return start if start > pos else cut
+
+
+def _make_chunk(buf: str, pos: int, cut: int, base: int) -> Chunk | None:
+    raw = buf[pos:cut]
+    text = raw.strip()
+    if not text:
+        return None
+    start = base + pos + (len(raw) - len(raw.lstrip()))
+    return Chunk(text=text, start=start, end=start + len(text))
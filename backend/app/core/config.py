@@ -20,6 +20,15 @@ if DATABASE_URL.startswith("sqlite:///"):
 else:
     DATABASE_PATH = PROJECT_ROOT / "data" / "chat.db"
 
+# SQLite connection pool and per-connection pragmas
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30.0"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+
 UPLOADS_DIR = DATA_DIR / "uploads"
 FAISS_DIR = DATA_DIR / "faiss"
 
@@ -27,12 +36,67 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
 LLM_API_KEY = os.getenv("LLM_API_KEY", "")
 LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
 LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60.0"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))  # per provider client
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
 
 EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", LLM_PROVIDER)
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))  # texts per batch request
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))  # batch requests in flight
+# Embedding cache keyed by (provider, model, dim, sha256(text)): in-process LRU + SQLite table
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "500000"))
+# A persistent hit refreshes the row's LRU timestamp at most this often (seconds)
+EMBEDDING_CACHE_TOUCH_SECONDS = float(os.getenv("EMBEDDING_CACHE_TOUCH_SECONDS", "3600"))
+# "int8" also stores a compact code per chunk: queries scan the codes, then rescore the best
+# RAG_RESCORE_FACTOR * top_k against the float32 embedding. "float32" scans embeddings only.
+# Only applies with ANN_ENABLED=0: the ANN index answers vector queries otherwise.
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32").lower()
+RAG_RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "8"))
 
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+# Prompt size budget (estimated tokens); history and retrieved context are trimmed to fit.
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "6000"))
+PROMPT_CONTEXT_SHARE = float(os.getenv("PROMPT_CONTEXT_SHARE", "0.6"))  # context's first claim on the budget
+# "vector" is cosine only; "hybrid" (opt-in) fuses FTS5 BM25 and cosine rankings by reciprocal rank fusion.
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "vector").lower()
+RAG_FTS_CANDIDATES = int(os.getenv("RAG_FTS_CANDIDATES", "200"))  # BM25 hits considered per query
+# Score only the full-text candidates by cosine (once there are at least top_k) instead of every chunk.
+RAG_FTS_PREFILTER = os.getenv("RAG_FTS_PREFILTER", "0").lower() not in ("0", "false", "no")
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))  # damping constant of reciprocal rank fusion
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "256"))  # cached retrieval results; 0 disables
+RAG_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "300"))  # seconds; bounds staleness across workers
+# Approximate nearest-neighbour (IVF) index under FAISS_DIR; exact scan until ANN_MIN_TRAIN_SIZE vectors exist.
+ANN_ENABLED = os.getenv("ANN_ENABLED", "1").lower() not in ("0", "false", "no")
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # 0 = auto (about 4 * sqrt(n))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))  # lists scanned per query: higher = better recall, slower
+ANN_MIN_TRAIN_SIZE = int(os.getenv("ANN_MIN_TRAIN_SIZE", "20000"))
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+# Fraction of CHUNK_SIZE a chunk may come up short so that it ends on a sentence boundary.
+CHUNK_TOLERANCE = float(os.getenv("CHUNK_TOLERANCE", "0.2"))
+# PDF text extraction: large PDFs can be split by page range across worker processes.
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", "0"))  # 0/1 = extract serially in-process
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
 MAX_FILE_SIZE_MB = float(os.getenv("MAX_FILE_SIZE_MB", "5.0"))
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", str(1024 * 1024)))  # bytes read/written per step
+# Background indexing: uploads enqueue a job; worker threads parse, chunk and embed.
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "2"))  # 0 = no in-process workers
+INDEX_MAX_ATTEMPTS = int(os.getenv("INDEX_MAX_ATTEMPTS", "3"))
+INDEX_RETRY_BASE_SECONDS = float(os.getenv("INDEX_RETRY_BASE_SECONDS", "5"))  # doubled on each retry
+INDEX_POLL_INTERVAL = float(os.getenv("INDEX_POLL_INTERVAL", "2.0"))  # idle worker wake-up, seconds
+# A running job's lease: its worker renews it while indexing; an expired lease means the
+# owning process died and the job is queued again (by any process sharing the database).
+INDEX_LEASE_SECONDS = float(os.getenv("INDEX_LEASE_SECONDS", "300"))
+# Prometheus-format histograms at /metrics and Server-Timing on /api/chat.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+# Retention / garbage collection (background thread and `python -m backend.app.cli gc`).
+RETENTION_SESSION_TTL_DAYS = float(os.getenv("RETENTION_SESSION_TTL_DAYS", "0"))  # idle sessions; 0 = keep
+RETENTION_FILE_TTL_DAYS = float(os.getenv("RETENTION_FILE_TTL_DAYS", "0"))  # session-less uploads; 0 = keep
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))  # rows per delete transaction
+RETENTION_ORPHAN_GRACE_SECONDS = float(os.getenv("RETENTION_ORPHAN_GRACE_SECONDS", "3600"))  # spares in-flight uploads
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "5000"))  # free pages released per run
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))  # 0 = no background runs
@@ -0,0 +1,143 @@
+"""Two-tier embedding cache: in-process LRU in front of the SQLite ``embedding_cache`` table.
+
+Keys are (namespace, sha256(text)), where the namespace names provider, model and
+dimension, so vectors from different embedders never mix.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from backend.app.core.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ROWS,
+    EMBEDDING_CACHE_MEMORY_ITEMS,
+    EMBEDDING_CACHE_TOUCH_SECONDS,
+)
+from backend.app.core.embeddings import bytes_to_embedding, embedding_to_bytes
+from backend.app.db import repo
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """LRU memory tier plus a size-bounded persistent tier, with hit/miss counters."""
+
+    def __init__(
+        self,
+        memory_items: int | None = None,
+        max_rows: int | None = None,
+        persistent: bool = True,
+        touch_interval: float | None = None,
+    ):
+        self.memory_items = memory_items if memory_items is not None else EMBEDDING_CACHE_MEMORY_ITEMS
+        self.max_rows = max_rows if max_rows is not None else EMBEDDING_CACHE_MAX_ROWS
+        self.persistent = persistent
+        self.touch_interval = touch_interval if touch_interval is not None else EMBEDDING_CACHE_TOUCH_SECONDS
+        self._memory: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._rows: int | None = None  # approximate persistent row count
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.persistent_evictions = 0
+
+    def get_many(self, namespace: str, texts: list[str]) -> list[list[float] | None]:
+        """Cached vector for each text, or None where it is not cached."""
+        hashes = [text_hash(t) for t in texts]
+        found: dict[str, bytes] = {}
+        with self._lock:
+            for h in hashes:
+                blob = self._memory.get((namespace, h))
+                if blob is not None:
+                    self._memory.move_to_end((namespace, h))
+                    found[h] = blob
+        memory_hits = sum(1 for h in hashes if h in found)
+        persistent_hits = 0
+        missing = [h for h in dict.fromkeys(hashes) if h not in found]
+        if missing and self.persistent:
+            try:
+                stored = repo.get_cached_embeddings(namespace, missing, self.touch_interval)
+            except sqlite3.Error:
+                logger.exception("embedding cache read failed")
+                stored = {}
+            persistent_hits = sum(1 for h in hashes if h in stored)
+            self._remember(namespace, stored.items())
+            found.update(stored)
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.persistent_hits += persistent_hits
+            self.misses += len(hashes) - memory_hits - persistent_hits
+        return [bytes_to_embedding(found[h]) if h in found else None for h in hashes]
+
+    def put_many(self, namespace: str, texts: list[str], vectors: list[list[float]]) -> None:
+        items = [(text_hash(t), embedding_to_bytes(v)) for t, v in zip(texts, vectors)]
+        self._remember(namespace, items)
+        if not self.persistent or not items:
+            return
+        try:
+            repo.put_cached_embeddings(namespace, items)
+            self._evict_persistent(len(items))
+        except sqlite3.Error:
+            logger.exception("embedding cache write failed")
+
+    def _remember(self, namespace: str, items) -> None:
+        with self._lock:
+            for h, blob in items:
+                self._memory[(namespace, h)] = blob
+                self._memory.move_to_end((namespace, h))
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+                self.memory_evictions += 1
+
+    def _evict_persistent(self, added: int) -> None:
+        if self._rows is None:
+            self._rows = repo.count_cached_embeddings()
+        else:
+            self._rows += added
+        if self._rows > self.max_rows:
+            # Evict down to 90% so eviction runs once per many inserts, not on every one.
+            excess = self._rows - int(self.max_rows * 0.9)
+            self.persistent_evictions += repo.evict_cached_embeddings(excess)
+            self._rows = repo.count_cached_embeddings()
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.persistent_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_items": len(self._memory),
+            "memory_evictions": self.memory_evictions,
+            "persistent_evictions": self.persistent_evictions,
+        }
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+
+_default_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Process-wide cache, or None when EMBEDDING_CACHE_ENABLED is off."""
+    global _default_cache
+    if _default_cache is None and EMBEDDING_CACHE_ENABLED:
+        _default_cache = EmbeddingCache()
+    return _default_cache
+
+
+def set_embedding_cache(cache: EmbeddingCache | None) -> None:
+    global _default_cache
+    _default_cache = cache
@@ -1,16 +1,24 @@
 """Embedding interface and implementations for RAG."""
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import struct
-import httpx
+import numpy as np
 from backend.app.core.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
     EMBEDDING_DIM,
     EMBEDDING_MODEL,
     EMBEDDING_PROVIDER,
+    GEMINI_BASE_URL,
     LLM_API_KEY,
     LLM_TIMEOUT,
 )
+from backend.app.core import metrics
+from backend.app.core.http_clients import get_async_client, get_client
+from backend.app.core.vector_search import normalize_rows
 
 
 def embedding_to_bytes(vec: list[float]) -> bytes:
@@ -25,18 +33,86 @@ def bytes_to_embedding(b: bytes) -> list[float]:
 
 
 class BaseEmbedding(ABC):
-    @abstractmethod
+    """Embedding provider. Subclasses implement _embed_batch; lookups go through the embedding cache."""
+
+    provider: str = ""
+    model: str = ""
+    dim: int = 0
+    use_cache: bool = True
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.provider}:{self.model}:{self.dim}"
+
     def embed(self, text: str) -> list[float]:
-        pass
+        return self.embed_batch([text])[0]
 
-    @abstractmethod
     def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        with metrics.stage("embed"):
+            return self._cached_embed_batch(texts)
+
+    def _cached_embed_batch(self, texts: list[str]) -> list[list[float]]:
+        from backend.app.core.embedding_cache import get_embedding_cache
+
+        cache = get_embedding_cache() if self.use_cache else None
+        if cache is None:
+            metrics.EMBEDDING_TEXTS.observe(len(texts))
+            return self._embed_batch(texts)
+        results = cache.get_many(self.cache_namespace, texts)
+        todo = list(dict.fromkeys(t for t, vec in zip(texts, results) if vec is None))
+        if todo:
+            metrics.EMBEDDING_TEXTS.observe(len(todo))
+            computed = dict(zip(todo, self._embed_batch(todo)))
+            cache.put_many(self.cache_namespace, todo, [computed[t] for t in todo])
+            results = [vec if vec is not None else computed[t] for t, vec in zip(texts, results)]
+        return results
+
+    async def aembed(self, text: str) -> list[float]:
+        return (await self.aembed_batch([text]))[0]
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Async embed_batch(); cache lookups run in a worker thread, provider calls natively."""
+        if not texts:
+            return []
+        with metrics.stage("embed"):
+            return await self._acached_embed_batch(texts)
+
+    async def _acached_embed_batch(self, texts: list[str]) -> list[list[float]]:
+        from backend.app.core.embedding_cache import get_embedding_cache
+
+        cache = get_embedding_cache() if self.use_cache else None
+        if cache is None:
+            metrics.EMBEDDING_TEXTS.observe(len(texts))
+            return await self._aembed_batch(texts)
+        results = await asyncio.to_thread(cache.get_many, self.cache_namespace, texts)
+        todo = list(dict.fromkeys(t for t, vec in zip(texts, results) if vec is None))
+        if todo:
+            metrics.EMBEDDING_TEXTS.observe(len(todo))
+            computed = dict(zip(todo, await self._aembed_batch(todo)))
+            await asyncio.to_thread(cache.put_many, self.cache_namespace, todo, [computed[t] for t in todo])
+            results = [vec if vec is not None else computed[t] for t, vec in zip(texts, results)]
+        return results
+
+    @abstractmethod
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the provider, bypassing the cache."""
         pass
 
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Async _embed_batch(). Default: run it in a worker thread."""
+        return await asyncio.to_thread(self._embed_batch, texts)
+
 
 class MockEmbedding(BaseEmbedding):
     """Deterministic fake embedding for tests."""
 
+    provider = "mock"
+    model = "mock"
+    # Cheap to compute, and hash() is salted per process, so never persist these.
+    use_cache = False
+
     def __init__(self, dim: int = 8):
         self.dim = dim
 
@@ -45,36 +121,144 @@ class MockEmbedding(BaseEmbedding):
         h = hash(text) % (2 ** 31)
         return [float((h + i) % 100) / 100.0 for i in range(self.dim)]
 
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
         return [self.embed(t) for t in texts]
 
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        return self._embed_batch(texts)
+
+
+class LocalEmbedding(BaseEmbedding):
+    """Offline embedding from hashed character n-grams; no network, model files or API key.
+
+    Every 1-, 2- and 3-character n-gram of the lower-cased text is hashed to one of dim
+    buckets with a pseudo-random sign (feature hashing, a sparse random projection), and
+    the log-damped counts are L2-normalized. The hash is fixed integer arithmetic on code
+    points, so a text gets the same vector in every process, on every machine. Texts that
+    share words or CJK phrases score high; synonyms do not.
+    """
+
+    provider = "local"
+    model = "char-ngram-hash-v1"
+    # Computing a vector is cheaper than a cache lookup.
+    use_cache = False
+
+    NGRAMS = (1, 2, 3)
+    _PRIME = np.uint64(0x100000001B3)
+
+    def __init__(self, dim: int | None = None):
+        self.dim = dim or EMBEDDING_DIM
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_matrix(self, texts: list[str]) -> np.ndarray:
+        """(len(texts), dim) float32 unit rows; the whole batch is hashed in a few array passes."""
+        n = len(texts)
+        # NUL separates texts; n-grams spanning a separator are dropped below.
+        joined = "\0".join(" ".join(t.replace("\0", " ").lower().split()) for t in texts)
+        points = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        doc = np.cumsum(points == 0)  # text index of each position
+        seps_before = np.concatenate(([0], doc))  # separators in points[:i]
+        buckets, signs, docs = [], [], []
+        for size in self.NGRAMS:
+            count = len(points) - size + 1
+            if count <= 0:
+                continue
+            h = np.full(count, size, dtype=np.uint64)
+            for j in range(size):
+                h = h * self._PRIME + points[j:j + count]
+            keep = seps_before[size:size + count] == seps_before[:count]
+            h = h[keep]
+            # splitmix64 finalizer: spreads similar n-grams across buckets and sign bits.
+            h ^= h >> np.uint64(30)
+            h *= np.uint64(0xBF58476D1CE4E5B9)
+            h ^= h >> np.uint64(27)
+            h *= np.uint64(0x94D049BB133111EB)
+            h ^= h >> np.uint64(31)
+            buckets.append((h % np.uint64(self.dim)).astype(np.int64))
+            signs.append(np.where(h >> np.uint64(63), -1.0, 1.0))
+            docs.append(doc[:count][keep])
+        if not buckets:
+            return np.zeros((n, self.dim), dtype=np.float32)
+        flat = np.concatenate(docs) * self.dim + np.concatenate(buckets)
+        counts = np.bincount(flat, weights=np.concatenate(signs), minlength=n * self.dim)
+        mat = (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32).reshape(n, self.dim)
+        return normalize_rows(mat)
+
 
 class GeminiEmbedding(BaseEmbedding):
-    """Gemini embedding API (text-embedding-004)."""
+    """Gemini embedding API (text-embedding-004) via batchEmbedContents on a pooled client."""
 
-    def __init__(self, api_key: str | None = None, model: str | None = None, timeout: float | None = None):
+    provider = "gemini"
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str | None = None,
+        timeout: float | None = None,
+        base_url: str | None = None,
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+    ):
         self.api_key = api_key or LLM_API_KEY
         self.model = model or EMBEDDING_MODEL
+        self.dim = EMBEDDING_DIM
         self.timeout = timeout or LLM_TIMEOUT
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+        self.base_url = (base_url or GEMINI_BASE_URL).rstrip("/")
+        self.batch_size = max(1, batch_size or EMBEDDING_BATCH_SIZE)
+        self.concurrency = max(1, concurrency or EMBEDDING_CONCURRENCY)
+        # Batches run on these threads over the shared "gemini" client, so at most
+        # `concurrency` requests (and connections) are in flight per instance.
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="gemini-embed")
 
-    def embed(self, text: str) -> list[float]:
-        return self.embed_batch([text])[0]
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.concurrency == 1:
+            results = [self._embed_request(b) for b in batches]
+        else:
+            results = list(self._pool.map(self._embed_request, batches))
+        return [vec for batch in results for vec in batch]
 
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        if not texts:
-            return []
-        url = f"{self.base_url}/models/{self.model}:embedContent?key={self.api_key}"
-        results = []
-        for text in texts:
-            payload = {"model": f"models/{self.model}", "content": {"parts": [{"text": text}]}}
-            with httpx.Client(timeout=self.timeout) as client:
-                resp = client.post(url, json=payload)
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: list[str]) -> list[list[float]]:
+            async with limit:
+                url, params, payload = self._batch_request(batch)
+                resp = await get_async_client("gemini").post(url, params=params, json=payload, timeout=self.timeout)
                 resp.raise_for_status()
-                data = resp.json()
-            vec = data.get("embedding", {}).get("values", [])
-            results.append([float(x) for x in vec])
-        return results
+                return self._parse_batch(resp.json(), batch)
+
+        results = await asyncio.gather(*(run(b) for b in batches))
+        return [vec for batch in results for vec in batch]
+
+    def _batch_request(self, texts: list[str]) -> tuple[str, dict, dict]:
+        url = f"{self.base_url}/models/{self.model}:batchEmbedContents"
+        payload = {
+            "requests": [
+                {"model": f"models/{self.model}", "content": {"parts": [{"text": t}]}} for t in texts
+            ]
+        }
+        return url, {"key": self.api_key}, payload
+
+    @staticmethod
+    def _parse_batch(data: dict, texts: list[str]) -> list[list[float]]:
+        embeddings = data.get("embeddings", [])
+        if len(embeddings) != len(texts):
+            raise RuntimeError(f"batchEmbedContents returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return [[float(x) for x in e.get("values", [])] for e in embeddings]
+
+    def _embed_request(self, texts: list[str]) -> list[list[float]]:
+        url, params, payload = self._batch_request(texts)
+        resp = get_client("gemini").post(url, params=params, json=payload, timeout=self.timeout)
+        resp.raise_for_status()
+        return self._parse_batch(resp.json(), texts)
+
+    def close(self) -> None:
+        """Stop the batch threads; the shared HTTP client is closed with the app."""
+        self._pool.shutdown()
 
 
 _default_embedding: BaseEmbedding | None = None
@@ -83,12 +267,14 @@ _default_embedding: BaseEmbedding | None = None
 def get_embedding() -> BaseEmbedding:
     global _default_embedding
     if _default_embedding is None:
-        if not LLM_API_KEY or EMBEDDING_PROVIDER.lower() in ("mock", ""):
+        provider = EMBEDDING_PROVIDER.lower()
+        if provider == "mock":
             _default_embedding = MockEmbedding(dim=EMBEDDING_DIM)
-        elif EMBEDDING_PROVIDER.lower() == "gemini":
+        elif provider == "gemini" and LLM_API_KEY:
             _default_embedding = GeminiEmbedding()
         else:
-            _default_embedding = MockEmbedding(dim=EMBEDDING_DIM)
+            # "local", providers without an embedding API, or no key: embed offline.
+            _default_embedding = LocalEmbedding()
     return _default_embedding
 
 
@@ -0,0 +1,66 @@
+"""Shared, long-lived httpx clients for provider APIs (keep-alive; HTTP/2 when h2 is installed)."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+from backend.app.core.config import HTTP_MAX_CONNECTIONS, LLM_TIMEOUT
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients: dict[str, httpx.Client] = {}
+_clients_lock = threading.Lock()
+# Async clients are bound to the event loop that created their connections.
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+
+
+def get_client(name: str) -> httpx.Client:
+    """Process-wide sync client for one provider (pass per-request timeouts to override)."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = httpx.Client(timeout=LLM_TIMEOUT, limits=_limits())
+                _clients[name] = client
+    return client
+
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+    """Async client for one provider on the running event loop."""
+    loop = asyncio.get_running_loop()
+    per_loop = _async_clients.setdefault(loop, {})
+    client = per_loop.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=LLM_TIMEOUT, limits=_limits(), http2=HTTP2_AVAILABLE)
+        per_loop[name] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    """Close the running loop's async clients and all sync clients (app shutdown)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        for client in _async_clients.pop(loop, {}).values():
+            await client.aclose()
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,39 @@
+"""Lexical side of hybrid retrieval: FTS5 query building and reciprocal rank fusion."""
+from __future__ import annotations
+
+import re
+from collections.abc import Hashable, Sequence
+
+# Identifier-like runs (error codes, versions, snake_case) and runs of CJK characters.
+_WORD = re.compile(r"[0-9A-Za-z_][0-9A-Za-z_.\-]*[0-9A-Za-z_]|[0-9A-Za-z_]")
+_CJK_RUN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+# The trigram tokenizer cannot match anything shorter than three characters.
+_MIN_TERM_CHARS = 3
+
+
+def fts_query(text: str, max_terms: int = 32) -> str | None:
+    """FTS5 MATCH expression ORing the searchable terms of text, or None if it has none.
+
+    Words are matched as quoted substrings; CJK runs, which have no spaces to split on,
+    contribute each of their overlapping trigrams so partial phrase overlap still scores.
+    """
+    terms: list[str] = []
+    for word in _WORD.findall(text):
+        if len(word) >= _MIN_TERM_CHARS:
+            terms.append(word.lower())
+    for run in _CJK_RUN.findall(text):
+        terms.extend(run[i:i + _MIN_TERM_CHARS] for i in range(len(run) - _MIN_TERM_CHARS + 1))
+    terms = list(dict.fromkeys(terms))[:max_terms]
+    if not terms:
+        return None
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> list[Hashable]:
+    """Merge best-first rankings by summed 1 / (k + rank); ties keep first-seen order."""
+    scores: dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
@@ -1,10 +1,14 @@
 """LLM client interface and provider implementations."""
 from __future__ import annotations
 
+import asyncio
+import json
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
 from dataclasses import dataclass
 
 from backend.app.core.config import LLM_API_KEY, LLM_MODEL, LLM_PROVIDER, LLM_TIMEOUT
+from backend.app.core.prompt_builder import flatten_messages
 
 
 @dataclass
@@ -13,6 +17,49 @@ class LLMResponse:
     content: str
     prompt_tokens: int = 0
     completion_tokens: int = 0
+    cached_tokens: int = 0  # prompt tokens served from the provider's prefix/context cache
+
+
+@dataclass
+class LLMStreamChunk:
+    """Piece of a streamed response. Token counts are set once the provider reports them."""
+    delta: str = ""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+
+_SSE_DONE = object()
+
+
+def _sse_payload(line: str):
+    """JSON payload of one SSE line, None for non-data lines, _SSE_DONE for ``data: [DONE]``."""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return _SSE_DONE
+    return json.loads(data) if data else None
+
+
+def iter_sse_json(lines: Iterable[str]) -> Iterator[dict]:
+    """Decode the JSON payloads of a Server-Sent Events body; stops at ``data: [DONE]``."""
+    for line in lines:
+        payload = _sse_payload(line)
+        if payload is _SSE_DONE:
+            return
+        if payload is not None:
+            yield payload
+
+
+async def aiter_sse_json(lines: AsyncIterable[str]) -> AsyncIterator[dict]:
+    """Async counterpart of iter_sse_json."""
+    async for line in lines:
+        payload = _sse_payload(line)
+        if payload is _SSE_DONE:
+            return
+        if payload is not None:
+            yield payload
 
 
 class BaseLLMClient(ABC):
@@ -23,6 +70,44 @@ class BaseLLMClient(ABC):
         """Send prompt and return response."""
         pass
 
+    def stream(self, prompt: str) -> Iterator[LLMStreamChunk]:
+        """Yield the response incrementally. Default: one chunk from complete()."""
+        resp = self.complete(prompt)
+        yield LLMStreamChunk(
+            delta=resp.content,
+            prompt_tokens=resp.prompt_tokens,
+            completion_tokens=resp.completion_tokens,
+            cached_tokens=resp.cached_tokens,
+        )
+
+    async def acomplete(self, prompt: str) -> LLMResponse:
+        """Async complete(). Default: run complete() in a worker thread."""
+        return await asyncio.to_thread(self.complete, prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[LLMStreamChunk]:
+        """Async stream(). Default: one chunk from acomplete()."""
+        resp = await self.acomplete(prompt)
+        yield LLMStreamChunk(
+            delta=resp.content,
+            prompt_tokens=resp.prompt_tokens,
+            completion_tokens=resp.completion_tokens,
+            cached_tokens=resp.cached_tokens,
+        )
+
+    # Multi-turn API: messages are {"role": "system" | "user" | "assistant", "content": str}.
+    # Defaults flatten them into one prompt for clients that only implement the methods above.
+    def chat(self, messages: list[dict]) -> LLMResponse:
+        return self.complete(flatten_messages(messages))
+
+    def chat_stream(self, messages: list[dict]) -> Iterator[LLMStreamChunk]:
+        return self.stream(flatten_messages(messages))
+
+    async def achat(self, messages: list[dict]) -> LLMResponse:
+        return await self.acomplete(flatten_messages(messages))
+
+    def achat_stream(self, messages: list[dict]) -> AsyncIterator[LLMStreamChunk]:
+        return self.astream(flatten_messages(messages))
+
 
 class MockLLMClient(BaseLLMClient):
     """Fixed response for tests."""
@@ -39,6 +124,19 @@ class MockLLMClient(BaseLLMClient):
             completion_tokens=self.completion_tokens,
         )
 
+    def stream(self, prompt: str) -> Iterator[LLMStreamChunk]:
+        words = self.fixed_response.split(" ")
+        for i, word in enumerate(words):
+            yield LLMStreamChunk(delta=word if i == 0 else " " + word)
+        yield LLMStreamChunk(prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens)
+
+    async def acomplete(self, prompt: str) -> LLMResponse:
+        return self.complete(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[LLMStreamChunk]:
+        for chunk in self.stream(prompt):
+            yield chunk
+
 
 def _get_llm_client() -> BaseLLMClient:
     """Return concrete client based on LLM_PROVIDER."""
@@ -1,13 +1,21 @@
 """DeepSeek API LLM client."""
 from __future__ import annotations
 
-import httpx
+from collections.abc import AsyncIterator, Iterator
+
 from backend.app.core.config import LLM_API_KEY, LLM_MODEL, LLM_TIMEOUT
-from backend.app.core.llm_client import BaseLLMClient, LLMResponse
+from backend.app.core.http_clients import get_async_client, get_client
+from backend.app.core.llm_client import (
+    BaseLLMClient,
+    LLMResponse,
+    LLMStreamChunk,
+    aiter_sse_json,
+    iter_sse_json,
+)
 
 
 class DeepSeekLLMClient(BaseLLMClient):
-    """DeepSeek API completion client."""
+    """DeepSeek chat completions client (role-tagged messages) on shared keep-alive HTTP clients."""
 
     def __init__(self, api_key: str | None = None, model: str | None = None, timeout: float | None = None):
         self.api_key = api_key or LLM_API_KEY
@@ -15,29 +23,106 @@ class DeepSeekLLMClient(BaseLLMClient):
         self.timeout = timeout or LLM_TIMEOUT
         self.base_url = "https://api.deepseek.com/v1"
 
-    def complete(self, prompt: str) -> LLMResponse:
-        url = f"{self.base_url}/chat/completions"
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+    @property
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _payload(self, messages: list[dict], stream: bool = False) -> dict:
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": [{"role": m["role"], "content": m["content"]} for m in messages],
             "max_tokens": 2048,
         }
-        with httpx.Client(timeout=self.timeout) as client:
-            resp = client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-        text = ""
-        usage = {"prompt_tokens": 0, "completion_tokens": 0}
-        if "choices" in data and data["choices"]:
-            text = data["choices"][0].get("message", {}).get("content", "")
-        if "usage" in data:
-            usage = {
-                "prompt_tokens": data["usage"].get("prompt_tokens", 0),
-                "completion_tokens": data["usage"].get("completion_tokens", 0),
-            }
-        return LLMResponse(
-            content=text,
-            prompt_tokens=usage.get("prompt_tokens", 0),
-            completion_tokens=usage.get("completion_tokens", 0),
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def complete(self, prompt: str) -> LLMResponse:
+        return self.chat([{"role": "user", "content": prompt}])
+
+    async def acomplete(self, prompt: str) -> LLMResponse:
+        return await self.achat([{"role": "user", "content": prompt}])
+
+    def stream(self, prompt: str) -> Iterator[LLMStreamChunk]:
+        return self.chat_stream([{"role": "user", "content": prompt}])
+
+    def astream(self, prompt: str) -> AsyncIterator[LLMStreamChunk]:
+        return self.achat_stream([{"role": "user", "content": prompt}])
+
+    def chat(self, messages: list[dict]) -> LLMResponse:
+        resp = get_client("deepseek").post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(messages),
+            headers=self._headers,
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return _parse_response(resp.json())
+
+    async def achat(self, messages: list[dict]) -> LLMResponse:
+        resp = await get_async_client("deepseek").post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(messages),
+            headers=self._headers,
+            timeout=self.timeout,
         )
+        resp.raise_for_status()
+        return _parse_response(resp.json())
+
+    def chat_stream(self, messages: list[dict]) -> Iterator[LLMStreamChunk]:
+        with get_client("deepseek").stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json=self._payload(messages, stream=True),
+            headers=self._headers,
+            timeout=self.timeout,
+        ) as resp:
+            resp.raise_for_status()
+            for data in iter_sse_json(resp.iter_lines()):
+                yield _parse_chunk(data)
+
+    async def achat_stream(self, messages: list[dict]) -> AsyncIterator[LLMStreamChunk]:
+        async with get_async_client("deepseek").stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json=self._payload(messages, stream=True),
+            headers=self._headers,
+            timeout=self.timeout,
+        ) as resp:
+            resp.raise_for_status()
+            async for data in aiter_sse_json(resp.aiter_lines()):
+                yield _parse_chunk(data)
+
+
+def _parse_response(data: dict) -> LLMResponse:
+    text = ""
+    if data.get("choices"):
+        text = data["choices"][0].get("message", {}).get("content", "")
+    usage = data.get("usage") or {}
+    return LLMResponse(
+        content=text,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        cached_tokens=_cached_tokens(usage),
+    )
+
+
+def _parse_chunk(data: dict) -> LLMStreamChunk:
+    delta = ""
+    if data.get("choices"):
+        delta = (data["choices"][0].get("delta") or {}).get("content") or ""
+    usage = data.get("usage") or {}
+    return LLMStreamChunk(
+        delta=delta,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        cached_tokens=_cached_tokens(usage),
+    )
+
+
+def _cached_tokens(usage: dict) -> int:
+    # DeepSeek reports context-cache hits; OpenAI-style usage nests them under prompt_tokens_details.
+    if "prompt_cache_hit_tokens" in usage:
+        return usage["prompt_cache_hit_tokens"] or 0
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
@@ -1,37 +1,120 @@
 """Gemini API LLM client."""
 from __future__ import annotations
 
-import httpx
+from collections.abc import AsyncIterator, Iterator
 
-from backend.app.core.config import LLM_API_KEY, LLM_MODEL, LLM_TIMEOUT
-from backend.app.core.llm_client import BaseLLMClient, LLMResponse
+from backend.app.core.config import GEMINI_BASE_URL, LLM_API_KEY, LLM_MODEL, LLM_TIMEOUT
+from backend.app.core.http_clients import get_async_client, get_client
+from backend.app.core.llm_client import (
+    BaseLLMClient,
+    LLMResponse,
+    LLMStreamChunk,
+    aiter_sse_json,
+    iter_sse_json,
+)
 
 
 class GeminiLLMClient(BaseLLMClient):
-    """Google Gemini generateContent client."""
+    """Google Gemini generateContent client on shared keep-alive HTTP clients."""
 
     def __init__(self, api_key: str | None = None, model: str | None = None, timeout: float | None = None):
         self.api_key = api_key or LLM_API_KEY
         self.model = model or LLM_MODEL
         self.timeout = timeout or LLM_TIMEOUT
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+        self.base_url = GEMINI_BASE_URL.rstrip("/")
+
+    def _payload(self, messages: list[dict]) -> dict:
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        payload: dict = {
+            "contents": [
+                {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+                for m in messages
+                if m["role"] != "system"
+            ]
+        }
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        return payload
 
     def complete(self, prompt: str) -> LLMResponse:
-        url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
-        payload = {"contents": [{"parts": [{"text": prompt}]}]}
-        with httpx.Client(timeout=self.timeout) as client:
-            resp = client.post(url, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-
-        text = ""
-        if data.get("candidates"):
-            parts = data["candidates"][0].get("content", {}).get("parts", [])
-            text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
-
-        usage = data.get("usageMetadata", {})
-        return LLMResponse(
-            content=text,
-            prompt_tokens=usage.get("promptTokenCount", 0),
-            completion_tokens=usage.get("candidatesTokenCount", 0),
+        return self.chat([{"role": "user", "content": prompt}])
+
+    async def acomplete(self, prompt: str) -> LLMResponse:
+        return await self.achat([{"role": "user", "content": prompt}])
+
+    def stream(self, prompt: str) -> Iterator[LLMStreamChunk]:
+        return self.chat_stream([{"role": "user", "content": prompt}])
+
+    def astream(self, prompt: str) -> AsyncIterator[LLMStreamChunk]:
+        return self.achat_stream([{"role": "user", "content": prompt}])
+
+    def chat(self, messages: list[dict]) -> LLMResponse:
+        resp = get_client("gemini").post(
+            f"{self.base_url}/models/{self.model}:generateContent",
+            params={"key": self.api_key},
+            json=self._payload(messages),
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return _parse_response(resp.json())
+
+    async def achat(self, messages: list[dict]) -> LLMResponse:
+        resp = await get_async_client("gemini").post(
+            f"{self.base_url}/models/{self.model}:generateContent",
+            params={"key": self.api_key},
+            json=self._payload(messages),
+            timeout=self.timeout,
         )
+        resp.raise_for_status()
+        return _parse_response(resp.json())
+
+    def chat_stream(self, messages: list[dict]) -> Iterator[LLMStreamChunk]:
+        with get_client("gemini").stream(
+            "POST",
+            f"{self.base_url}/models/{self.model}:streamGenerateContent",
+            params={"alt": "sse", "key": self.api_key},
+            json=self._payload(messages),
+            timeout=self.timeout,
+        ) as resp:
+            resp.raise_for_status()
+            for data in iter_sse_json(resp.iter_lines()):
+                yield _parse_chunk(data)
+
+    async def achat_stream(self, messages: list[dict]) -> AsyncIterator[LLMStreamChunk]:
+        async with get_async_client("gemini").stream(
+            "POST",
+            f"{self.base_url}/models/{self.model}:streamGenerateContent",
+            params={"alt": "sse", "key": self.api_key},
+            json=self._payload(messages),
+            timeout=self.timeout,
+        ) as resp:
+            resp.raise_for_status()
+            async for data in aiter_sse_json(resp.aiter_lines()):
+                yield _parse_chunk(data)
+
+
+def _candidate_text(data: dict) -> str:
+    if not data.get("candidates"):
+        return ""
+    parts = data["candidates"][0].get("content", {}).get("parts", [])
+    return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+
+
+def _parse_response(data: dict) -> LLMResponse:
+    usage = data.get("usageMetadata", {})
+    return LLMResponse(
+        content=_candidate_text(data),
+        prompt_tokens=usage.get("promptTokenCount", 0),
+        completion_tokens=usage.get("candidatesTokenCount", 0),
+        cached_tokens=usage.get("cachedContentTokenCount", 0),
+    )
+
+
+def _parse_chunk(data: dict) -> LLMStreamChunk:
+    resp = _parse_response(data)
+    return LLMStreamChunk(
+        delta=resp.content,
+        prompt_tokens=resp.prompt_tokens,
+        completion_tokens=resp.completion_tokens,
+        cached_tokens=resp.cached_tokens,
+    )
@@ -0,0 +1,164 @@
+"""In-process latency and size histograms, rendered in the Prometheus text format.
+
+Observations are a bisect and two additions under a lock, so instrumenting hot paths costs
+well under a microsecond. stage() also adds its duration to the current request's timings
+(see request_timings()), which the chat route reports in a Server-Timing header.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from backend.app.core.config import METRICS_ENABLED
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10_000, 50_000, 100_000, 1_000_000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (keep label values few)."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = ",".join(f'{n}="{v}"' for n, v in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, "+Inf"), values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative:g}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-1]:g}")
+            lines.append(f"{self.name}_count{suffix} {cumulative:g}")
+        return lines
+
+    def count(self, *labels: str) -> int:
+        """Observations recorded for these label values (for tests and debugging)."""
+        with self._lock:
+            series = self._series.get(labels)
+            return int(sum(series[:-1])) if series else 0
+
+
+STAGE_SECONDS = Histogram(
+    "chatbox_stage_seconds",
+    "Wall time per stage: chat, retrieve, embed, search, llm, index_file.",
+    LATENCY_BUCKETS,
+    ("stage",),
+)
+DB_SECONDS = Histogram(
+    "chatbox_db_seconds",
+    "Time holding a pooled SQLite connection (outermost block), by calling function.",
+    LATENCY_BUCKETS,
+    ("op",),
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "chatbox_llm_first_token_seconds", "Time to the first streamed token.", LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "chatbox_llm_tokens", "Tokens per LLM call, by kind (prompt, completion, cached).", COUNT_BUCKETS, ("kind",),
+)
+EMBEDDING_TEXTS = Histogram(
+    "chatbox_embedding_texts", "Texts sent to the embedding provider per batch (cache misses).", COUNT_BUCKETS,
+)
+SCANNED_CHUNKS = Histogram(
+    "chatbox_scanned_chunks", "Chunks scored per query, by method (exact vector scan or fts).", COUNT_BUCKETS,
+    ("method",),
+)
+INDEXED_CHUNKS = Histogram("chatbox_indexed_chunks", "Chunks written per indexed file.", COUNT_BUCKETS)
+
+_HISTOGRAMS = [
+    STAGE_SECONDS, DB_SECONDS, LLM_FIRST_TOKEN_SECONDS, LLM_TOKENS, EMBEDDING_TEXTS, SCANNED_CHUNKS, INDEXED_CHUNKS,
+]
+
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def add_timing(name: str, seconds: float) -> None:
+    """Add to the current request's timing for name (no-op outside request_timings())."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into chatbox_stage_seconds{stage=name} and the request's timings."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, name)
+        add_timing(name, elapsed)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of stage() for plain and async functions."""
+
+    def decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def request_timings() -> Iterator[dict[str, float]]:
+    """Collect stage durations (seconds) of work done in this context, including worker threads
+    started with asyncio.to_thread, which copy the context."""
+    timings: dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    """Server-Timing header value, e.g. ``db;dur=1.2, llm;dur=840.5``."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def render() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    return "\n".join(line for h in _HISTOGRAMS for line in h.render()) + "\n"
@@ -1,6 +1,11 @@
 """Build chat/rag prompts with optional history."""
 from __future__ import annotations
 
+from dataclasses import dataclass, field
+
+from backend.app.core.config import MAX_PROMPT_TOKENS, PROMPT_CONTEXT_SHARE
+from backend.app.core.tokens import TokenEstimator, get_token_estimator
+
 CHAT_SYSTEM_PREFIX = """你是一个有帮助的对话助手。请结合对话历史回答用户最新问题，回答要简洁准确。"""
 RAG_SYSTEM_PREFIX = """你是一个基于文档的问答助手。请根据以下「参考内容」回答用户问题。如果参考内容不足以回答问题，请说明并尽量基于常识回答。回答要简洁准确。"""
 
@@ -27,9 +32,7 @@ def build_chat_prompt(
     system_prefix: str | None = None,
 ) -> str:
     """Build full chat prompt: system + history + latest user message."""
-    prefix = system_prefix or CHAT_SYSTEM_PREFIX
-    history = _format_history(history_messages)
-    return f"{prefix}\n\n【对话历史】\n{history}\n\n【用户最新问题】\n{user_message}"
+    return flatten_messages(build_chat_messages(user_message, history_messages, system_prefix=system_prefix))
 
 
 def build_rag_prompt(
@@ -39,7 +42,138 @@ def build_rag_prompt(
     system_prefix: str | None = None,
 ) -> str:
     """Build full RAG prompt: system + history + context + latest user message."""
-    prefix = system_prefix or RAG_SYSTEM_PREFIX
-    history = _format_history(history_messages)
+    return flatten_messages(build_chat_messages(user_message, history_messages, context_chunks, system_prefix))
+
+
+_CONTEXT_LABEL = "【参考内容】"
+_QUESTION_LABEL = "【用户最新问题】"
+
+
+def _latest_turn(user_message: str, context_chunks: list[str] | None) -> str:
+    # A plain chat turn is sent verbatim, exactly as it will appear in the next turn's history.
+    if context_chunks is None:
+        return user_message
     context = "\n\n---\n\n".join(context_chunks) if context_chunks else "(无参考内容)"
-    return f"{prefix}\n\n【对话历史】\n{history}\n\n【参考内容】\n{context}\n\n【用户最新问题】\n{user_message}"
+    return f"{_CONTEXT_LABEL}\n{context}\n\n{_QUESTION_LABEL}\n{user_message}"
+
+
+def build_chat_messages(
+    user_message: str,
+    history_messages: list[dict] | None = None,
+    context_chunks: list[str] | None = None,
+    system_prefix: str | None = None,
+) -> list[dict]:
+    """Role-tagged messages: a fixed system message, past turns verbatim, then the new turn.
+
+    A plain question is sent verbatim, so each request begins with the bytes of the
+    previous one (until history is trimmed) and providers can reuse their cached prefix.
+    Retrieved context (a RAG turn when context_chunks is not None) goes in the new turn only.
+    """
+    prefix = system_prefix or (CHAT_SYSTEM_PREFIX if context_chunks is None else RAG_SYSTEM_PREFIX)
+    messages = [{"role": "system", "content": prefix}]
+    for m in history_messages or []:
+        content = (m.get("content", "") or "").strip()
+        if content:
+            messages.append({"role": "assistant" if m.get("role") == "assistant" else "user", "content": content})
+    messages.append({"role": "user", "content": _latest_turn(user_message, context_chunks)})
+    return messages
+
+
+def flatten_messages(messages: list[dict]) -> str:
+    """Single-string prompt for clients without multi-turn support (inverse of build_chat_messages)."""
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    turns = [m for m in messages if m["role"] != "system"]
+    if not turns:
+        return system
+    history = _format_history(turns[:-1])
+    latest = turns[-1]["content"]
+    if not latest.startswith(_CONTEXT_LABEL):
+        latest = f"{_QUESTION_LABEL}\n{latest}"
+    return f"{system}\n\n【对话历史】\n{history}\n\n{latest}"
+
+
+@dataclass
+class BudgetedPrompt:
+    """A prompt assembled within a token budget, and what had to be left out."""
+
+    prompt: str
+    tokens: int
+    messages: list[dict] = field(default_factory=list)  # the same prompt as role-tagged turns
+    history_messages: list[dict] = field(default_factory=list)  # kept, oldest first
+    context_indices: list[int] = field(default_factory=list)  # kept context chunks, by input position
+    dropped_history: int = 0
+    dropped_context: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.dropped_history or self.dropped_context)
+
+
+def _history_line_tokens(m: dict, estimator: TokenEstimator) -> int:
+    content = (m.get("content", "") or "").strip()
+    return estimator.count(f"用户: {content}\n") if content else 0
+
+
+def build_budgeted_prompt(
+    user_message: str,
+    history_messages: list[dict] | None = None,
+    context_chunks: list[str] | None = None,
+    max_tokens: int | None = None,
+    system_prefix: str | None = None,
+    estimator: TokenEstimator | None = None,
+    context_share: float | None = None,
+) -> BudgetedPrompt:
+    """Build a chat prompt (context_chunks None) or RAG prompt that fits max_tokens.
+
+    The system prefix and the latest question are always kept. Retrieved context
+    (ordered best first) gets first claim on context_share of what remains, history
+    (newest first) takes what is left, and context may then use anything history did
+    not. Items that do not fit are dropped whole and counted in the result.
+    """
+    estimator = estimator or get_token_estimator()
+    budget = max_tokens or MAX_PROMPT_TOKENS
+    share = PROMPT_CONTEXT_SHARE if context_share is None else context_share
+    history = list(history_messages or [])
+    rag = context_chunks is not None
+    chunks = list(context_chunks or [])
+
+    def render(kept_history: list[dict], kept_chunks: list[str]) -> list[dict]:
+        return build_chat_messages(user_message, kept_history, kept_chunks if rag else None, system_prefix)
+
+    remaining = budget - estimator.count(flatten_messages(render([], [])))
+    chunk_costs = [estimator.count(c + "\n\n---\n\n") for c in chunks]
+    taken: set[int] = set()
+
+    def take_context(allowance: int) -> int:
+        used = 0
+        for i, cost in enumerate(chunk_costs):
+            if i not in taken and used + cost <= allowance:
+                taken.add(i)
+                used += cost
+        return used
+
+    context_used = take_context(int(max(remaining, 0) * share)) if rag else 0
+    history_left = remaining - context_used
+    kept_history: list[dict] = []
+    for m in reversed(history):
+        cost = _history_line_tokens(m, estimator)
+        if cost > history_left:
+            break  # keep history contiguous: never skip a turn to fit an older one
+        history_left -= cost
+        kept_history.append(m)
+    kept_history.reverse()
+    if rag:
+        take_context(history_left)
+
+    indices = sorted(taken)
+    messages = render(kept_history, [chunks[i] for i in indices])
+    prompt = flatten_messages(messages)
+    return BudgetedPrompt(
+        prompt=prompt,
+        tokens=estimator.count(prompt),
+        messages=messages,
+        history_messages=kept_history,
+        context_indices=indices,
+        dropped_history=len(history) - len(kept_history),
+        dropped_context=len(chunks) - len(indices),
+    )
@@ -0,0 +1,50 @@
+"""Prompt token estimation without a provider tokenizer (pluggable)."""
+from __future__ import annotations
+
+import math
+import re
+from abc import ABC, abstractmethod
+
+# CJK ideographs, kana, hangul and full-width punctuation: roughly one token per character.
+_CJK = re.compile("[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+class TokenEstimator(ABC):
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Estimated number of tokens in text (should not under-count)."""
+        ...
+
+
+class CJKTokenEstimator(TokenEstimator):
+    """CJK characters cost cjk_tokens_per_char each; other text one token per chars_per_token chars."""
+
+    def __init__(self, cjk_tokens_per_char: float = 1.0, chars_per_token: float = 4.0):
+        self.cjk_tokens_per_char = cjk_tokens_per_char
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cjk = len(_CJK.findall(text))
+        other = len(text) - cjk
+        return math.ceil(cjk * self.cjk_tokens_per_char + other / self.chars_per_token)
+
+
+_default_estimator: TokenEstimator | None = None
+
+
+def get_token_estimator() -> TokenEstimator:
+    global _default_estimator
+    if _default_estimator is None:
+        _default_estimator = CJKTokenEstimator()
+    return _default_estimator
+
+
+def set_token_estimator(estimator: TokenEstimator | None) -> None:
+    global _default_estimator
+    _default_estimator = estimator
+
+
+def count_tokens(text: str) -> int:
+    return get_token_estimator().count(text)
@@ -0,0 +1,113 @@
+"""Vectorized similarity scoring over float32 embedding BLOBs."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+def normalize(vec: Sequence[float] | np.ndarray) -> np.ndarray:
+    """Return vec as a unit-length float32 array (zero vectors stay zero)."""
+    q = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(q))
+    return q / norm if norm > 0 else q
+
+
+def normalize_rows(mat: np.ndarray) -> np.ndarray:
+    """Scale each row of mat to unit length in place and return it."""
+    norms = np.sqrt(np.einsum("ij,ij->i", mat, mat))
+    norms[norms == 0] = 1.0
+    mat /= norms[:, None]
+    return mat
+
+
+def blobs_to_matrix(blobs: Sequence[bytes], dim: int) -> np.ndarray:
+    """Stack float32 BLOBs of length dim into one contiguous, read-only (n, dim) matrix."""
+    if not blobs:
+        return np.empty((0, dim), dtype=np.float32)
+    buf = b"".join(blobs)
+    return np.frombuffer(buf, dtype=np.float32).reshape(len(blobs), dim)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, without a full sort."""
+    n = scores.shape[0]
+    if n == 0 or top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k < n:
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def cosine_top_k(blobs: Sequence[bytes], query: Sequence[float], top_k: int) -> list[tuple[int, float]]:
+    """Score unit-length float32 BLOBs against query by cosine; return [(row, score)] best first.
+
+    Stored embeddings are normalized when written, so a row's score is its dot product
+    with the normalized query. BLOBs whose length does not match the query dimension are skipped.
+    """
+    q = normalize(query)
+    dim = q.shape[0]
+    width = dim * 4
+    rows = [i for i, b in enumerate(blobs) if b is not None and len(b) == width]
+    if not rows:
+        return []
+    if len(rows) == len(blobs):
+        mat = blobs_to_matrix(blobs, dim)
+    else:
+        mat = blobs_to_matrix([blobs[i] for i in rows], dim)
+    scores = mat @ q
+    best = top_k_indices(scores, top_k)
+    return [(rows[i], float(scores[i])) for i in best]
+
+
+# Compact codes for the coarse scan (EMBEDDING_STORAGE). Vectors are normalized before
+# encoding, so a code's dot product with a unit query approximates cosine similarity.
+#   int8: float32 scale, then dim int8 values (value * scale ~ the unit vector)
+CODECS = ("int8",)
+_SCORE_BATCH = 4096
+
+
+def code_width(dim: int, codec: str) -> int:
+    """Bytes per encoded vector of dimension dim."""
+    if codec == "int8":
+        return 4 + dim
+    raise ValueError(f"unknown embedding codec: {codec}")
+
+
+def encode_codes(vectors: np.ndarray, codec: str) -> list[bytes]:
+    """Encode the rows of an (n, dim) matrix as codes; rows are normalized first."""
+    mat = normalize_rows(np.array(vectors, dtype=np.float32, ndmin=2))
+    n, dim = mat.shape
+    code_width(dim, codec)  # rejects unknown codecs
+    scales = np.abs(mat).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    buf = np.empty((n, 4 + dim), dtype=np.uint8)
+    buf[:, :4] = scales.astype("<f4").view(np.uint8).reshape(n, 4)
+    buf[:, 4:] = np.rint(mat / scales[:, None]).astype(np.int8).view(np.uint8)
+    return [row.tobytes() for row in buf]
+
+
+def code_top_k(codes: Sequence[bytes], query: Sequence[float], top_k: int, codec: str) -> list[tuple[int, float]]:
+    """Approximate cosine top_k over codes; return [(row, score)] best first.
+
+    Codes are widened to float32 a batch at a time, so the working set stays small
+    whatever the number of rows. Codes of another width (dimension or codec) are skipped.
+    """
+    q = normalize(query)
+    width = code_width(q.shape[0], codec)
+    rows = [i for i, c in enumerate(codes) if c is not None and len(c) == width]
+    if not rows:
+        return []
+    if len(rows) < len(codes):
+        codes = [codes[i] for i in rows]
+    buf = np.frombuffer(b"".join(codes), dtype=np.uint8).reshape(len(codes), width)
+    scores = np.empty(len(codes), dtype=np.float32)
+    for lo in range(0, len(codes), _SCORE_BATCH):
+        block = buf[lo:lo + _SCORE_BATCH]
+        # Scale after the dot product: one multiply per row instead of one per value.
+        dots = block[:, 4:].view(np.int8).astype(np.float32) @ q
+        scores[lo:lo + len(block)] = dots * block[:, :4].copy().view("<f4").ravel()
+    best = top_k_indices(scores, top_k)
+    return [(rows[i], float(scores[i])) for i in best]
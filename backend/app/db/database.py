@@ -1,10 +1,37 @@
-"""SQLite connection and lifecycle."""
+"""SQLite connection pool and lifecycle."""
+import logging
+import queue
 import sqlite3
+import sys
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
 
-from backend.app.core.config import DATABASE_PATH, DATA_DIR
-from backend.app.db.models import create_tables_sql
+import numpy as np
+
+from backend.app.core.config import (
+    DATABASE_PATH,
+    DATA_DIR,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
+from backend.app.core.metrics import DB_SECONDS, add_timing
+from backend.app.core.vector_search import normalize_rows
+from backend.app.db.models import (
+    ADDED_COLUMNS,
+    added_column_backfill_sql,
+    added_column_indexes_sql,
+    create_tables_sql,
+    fts_tables_sql,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def get_sqlite_path() -> Path:
@@ -17,25 +44,236 @@ def get_sqlite_path() -> Path:
     return p
 
 
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections, opened once with tuned pragmas.
+
+    A connection is used by one thread at a time; it is pinged on checkout and
+    replaced if it went bad.
+    """
+
+    def __init__(self, path: Path, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._all: set[sqlite3.Connection] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        # Enforce FK constraints in SQLite for each connection.
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Only takes effect on a new, empty database (it must precede the WAL switch); see vacuum().
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)}")
+        conn.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size = {int(SQLITE_CACHE_SIZE)}")
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._all.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = len(self._all) < self.size
+                if grow:
+                    conn = self._open()
+                    self._all.add(conn)
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError("timed out waiting for a database connection") from None
+        try:
+            conn.execute("SELECT 1")
+        except sqlite3.Error:
+            self._discard(conn)
+            conn = self._open()
+            with self._lock:
+                self._all.add(conn)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            self._discard(conn)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self) -> None:
+        """Close every connection; in-use ones are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_sqlite_path())
+    return _pool
+
+
+def close_pool() -> None:
+    """Close all pooled connections (app shutdown); the next use opens a new pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+# Context managers that only wrap get_connection(); the op label names their caller instead.
+_PASSTHROUGH = {"__enter__", "get_connection", "transaction"}
+
+
+def _caller_name() -> str:
+    frame = sys._getframe(2)
+    while frame.f_back is not None and frame.f_code.co_name in _PASSTHROUGH:
+        frame = frame.f_back
+    return frame.f_code.co_name
+
+
 @contextmanager
 def get_connection():
-    """Yield a database connection; creates DB file and dir if needed."""
-    path = get_sqlite_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(path))
-    conn.row_factory = sqlite3.Row
-    # Enforce FK constraints in SQLite for each connection.
-    conn.execute("PRAGMA foreign_keys = ON")
+    """Yield a pooled connection; commit on success, roll back on error.
+
+    Nested use on the same thread reuses the outer connection, and only the
+    outermost block commits. The outermost block's duration (pool wait included) is
+    recorded per calling function in chatbox_db_seconds.
+    """
+    held = getattr(_local, "conn", None)
+    if held is not None:
+        yield held
+        return
+    t0 = time.perf_counter()
+    op = _caller_name()
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
     try:
         yield conn
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        _local.conn = None
+        pool.release(conn)
+        elapsed = time.perf_counter() - t0
+        DB_SECONDS.observe(elapsed, op)
+        add_timing("db", elapsed)
 
 
 def init_db() -> None:
-    """Create tables if they do not exist."""
-    path = get_sqlite_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
+    """Create tables if they do not exist and add columns missing from older databases."""
     with get_connection() as conn:
         conn.executescript(create_tables_sql())
+        _add_missing_columns(conn)
+        conn.executescript(added_column_indexes_sql())
+        conn.executescript(added_column_backfill_sql())
+        _create_fts(conn)
+        _normalize_stored_embeddings(conn)
+
+
+def _add_missing_columns(conn: sqlite3.Connection) -> None:
+    for table, column, definition in ADDED_COLUMNS:
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+        if existing and column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# PRAGMA user_version from which chunks.embedding holds unit-length vectors.
+_NORMALIZED_EMBEDDINGS_VERSION = 1
+_NORMALIZE_BATCH = 4096
+
+
+def _normalize_stored_embeddings(conn: sqlite3.Connection) -> None:
+    """Rescale embeddings written before they were stored unit-length; runs once per database."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= _NORMALIZED_EMBEDDINGS_VERSION:
+        return
+    last = -1
+    while rows := conn.execute(
+        "SELECT rowid, embedding FROM chunks WHERE rowid > ? AND embedding IS NOT NULL ORDER BY rowid LIMIT ?",
+        (last, _NORMALIZE_BATCH),
+    ).fetchall():
+        last = rows[-1][0]
+        updates = []
+        for rowid, blob in rows:
+            if len(blob) % 4:
+                continue
+            vec = normalize_rows(np.frombuffer(blob, dtype=np.float32).reshape(1, -1).copy())
+            updates.append((vec.tobytes(), rowid))
+        conn.executemany("UPDATE chunks SET embedding = ? WHERE rowid = ?", updates)
+    conn.execute(f"PRAGMA user_version = {_NORMALIZED_EMBEDDINGS_VERSION}")
+
+
+def incremental_vacuum(pages: int) -> int:
+    """Return up to pages free pages to the filesystem; returns pages released.
+
+    A no-op (returns 0) on databases created before auto_vacuum was enabled, until vacuum() runs once.
+    """
+    with get_connection() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # INCREMENTAL
+            return 0
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript steps the pragma to completion; execute() would free a single page.
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def vacuum() -> None:
+    """Rewrite the whole database with incremental auto-vacuum enabled (blocks writers meanwhile).
+
+    VACUUM may renumber rowids, so callers must rebuild the chunks_fts index afterwards.
+    """
+    with get_connection() as conn:
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+def optimize() -> None:
+    """Let SQLite refresh the planner statistics that have gone stale (cheap; run periodically)."""
+    with get_connection() as conn:
+        conn.execute("PRAGMA optimize")
+
+
+def _create_fts(conn: sqlite3.Connection) -> None:
+    # Optional: without FTS5 (or its trigram tokenizer) retrieval stays vector-only.
+    existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone() is not None
+    try:
+        conn.executescript(fts_tables_sql())
+    except sqlite3.OperationalError as e:
+        logger.warning("full-text index unavailable, hybrid retrieval disabled: %s", e)
+        return
+    if not existed:
+        # Databases from before the index existed: index the chunks they already hold.
+        conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
@@ -8,7 +8,8 @@ CREATE TABLE IF NOT EXISTS sessions (
     id TEXT PRIMARY KEY,
     title TEXT NOT NULL DEFAULT '',
     created_at TEXT NOT NULL,
-    updated_at TEXT NOT NULL
+    updated_at TEXT NOT NULL,
+    last_message_at TEXT
 );
 
 CREATE TABLE IF NOT EXISTS messages (
@@ -17,6 +18,7 @@ CREATE TABLE IF NOT EXISTS messages (
     role TEXT NOT NULL,
     content TEXT NOT NULL,
     created_at TEXT NOT NULL,
+    seq INTEGER,
     FOREIGN KEY (session_id) REFERENCES sessions(id)
 );
 
@@ -29,6 +31,9 @@ CREATE TABLE IF NOT EXISTS files (
     mime_type TEXT,
     path TEXT NOT NULL,
     created_at TEXT NOT NULL,
+    content_hash TEXT,
+    size_bytes INTEGER,
+    chunk_file_id TEXT,
     FOREIGN KEY (session_id) REFERENCES sessions(id)
 );
 
@@ -43,5 +48,122 @@ CREATE TABLE IF NOT EXISTS chunks (
 );
 
 CREATE INDEX IF NOT EXISTS idx_chunks_file_index ON chunks(file_id, chunk_index);
+
+-- Compact copies of chunk embeddings for the coarse scan (EMBEDDING_STORAGE=int8);
+-- chunks.embedding keeps full precision for rescoring. Rows are small and clustered by file,
+-- so scanning a file's codes reads a contiguous run of pages.
+CREATE TABLE IF NOT EXISTS chunk_codes (
+    file_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    code BLOB NOT NULL,
+    PRIMARY KEY (file_id, chunk_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS chunk_codes_delete AFTER DELETE ON chunks BEGIN
+    DELETE FROM chunk_codes WHERE file_id = old.file_id AND chunk_id = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunk_codes_move AFTER UPDATE OF file_id ON chunks BEGIN
+    UPDATE chunk_codes SET file_id = new.file_id WHERE file_id = old.file_id AND chunk_id = old.id;
+END;
 CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    namespace TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    last_used_at TEXT NOT NULL,
+    PRIMARY KEY (namespace, text_hash)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_used ON embedding_cache(last_used_at);
+
+CREATE TABLE IF NOT EXISTS index_jobs (
+    id TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    run_after TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    FOREIGN KEY (file_id) REFERENCES files(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_index_jobs_status_run ON index_jobs(status, run_after);
+CREATE INDEX IF NOT EXISTS idx_index_jobs_file ON index_jobs(file_id);
+"""
+
+
+# Columns added after a table was first released, as (table, column, definition).
+# init_db() adds any that an existing database is missing; new databases get them from CREATE TABLE.
+ADDED_COLUMNS: list[tuple[str, str, str]] = [
+    ("files", "content_hash", "TEXT"),
+    ("files", "size_bytes", "INTEGER"),
+    # Duplicate uploads reference the chunks of the file that was indexed (NULL = own chunks).
+    ("files", "chunk_file_id", "TEXT"),
+    # Time of the session's latest message (its creation time until it has one); the listing sort key.
+    ("sessions", "last_message_at", "TEXT"),
+    # Per-session message number (1, 2, ...) assigned on insert; history pages and cursors use it.
+    ("messages", "seq", "INTEGER"),
+]
+
+
+def added_column_backfill_sql() -> str:
+    """Fill ADDED_COLUMNS on rows written before they existed; idempotent, runs on every init_db()."""
+    return """
+UPDATE sessions SET last_message_at = COALESCE(
+    (SELECT MAX(m.created_at) FROM messages m WHERE m.session_id = sessions.id),
+    created_at
+) WHERE last_message_at IS NULL;
+
+UPDATE messages SET seq = numbered.n FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY created_at, rowid) AS n
+    FROM messages
+    WHERE session_id IN (SELECT session_id FROM messages WHERE seq IS NULL)
+) AS numbered
+WHERE messages.id = numbered.id;
+"""
+
+
+def added_column_indexes_sql() -> str:
+    """Indexes on ADDED_COLUMNS; run after they exist, since older databases gain them by ALTER TABLE."""
+    return """
+CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash);
+CREATE INDEX IF NOT EXISTS idx_files_chunk_file ON files(chunk_file_id);
+CREATE INDEX IF NOT EXISTS idx_files_session ON files(session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_message ON sessions(last_message_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_session_seq ON messages(session_id, seq);
+-- Empty once every message is numbered, so the backfill's check for unnumbered rows is free.
+CREATE INDEX IF NOT EXISTS idx_messages_unnumbered ON messages(session_id) WHERE seq IS NULL;
+"""
+
+
+def fts_tables_sql() -> str:
+    """Full-text index over chunks.content, kept in sync with chunks by triggers.
+
+    chunks_fts is an external-content FTS5 table keyed by the chunks rowid, so chunk text
+    is stored once. The trigram tokenizer matches substrings, which suits identifiers and
+    CJK text that has no word boundaries.
+    """
+    return """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    content,
+    content='chunks',
+    content_rowid='rowid',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts (rowid, content) VALUES (new.rowid, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE OF content ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+    INSERT INTO chunks_fts (rowid, content) VALUES (new.rowid, new.content);
+END;
 """
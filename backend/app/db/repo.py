@@ -2,9 +2,13 @@
 from __future__ import annotations
 
 import uuid
-from datetime import datetime, timezone
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+from backend.app.core.metrics import SCANNED_CHUNKS
+from backend.app.core.vector_search import code_top_k, cosine_top_k
 from backend.app.db.database import get_connection
 
 
@@ -12,40 +16,53 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+@contextmanager
+def transaction(write: bool = False) -> Iterator[None]:
+    """Unit of work: repo calls inside share one connection and commit once, or roll back together.
+
+    write=True takes the write lock up front (BEGIN IMMEDIATE), so a block that reads and
+    then writes cannot fail with SQLITE_BUSY when its read snapshot turns out to be stale.
+    """
+    with get_connection() as conn:
+        if write and not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield
+
+
 # Sessions
 def create_session(title: str = "") -> dict:
     sid = str(uuid.uuid4())
     now = _now_iso()
     with get_connection() as conn:
         conn.execute(
-            "INSERT INTO sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
-            (sid, title or "", now, now),
+            "INSERT INTO sessions (id, title, created_at, updated_at, last_message_at) VALUES (?, ?, ?, ?, ?)",
+            (sid, title or "", now, now, now),
         )
-    return {"id": sid, "title": title or "", "created_at": now, "updated_at": now}
+    return {"id": sid, "title": title or "", "created_at": now, "updated_at": now, "last_message_at": now}
 
 
-def list_sessions(limit: int = 50) -> list[dict]:
-    """List sessions ordered by last chat time (latest message first); no messages = use session updated_at."""
+def list_sessions(limit: int = 50, after: Optional[tuple[str, str]] = None) -> list[dict]:
+    """List sessions by last chat time, latest first (sessions without messages by creation time).
+
+    after is the (last_message_at, id) of the previous page's last row; the page is read
+    straight off idx_sessions_last_message, so its cost does not grow with message count.
+    """
+    sql = "SELECT id, title, created_at, updated_at, last_message_at FROM sessions"
+    params: list = []
+    if after is not None:
+        sql += " WHERE (last_message_at, id) < (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY last_message_at DESC, id DESC LIMIT ?"
+    params.append(limit)
     with get_connection() as conn:
-        rows = conn.execute(
-            """SELECT s.id, s.title, s.created_at, s.updated_at
-               FROM sessions s
-               LEFT JOIN (
-                 SELECT session_id, MAX(created_at) AS last_msg_at
-                 FROM messages
-                 GROUP BY session_id
-               ) m ON s.id = m.session_id
-               ORDER BY COALESCE(m.last_msg_at, s.updated_at) DESC
-               LIMIT ?""",
-            (limit,),
-        ).fetchall()
+        rows = conn.execute(sql, params).fetchall()
     return [dict(r) for r in rows]
 
 
 def get_session(session_id: str) -> Optional[dict]:
     with get_connection() as conn:
         row = conn.execute(
-            "SELECT id, title, created_at, updated_at FROM sessions WHERE id = ?",
+            "SELECT id, title, created_at, updated_at, last_message_at FROM sessions WHERE id = ?",
             (session_id,),
         ).fetchone()
     return dict(row) if row else None
@@ -63,16 +80,70 @@ def update_session_title(session_id: str, title: str) -> None:
         conn.execute("UPDATE sessions SET title = ? WHERE id = ?", (title[:500].strip(), session_id))
 
 
-def delete_session(session_id: str) -> bool:
-    """Delete session and its messages, files, chunks. Returns True if session existed."""
+def delete_session(session_id: str) -> Optional[dict]:
+    """Delete session and its messages, files and the chunks no other file references.
+
+    Chunks are shared by duplicate uploads (files.chunk_file_id). When the file that owns
+    shared chunks is deleted, ownership moves to the oldest surviving duplicate.
+    Returns None if the session did not exist, else
+    {"file_ids", "transferred": {old_owner: new_owner}, "orphaned_paths"} where
+    orphaned_paths are upload paths no remaining file row points at.
+    """
     if not get_session(session_id):
-        return False
+        return None
     with get_connection() as conn:
-        conn.execute("DELETE FROM chunks WHERE file_id IN (SELECT id FROM files WHERE session_id = ?)", (session_id,))
-        conn.execute("DELETE FROM files WHERE session_id = ?", (session_id,))
+        files = conn.execute(
+            "SELECT id, path, chunk_file_id FROM files WHERE session_id = ?", (session_id,)
+        ).fetchall()
+        result = _delete_file_rows(conn, files)
         conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
         conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-    return True
+    return result
+
+
+def delete_files(file_ids: list[str]) -> dict:
+    """Delete files and the chunks no surviving file references; same result shape as delete_session()."""
+    if not file_ids:
+        return {"file_ids": [], "transferred": {}, "orphaned_paths": []}
+    placeholders = ",".join("?" * len(file_ids))
+    with get_connection() as conn:
+        files = conn.execute(
+            f"SELECT id, path, chunk_file_id FROM files WHERE id IN ({placeholders})", file_ids
+        ).fetchall()
+        return _delete_file_rows(conn, files)
+
+
+def _delete_file_rows(conn, files: list) -> dict:
+    doomed = [f["id"] for f in files]
+    placeholders = ",".join("?" * len(doomed))
+    transferred: dict[str, str] = {}
+    for f in files:
+        if f["chunk_file_id"] is not None:
+            continue
+        successor = conn.execute(
+            f"""SELECT id FROM files WHERE chunk_file_id = ? AND id NOT IN ({placeholders})
+               ORDER BY created_at LIMIT 1""",
+            (f["id"], *doomed),
+        ).fetchone()
+        if successor is None:
+            conn.execute("DELETE FROM chunks WHERE file_id = ?", (f["id"],))
+            continue
+        new_owner = successor["id"]
+        conn.execute("UPDATE chunks SET file_id = ? WHERE file_id = ?", (new_owner, f["id"]))
+        conn.execute("UPDATE index_jobs SET file_id = ? WHERE file_id = ?", (new_owner, f["id"]))
+        conn.execute(
+            "UPDATE files SET chunk_file_id = CASE WHEN id = ? THEN NULL ELSE ? END WHERE chunk_file_id = ?",
+            (new_owner, new_owner, f["id"]),
+        )
+        transferred[f["id"]] = new_owner
+    if doomed:
+        conn.execute(f"DELETE FROM index_jobs WHERE file_id IN ({placeholders})", doomed)
+        conn.execute(f"DELETE FROM files WHERE id IN ({placeholders})", doomed)
+    orphaned = [
+        path for path in dict.fromkeys(f["path"] for f in files)
+        if conn.execute("SELECT 1 FROM files WHERE path = ? LIMIT 1", (path,)).fetchone() is None
+    ]
+    return {"file_ids": doomed, "transferred": transferred, "orphaned_paths": orphaned}
 
 
 # Messages
@@ -80,61 +151,119 @@ def add_message(session_id: str, role: str, content: str) -> dict:
     mid = str(uuid.uuid4())
     now = _now_iso()
     with get_connection() as conn:
+        # One statement: the write lock is held while the next number is read, so seq stays unique.
+        seq = conn.execute(
+            """INSERT INTO messages (id, session_id, role, content, created_at, seq)
+               SELECT ?, ?, ?, ?, ?, COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = ?
+               RETURNING seq""",
+            (mid, session_id, role, content, now, session_id),
+        ).fetchone()[0]
         conn.execute(
-            "INSERT INTO messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
-            (mid, session_id, role, content, now),
+            "UPDATE sessions SET updated_at = ?, last_message_at = ? WHERE id = ?", (now, now, session_id)
         )
-    touch_session(session_id)
-    return {"id": mid, "session_id": session_id, "role": role, "content": content, "created_at": now}
+    return {"id": mid, "session_id": session_id, "role": role, "content": content, "created_at": now, "seq": seq}
 
 
 def list_messages(
     session_id: str,
     limit: int = 50,
-    before: Optional[str] = None,
+    before_seq: Optional[int] = None,
+    after_seq: Optional[int] = None,
 ) -> list:
+    """Messages of a session in conversation order.
+
+    By default the latest limit messages (older than before_seq if given); with after_seq,
+    the first limit messages newer than it.
+    """
+    columns = "id, session_id, role, content, created_at, seq"
     with get_connection() as conn:
-        if before:
+        if after_seq is not None:
             rows = conn.execute(
-                """SELECT id, session_id, role, content, created_at FROM messages
-                   WHERE session_id = ? AND created_at < ? ORDER BY created_at DESC LIMIT ?""",
-                (session_id, before, limit),
+                f"SELECT {columns} FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (session_id, after_seq, limit),
             ).fetchall()
         else:
+            where, params = "session_id = ?", [session_id]
+            if before_seq is not None:
+                where += " AND seq < ?"
+                params.append(before_seq)
             rows = conn.execute(
-                """SELECT id, session_id, role, content, created_at FROM messages
-                   WHERE session_id = ? ORDER BY created_at DESC LIMIT ?""",
-                (session_id, limit),
+                f"""SELECT * FROM (
+                     SELECT {columns} FROM messages WHERE {where} ORDER BY seq DESC LIMIT ?
+                   ) ORDER BY seq""",
+                (*params, limit),
             ).fetchall()
-    return [dict(r) for r in reversed(rows)]
+    return [dict(r) for r in rows]
 
 
 # Files
+_FILE_COLUMNS = "id, session_id, filename, mime_type, path, created_at, content_hash, size_bytes, chunk_file_id"
+
+
 def create_file(
     filename: str,
     path: str,
     mime_type: Optional[str] = None,
     session_id: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    size_bytes: Optional[int] = None,
+    chunk_file_id: Optional[str] = None,
 ) -> dict:
     fid = str(uuid.uuid4())
     now = _now_iso()
+    rec = {
+        "id": fid, "session_id": session_id, "filename": filename, "mime_type": mime_type or "", "path": path,
+        "created_at": now, "content_hash": content_hash, "size_bytes": size_bytes, "chunk_file_id": chunk_file_id,
+    }
     with get_connection() as conn:
         conn.execute(
-            "INSERT INTO files (id, session_id, filename, mime_type, path, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (fid, session_id, filename, mime_type or "", path, now),
+            f"INSERT INTO files ({_FILE_COLUMNS}) VALUES ({', '.join('?' * len(rec))})",
+            tuple(rec.values()),
         )
-    return {"id": fid, "session_id": session_id, "filename": filename, "mime_type": mime_type or "", "path": path, "created_at": now}
+    return rec
 
 
 def get_file(file_id: str) -> Optional[dict]:
+    with get_connection() as conn:
+        row = conn.execute(f"SELECT {_FILE_COLUMNS} FROM files WHERE id = ?", (file_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def find_shareable_file(content_hash: str) -> Optional[dict]:
+    """Oldest file with this content that owns its chunks and whose indexing has not failed."""
     with get_connection() as conn:
         row = conn.execute(
-            "SELECT id, session_id, filename, mime_type, path, created_at FROM files WHERE id = ?",
-            (file_id,),
+            f"""SELECT {_FILE_COLUMNS} FROM files f
+                WHERE content_hash = ? AND chunk_file_id IS NULL
+                  AND COALESCE(
+                    (SELECT status FROM index_jobs j WHERE j.file_id = f.id ORDER BY created_at DESC LIMIT 1),
+                    'indexed'
+                  ) != 'failed'
+                ORDER BY created_at LIMIT 1""",
+            (content_hash,),
         ).fetchone()
     return dict(row) if row else None
 
 
+def resolve_chunk_file_ids(file_ids: list[str]) -> dict[str, str]:
+    """Map each existing file id to the id its chunks are stored under (itself unless a duplicate)."""
+    if not file_ids:
+        return {}
+    placeholders = ",".join("?" * len(file_ids))
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT id, COALESCE(chunk_file_id, id) AS owner FROM files WHERE id IN ({placeholders})",
+            file_ids,
+        ).fetchall()
+    return {r["id"]: r["owner"] for r in rows}
+
+
+def list_file_ids_by_session(session_id: str) -> list[str]:
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id FROM files WHERE session_id = ?", (session_id,)).fetchall()
+    return [r["id"] for r in rows]
+
+
 # Chunks
 def add_chunk(file_id: str, chunk_index: int, content: str, embedding: Optional[bytes] = None) -> dict:
     cid = str(uuid.uuid4())
@@ -147,6 +276,50 @@ def add_chunk(file_id: str, chunk_index: int, content: str, embedding: Optional[
     return {"id": cid, "file_id": file_id, "chunk_index": chunk_index, "content": content, "created_at": now}
 
 
+def add_chunks(file_id: str, chunks: Iterable[tuple[str, Optional[bytes]]], start_index: int = 0) -> list[str]:
+    """Insert (content, embedding) pairs for one file in a single transaction; returns ids in order.
+
+    Embeddings are unit-length float32 BLOBs (searches score them by dot product).
+    chunks may be any iterable (e.g. a generator); it is consumed lazily by executemany.
+    """
+    ids: list[str] = []
+    now = _now_iso()
+
+    def rows():
+        for i, (content, embedding) in enumerate(chunks, start=start_index):
+            cid = str(uuid.uuid4())
+            ids.append(cid)
+            yield (cid, file_id, i, content, embedding, now)
+
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO chunks (id, file_id, chunk_index, content, embedding, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+    return ids
+
+
+def delete_chunks_by_file(file_id: str) -> int:
+    with get_connection() as conn:
+        cur = conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+    return cur.rowcount
+
+
+def count_chunks_by_file(file_id: str) -> int:
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM chunks WHERE file_id = ?", (file_id,)).fetchone()[0]
+
+
+def get_file_embeddings(file_id: str) -> tuple[list[str], list[bytes]]:
+    """(chunk_ids, embedding BLOBs) of one file in chunk order."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, embedding FROM chunks WHERE file_id = ? AND embedding IS NOT NULL ORDER BY chunk_index",
+            (file_id,),
+        ).fetchall()
+    return [r["id"] for r in rows], [r["embedding"] for r in rows]
+
+
 def list_chunks_by_file(file_id: str) -> list[dict]:
     with get_connection() as conn:
         rows = conn.execute(
@@ -156,36 +329,394 @@ def list_chunks_by_file(file_id: str) -> list[dict]:
     return [dict(r) for r in rows]
 
 
-def search_chunks_by_embedding(file_ids: Optional[list], query_embedding: list, top_k: int) -> list[dict]:
-    """Return chunks with embedding stored; similarity done in Python (cosine). file_ids=None means all files."""
+def get_chunks_by_ids(chunk_ids: list[str]) -> list[dict]:
+    """Return chunks for the given ids in the same order; ids that no longer exist are skipped."""
+    if not chunk_ids:
+        return []
+    placeholders = ",".join("?" * len(chunk_ids))
     with get_connection() as conn:
-        if file_ids:
+        rows = conn.execute(
+            f"SELECT id, file_id, chunk_index, content FROM chunks WHERE id IN ({placeholders})",
+            chunk_ids,
+        ).fetchall()
+    by_id = {r["id"]: dict(r) for r in rows}
+    return [by_id[cid] for cid in chunk_ids if cid in by_id]
+
+
+def iter_file_embeddings():
+    """Yield (file_id, chunk_ids, embedding_blobs) per file that owns chunks, for rebuilding vector indexes."""
+    with get_connection() as conn:
+        file_ids = [
+            r["id"]
+            for r in conn.execute("SELECT id FROM files WHERE chunk_file_id IS NULL ORDER BY created_at").fetchall()
+        ]
+    for fid in file_ids:
+        chunk_ids, blobs = get_file_embeddings(fid)
+        yield fid, chunk_ids, blobs
+
+
+def search_chunks_by_embedding(
+    file_ids: Optional[list],
+    query_embedding: list,
+    top_k: int,
+    chunk_ids: Optional[list[str]] = None,
+) -> list[dict]:
+    """Return top_k chunks by cosine similarity, best first. file_ids=None means all files.
+
+    chunk_ids, when given, restricts the scan to those chunks (e.g. full-text candidates).
+    Only (id, embedding) is scanned; content is fetched for the winning ids alone.
+    """
+    with get_connection() as conn:
+        if chunk_ids is not None:
+            if not chunk_ids:
+                return []
+            placeholders = ",".join("?" * len(chunk_ids))
+            rows = conn.execute(
+                f"SELECT id, embedding FROM chunks WHERE id IN ({placeholders}) AND embedding IS NOT NULL",
+                chunk_ids,
+            ).fetchall()
+        elif file_ids:
             placeholders = ",".join("?" * len(file_ids))
             rows = conn.execute(
-                f"SELECT id, file_id, chunk_index, content, embedding FROM chunks WHERE file_id IN ({placeholders})",
+                f"SELECT id, embedding FROM chunks WHERE file_id IN ({placeholders}) AND embedding IS NOT NULL",
                 file_ids,
             ).fetchall()
         else:
+            rows = conn.execute("SELECT id, embedding FROM chunks WHERE embedding IS NOT NULL").fetchall()
+        SCANNED_CHUNKS.observe(len(rows), "vector")
+        ranked = cosine_top_k([r[1] for r in rows], query_embedding, top_k)
+        if not ranked:
+            return []
+        winner_ids = [rows[i][0] for i, _ in ranked]
+        placeholders = ",".join("?" * len(winner_ids))
+        hits = conn.execute(
+            f"SELECT id, file_id, chunk_index, content FROM chunks WHERE id IN ({placeholders})",
+            winner_ids,
+        ).fetchall()
+    by_id = {r["id"]: dict(r) for r in hits}
+    results = []
+    for cid, (_, score) in zip(winner_ids, ranked):
+        if cid in by_id:
+            results.append({**by_id[cid], "score": score})
+    return results
+
+
+def add_chunk_codes(file_id: str, chunk_ids: list[str], codes: list[bytes]) -> None:
+    """Store the coarse-scan codes of chunks of file_id (replacing any they had)."""
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunk_codes (chunk_id, file_id, code) VALUES (?, ?, ?)",
+            ((cid, file_id, code) for cid, code in zip(chunk_ids, codes)),
+        )
+
+
+def delete_chunk_codes(file_id: Optional[str] = None) -> int:
+    """Drop the codes of one file's chunks, or of all chunks; returns codes deleted."""
+    with get_connection() as conn:
+        if file_id is None:
+            return conn.execute("DELETE FROM chunk_codes").rowcount
+        return conn.execute("DELETE FROM chunk_codes WHERE file_id = ?", (file_id,)).rowcount
+
+
+def search_chunks_by_code(
+    file_ids: Optional[list],
+    query_embedding: list,
+    top_k: int,
+    codec: str,
+    candidates: int,
+) -> list[dict]:
+    """Top_k chunks by cosine similarity, best first, scanning chunk_codes instead of embeddings.
+
+    The best `candidates` by code are rescored against their float32 embedding. Files
+    whose chunks have no codes yet (indexed before EMBEDDING_STORAGE was set) are
+    scanned exactly, so results never silently omit them.
+    """
+    scope, params = "", list(file_ids or [])
+    if file_ids:
+        scope = f" AND f.id IN ({','.join('?' * len(file_ids))})"
+    with get_connection() as conn:
+        uncoded = [
+            r[0]
+            for r in conn.execute(
+                f"""SELECT f.id FROM files f WHERE f.chunk_file_id IS NULL{scope}
+                    AND NOT EXISTS (SELECT 1 FROM chunk_codes q WHERE q.file_id = f.id)""",
+                params,
+            ).fetchall()
+        ]
+        if file_ids:
+            placeholders = ",".join("?" * len(file_ids))
             rows = conn.execute(
-                "SELECT id, file_id, chunk_index, content, embedding FROM chunks",
+                f"SELECT chunk_id, code FROM chunk_codes WHERE file_id IN ({placeholders})", file_ids,
             ).fetchall()
-    # Cosine similarity in Python (simple; for production use faiss/sqlite-vec)
-    import math
-    results = []
-    for r in rows:
-        emb = r["embedding"]
-        if emb is None:
-            continue
-        # Assume embedding stored as bytes of float32 array
-        try:
-            import struct
-            vec = list(struct.unpack(f"{len(emb)//4}f", emb))
-        except Exception:
-            continue
-        dot = sum(a * b for a, b in zip(query_embedding, vec))
-        norm_q = math.sqrt(sum(x * x for x in query_embedding)) or 1e-9
-        norm_v = math.sqrt(sum(x * x for x in vec)) or 1e-9
-        score = dot / (norm_q * norm_v)
-        results.append((score, dict(r)))
-    results.sort(key=lambda x: -x[0])
-    return [r[1] for r in results[:top_k]]
+        else:
+            rows = conn.execute("SELECT chunk_id, code FROM chunk_codes").fetchall()
+        SCANNED_CHUNKS.observe(len(rows), codec)
+        shortlist = [rows[i][0] for i, _ in code_top_k([r[1] for r in rows], query_embedding, candidates, codec)]
+        results = []
+        if shortlist:
+            placeholders = ",".join("?" * len(shortlist))
+            hits = conn.execute(
+                f"SELECT id, file_id, chunk_index, content, embedding FROM chunks WHERE id IN ({placeholders})",
+                shortlist,
+            ).fetchall()
+            for i, score in cosine_top_k([h["embedding"] for h in hits], query_embedding, top_k):
+                hit = dict(hits[i])
+                del hit["embedding"]
+                results.append({**hit, "score": score})
+        if uncoded:
+            results += search_chunks_by_embedding(uncoded, query_embedding, top_k)
+            results.sort(key=lambda r: -r["score"])
+    return results[:top_k]
+
+
+def search_chunks_fts(match: str, file_ids: Optional[list], limit: int) -> list[str]:
+    """Chunk ids matching an FTS5 expression, best BM25 first. file_ids=None means all files."""
+    sql = (
+        "SELECT c.id FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid"
+        " WHERE chunks_fts MATCH ?"
+    )
+    params: list = [match]
+    if file_ids:
+        sql += f" AND c.file_id IN ({','.join('?' * len(file_ids))})"
+        params.extend(file_ids)
+    sql += " ORDER BY chunks_fts.rank LIMIT ?"
+    params.append(limit)
+    with get_connection() as conn:
+        return [r[0] for r in conn.execute(sql, params).fetchall()]
+
+
+def rebuild_chunks_fts() -> int:
+    """Re-index all chunk text (e.g. after VACUUM renumbered rowids); returns chunks indexed."""
+    with get_connection() as conn:
+        conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+        return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+# Embedding cache
+def get_cached_embeddings(namespace: str, text_hashes: list[str], touch_interval: float = 0.0) -> dict[str, bytes]:
+    """Return {text_hash: embedding BLOB} for the hashes present, and mark them used.
+
+    Only rows last marked more than touch_interval seconds ago are updated, so repeated
+    hits stay reads and don't take the write lock.
+    """
+    if not text_hashes:
+        return {}
+    placeholders = ",".join("?" * len(text_hashes))
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"""SELECT text_hash, embedding, last_used_at FROM embedding_cache
+                WHERE namespace = ? AND text_hash IN ({placeholders})""",
+            [namespace, *text_hashes],
+        ).fetchall()
+        now = datetime.now(timezone.utc)
+        cutoff = (now - timedelta(seconds=touch_interval)).isoformat()
+        stale = [r["text_hash"] for r in rows if r["last_used_at"] <= cutoff]
+        if stale:
+            conn.executemany(
+                "UPDATE embedding_cache SET last_used_at = ? WHERE namespace = ? AND text_hash = ?",
+                [(now.isoformat(), namespace, h) for h in stale],
+            )
+    return {r["text_hash"]: r["embedding"] for r in rows}
+
+
+def put_cached_embeddings(namespace: str, items: list[tuple[str, bytes]]) -> None:
+    """Upsert (text_hash, embedding BLOB) pairs."""
+    now = _now_iso()
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO embedding_cache (namespace, text_hash, embedding, last_used_at) VALUES (?, ?, ?, ?)",
+            [(namespace, h, blob, now) for h, blob in items],
+        )
+
+
+def count_cached_embeddings() -> int:
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+
+def evict_cached_embeddings(count: int) -> int:
+    """Delete the count least recently used cache rows; returns rows deleted."""
+    with get_connection() as conn:
+        cur = conn.execute(
+            """DELETE FROM embedding_cache WHERE (namespace, text_hash) IN (
+                 SELECT namespace, text_hash FROM embedding_cache ORDER BY last_used_at LIMIT ?
+               )""",
+            (count,),
+        )
+    return cur.rowcount
+
+
+# Index jobs
+_JOB_COLUMNS = "id, file_id, status, attempts, last_error, run_after, created_at, updated_at"
+
+
+def create_index_job(file_id: str) -> dict:
+    jid = str(uuid.uuid4())
+    now = _now_iso()
+    with get_connection() as conn:
+        conn.execute(
+            f"INSERT INTO index_jobs ({_JOB_COLUMNS}) VALUES (?, ?, 'queued', 0, NULL, ?, ?, ?)",
+            (jid, file_id, now, now, now),
+        )
+    return {
+        "id": jid, "file_id": file_id, "status": "queued", "attempts": 0, "last_error": None,
+        "run_after": now, "created_at": now, "updated_at": now,
+    }
+
+
+def get_latest_index_job(file_id: str) -> Optional[dict]:
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {_JOB_COLUMNS} FROM index_jobs WHERE file_id = ? ORDER BY created_at DESC LIMIT 1",
+            (file_id,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def claim_index_job() -> Optional[dict]:
+    """Mark the oldest due queued job running and return it (attempts already incremented), or None.
+
+    The conditional UPDATE makes the claim safe when several workers race for one job.
+    """
+    now = _now_iso()
+    with get_connection() as conn:
+        row = conn.execute(
+            """SELECT id FROM index_jobs WHERE status = 'queued' AND run_after <= ?
+               ORDER BY run_after LIMIT 1""",
+            (now,),
+        ).fetchone()
+        if row is None:
+            return None
+        cur = conn.execute(
+            """UPDATE index_jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+               WHERE id = ? AND status = 'queued'""",
+            (now, row["id"]),
+        )
+        if cur.rowcount != 1:
+            return None
+        job = conn.execute(f"SELECT {_JOB_COLUMNS} FROM index_jobs WHERE id = ?", (row["id"],)).fetchone()
+    return dict(job)
+
+
+def finish_index_job(job_id: str, status: str, error: Optional[str] = None, run_after: Optional[str] = None) -> None:
+    """Move a running job to status ('indexed', 'failed', or 'queued' again with a later run_after)."""
+    now = _now_iso()
+    with get_connection() as conn:
+        conn.execute(
+            """UPDATE index_jobs SET status = ?, last_error = ?, run_after = COALESCE(?, run_after), updated_at = ?
+               WHERE id = ?""",
+            (status, error, run_after, now, job_id),
+        )
+
+
+def renew_index_job(job_id: str) -> None:
+    """Extend a running job's lease (its updated_at)."""
+    with get_connection() as conn:
+        conn.execute("UPDATE index_jobs SET updated_at = ? WHERE id = ? AND status = 'running'", (_now_iso(), job_id))
+
+
+def requeue_running_index_jobs(stale_before: str) -> int:
+    """Put 'running' jobs whose lease was last renewed before stale_before back in the queue.
+
+    Jobs renewed since are still owned by a live worker, possibly in another process.
+    Returns jobs requeued.
+    """
+    now = _now_iso()
+    with get_connection() as conn:
+        cur = conn.execute(
+            """UPDATE index_jobs SET status = 'queued', run_after = ?, updated_at = ?
+               WHERE status = 'running' AND updated_at < ?""",
+            (now, now, stale_before),
+        )
+    return cur.rowcount
+
+
+# Retention: candidates for garbage collection, listed in bounded batches (limit -1 = all)
+def list_idle_sessions(before: str, limit: int) -> list[str]:
+    """Sessions whose latest message (or creation, if none) is older than before."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT id FROM sessions WHERE last_message_at < ? ORDER BY last_message_at LIMIT ?",
+            (before, limit),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def list_unattached_files(before: str, limit: int) -> list[str]:
+    """Files uploaded without a session before the given time and not being indexed right now."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            """SELECT f.id FROM files f
+               WHERE f.session_id IS NULL AND f.created_at < ?
+                 AND NOT EXISTS (SELECT 1 FROM index_jobs j WHERE j.file_id = f.id AND j.status = 'running')
+               ORDER BY f.created_at LIMIT ?""",
+            (before, limit),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def list_orphan_files(limit: int) -> list[str]:
+    """Files that name a session which no longer exists."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            """SELECT f.id FROM files f LEFT JOIN sessions s ON s.id = f.session_id
+               WHERE f.session_id IS NOT NULL AND s.id IS NULL LIMIT ?""",
+            (limit,),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def list_orphan_chunk_file_ids(limit: int) -> list[str]:
+    """File ids that chunks are stored under but that have no files row."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            """SELECT DISTINCT c.file_id FROM chunks c LEFT JOIN files f ON f.id = c.file_id
+               WHERE f.id IS NULL LIMIT ?""",
+            (limit,),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def delete_chunk_batch(file_id: str, limit: int, unshared_only: bool = False) -> int:
+    """Delete up to limit chunks of file_id in one short transaction; returns chunks deleted.
+
+    unshared_only skips the delete while any duplicate upload still references the chunks.
+    """
+    sql = "DELETE FROM chunks WHERE rowid IN (SELECT rowid FROM chunks WHERE file_id = ? LIMIT ?)"
+    params: tuple = (file_id, limit)
+    if unshared_only:
+        sql += " AND NOT EXISTS (SELECT 1 FROM files WHERE chunk_file_id = ?)"
+        params += (file_id,)
+    with get_connection() as conn:
+        return conn.execute(sql, params).rowcount
+
+
+def delete_orphan_index_jobs(limit: int) -> int:
+    """Delete up to limit jobs whose file no longer exists; returns jobs deleted."""
+    with get_connection() as conn:
+        return conn.execute(
+            """DELETE FROM index_jobs WHERE rowid IN (
+                 SELECT j.rowid FROM index_jobs j LEFT JOIN files f ON f.id = j.file_id
+                 WHERE f.id IS NULL LIMIT ?
+               )""",
+            (limit,),
+        ).rowcount
+
+
+def count_orphan_index_jobs() -> int:
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM index_jobs j LEFT JOIN files f ON f.id = j.file_id WHERE f.id IS NULL"
+        ).fetchone()[0]
+
+
+def file_path_in_use(path: str) -> bool:
+    """True if any files row stores its upload at path."""
+    with get_connection() as conn:
+        return conn.execute("SELECT 1 FROM files WHERE path = ? LIMIT 1", (path,)).fetchone() is not None
+
+
+def list_file_paths() -> set[str]:
+    """Every upload path a files row points at."""
+    with get_connection() as conn:
+        return {r[0] for r in conn.execute("SELECT DISTINCT path FROM files").fetchall()}
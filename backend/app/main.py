@@ -9,12 +9,17 @@ except ImportError:
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
 from backend.app.api.routes_chat import router as chat_router
 from backend.app.api.routes_files import router as files_router
 from backend.app.api.routes_session import router as session_router
-from backend.app.db.database import init_db
+from backend.app.core import metrics
+from backend.app.core.http_clients import aclose_clients
+from backend.app.db.database import close_pool, init_db
+from backend.app.services import index_service, retention_service
+from backend.app.utils import file_parser
 
 app = FastAPI(title="Chatbox API", version="0.1.0")
 
@@ -33,6 +38,17 @@ app.include_router(files_router)
 @app.on_event("startup")
 def startup():
     init_db()
+    index_service.start_workers()
+    retention_service.start_background()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    retention_service.stop_background()
+    index_service.stop_workers()
+    file_parser.shutdown_pool()
+    await aclose_clients()
+    close_pool()
 
 
 @app.get("/health")
@@ -40,6 +56,12 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Latency and size histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Project root = parent of backend/
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 frontend_path = PROJECT_ROOT / "frontend"
@@ -1,12 +1,95 @@
 """Chat flow: save message, optional RAG, LLM, save reply."""
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+
+from backend.app.core import metrics
 from backend.app.core.llm_client import get_llm_client
-from backend.app.core.prompt_builder import build_chat_prompt, build_rag_prompt
+from backend.app.core.prompt_builder import build_budgeted_prompt
 from backend.app.db import repo
 from backend.app.services import rag_service
 
+logger = logging.getLogger(__name__)
+
+
+def _open_turn(session_id: str, message: str) -> list[dict]:
+    """Check the session and save the user message; return the history before it.
+
+    One transaction and one commit; the assistant reply is saved by a second one.
+    """
+    with repo.transaction(write=True):
+        if not repo.get_session(session_id):
+            raise ValueError("session not found")
+
+        # Read recent history before writing latest user message, so prompt is not duplicated.
+        history = repo.list_messages(session_id=session_id, limit=20)
+        # If this is the first message, use it as the session title for the list.
+        if not history:
+            repo.update_session_title(session_id, message)
+        repo.add_message(session_id=session_id, role="user", content=message)
+    return history
+
+
+def _build_prompt(message: str, history: list[dict], hits: list[dict] | None) -> tuple[list[dict], list[dict] | None]:
+    """Budgeted messages for this turn; returns (messages, the hits that made it into the prompt)."""
+    built = build_budgeted_prompt(
+        user_message=message,
+        history_messages=history,
+        context_chunks=[h["content"] for h in hits] if hits is not None else None,
+    )
+    if built.truncated:
+        logger.info(
+            "prompt trimmed to %d tokens: dropped %d history messages, %d context chunks",
+            built.tokens, built.dropped_history, built.dropped_context,
+        )
+    if hits is None:
+        return built.messages, None
+    return built.messages, [hits[i] for i in built.context_indices]
+
+
+def _citations(hits: list[dict] | None) -> list[dict]:
+    return [{"file_id": h["file_id"], "chunk_id": h["chunk_id"]} for h in hits or []]
+
+
+def _usage(resp) -> dict:
+    return _observed({"prompt": resp.prompt_tokens, "completion": resp.completion_tokens, "cached": resp.cached_tokens})
 
+
+def _observed(usage: dict) -> dict:
+    for kind, tokens in usage.items():
+        metrics.LLM_TOKENS.observe(tokens, kind)
+    return usage
+
+
+def _begin_turn(
+    session_id: str,
+    message: str,
+    use_rag: bool,
+    file_ids: list[str] | None,
+) -> tuple[list[dict], list[dict] | None]:
+    """Save the user message and build the prompt; return (messages, hits used, or None without RAG)."""
+    history = _open_turn(session_id, message)
+    # Retrieve once per turn; the same hits feed the prompt and the citations.
+    hits = rag_service.retrieve(query=message, file_ids=file_ids) if use_rag and file_ids else None
+    return _build_prompt(message, history, hits)
+
+
+async def _abegin_turn(
+    session_id: str,
+    message: str,
+    use_rag: bool,
+    file_ids: list[str] | None,
+) -> tuple[list[dict], list[dict] | None]:
+    """Async _begin_turn(): SQLite work runs in a worker thread, the event loop is never blocked."""
+    history = await asyncio.to_thread(_open_turn, session_id, message)
+    hits = await rag_service.aretrieve(query=message, file_ids=file_ids) if use_rag and file_ids else None
+    return _build_prompt(message, history, hits)
+
+
+@metrics.timed("chat")
 def chat(
     session_id: str,
     message: str,
@@ -14,33 +97,89 @@ def chat(
     file_ids: list[str] | None = None,
 ) -> dict:
     """Save user message, optionally retrieve context, call LLM, save assistant message, return reply."""
-    if not repo.get_session(session_id):
-        raise ValueError("session not found")
-
-    # Read recent history before writing latest user message, so prompt is not duplicated.
-    history = repo.list_messages(session_id=session_id, limit=20)
-    # If this is the first message, use it as the session title for the list.
-    if not history:
-        repo.update_session_title(session_id, message)
-    repo.add_message(session_id=session_id, role="user", content=message)
-    if use_rag and file_ids:
-        context_chunks = rag_service.get_context_chunks(query=message, file_ids=file_ids)
-        prompt = build_rag_prompt(
-            user_message=message,
-            context_chunks=context_chunks,
-            history_messages=history,
-        )
-    else:
-        prompt = build_chat_prompt(user_message=message, history_messages=history)
+    messages, hits = _begin_turn(session_id, message, use_rag, file_ids)
     client = get_llm_client()
-    resp = client.complete(prompt)
+    with metrics.stage("llm"):
+        resp = client.chat(messages)
     repo.add_message(session_id=session_id, role="assistant", content=resp.content)
-    citations = []
-    if use_rag and file_ids:
-        hits = rag_service.retrieve(query=message, file_ids=file_ids, top_k=5)
-        citations = [{"file_id": h["file_id"], "chunk_id": h["chunk_id"]} for h in hits]
     return {
         "assistant_message": resp.content,
-        "citations": citations,
-        "token_usage": {"prompt": resp.prompt_tokens, "completion": resp.completion_tokens},
+        "citations": _citations(hits),
+        "token_usage": _usage(resp),
     }
+
+
+@metrics.timed("chat")
+async def achat(
+    session_id: str,
+    message: str,
+    use_rag: bool = False,
+    file_ids: list[str] | None = None,
+) -> dict:
+    """Async chat(): waiting on the provider does not hold a worker thread."""
+    messages, hits = await _abegin_turn(session_id, message, use_rag, file_ids)
+    with metrics.stage("llm"):
+        resp = await get_llm_client().achat(messages)
+    await asyncio.to_thread(repo.add_message, session_id=session_id, role="assistant", content=resp.content)
+    return {
+        "assistant_message": resp.content,
+        "citations": _citations(hits),
+        "token_usage": _usage(resp),
+    }
+
+
+async def achat_stream(
+    session_id: str,
+    message: str,
+    use_rag: bool = False,
+    file_ids: list[str] | None = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """Like achat(), but return an async iterator of (event, data) pairs as the reply is generated.
+
+    Session checks, the user message and retrieval happen before this returns, so
+    errors such as "session not found" are raised here rather than mid-stream.
+    Events: ``token`` {delta} ..., then ``citations`` {citations}, then ``done``
+    {assistant_message, token_usage}. The assistant message is saved once the
+    stream completes.
+    """
+    messages, hits = await _abegin_turn(session_id, message, use_rag, file_ids)
+    return _astream_reply(session_id, messages, hits)
+
+
+class _ReplyAccumulator:
+    def __init__(self):
+        self.parts: list[str] = []
+        self.usage = {"prompt": 0, "completion": 0, "cached": 0}
+        self.started = time.perf_counter()
+
+    def add(self, chunk) -> None:
+        if chunk.delta:
+            if not self.parts:
+                metrics.LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - self.started)
+            self.parts.append(chunk.delta)
+        self.usage["prompt"] = chunk.prompt_tokens or self.usage["prompt"]
+        self.usage["completion"] = chunk.completion_tokens or self.usage["completion"]
+        self.usage["cached"] = chunk.cached_tokens or self.usage["cached"]
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+    def finish(self) -> None:
+        """Record the stream's duration and token counts (the llm stage)."""
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - self.started, "llm")
+        _observed(self.usage)
+
+
+async def _astream_reply(
+    session_id: str, messages: list[dict], hits: list[dict] | None
+) -> AsyncIterator[tuple[str, dict]]:
+    reply = _ReplyAccumulator()
+    async for chunk in get_llm_client().achat_stream(messages):
+        reply.add(chunk)
+        if chunk.delta:
+            yield "token", {"delta": chunk.delta}
+    reply.finish()
+    await asyncio.to_thread(repo.add_message, session_id=session_id, role="assistant", content=reply.content)
+    yield "citations", {"citations": _citations(hits)}
+    yield "done", {"assistant_message": reply.content, "token_usage": reply.usage}
@@ -0,0 +1,87 @@
+"""Uploaded files: content-addressed storage and sharing of already-indexed duplicates."""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+
+from backend.app.core.config import UPLOADS_DIR
+from backend.app.db import repo
+from backend.app.services import index_service, rag_service
+
+logger = logging.getLogger(__name__)
+
+# Serializes "reuse this blob + add a row pointing at it" against "no row points at it, unlink",
+# so a duplicate upload never adopts a blob that a concurrent delete is about to remove.
+_blob_lock = threading.Lock()
+
+
+def blob_path(content_hash: str, suffix: str) -> Path:
+    """Where an upload with this SHA-256 is stored; identical uploads share one blob."""
+    return UPLOADS_DIR / f"{content_hash}{suffix.lower()}"
+
+
+def store_upload(
+    tmp_path: Path,
+    filename: str,
+    content_hash: str,
+    size_bytes: int,
+    mime_type: str | None = None,
+    session_id: str | None = None,
+) -> dict:
+    """Register a fully received upload at tmp_path; returns {"file", "status", "job_id", "deduplicated"}.
+
+    A file whose content was already indexed (or is being indexed) gets a new files row
+    that references the original's chunks, and no indexing job.
+    """
+    path = blob_path(content_hash, Path(filename).suffix)
+    with _blob_lock:
+        try:
+            # Fresh mtime: the retention sweep leaves recently touched blobs alone. Unlike
+            # touch(), utime() fails rather than leaving an empty file if the blob just went.
+            os.utime(path)
+        except FileNotFoundError:
+            tmp_path.replace(path)
+        else:
+            tmp_path.unlink(missing_ok=True)
+        original = repo.find_shareable_file(content_hash)
+        rec = repo.create_file(
+            filename=filename,
+            path=str(path),
+            mime_type=mime_type,
+            session_id=session_id,
+            content_hash=content_hash,
+            size_bytes=size_bytes,
+            chunk_file_id=original["id"] if original else None,
+        )
+    if original is not None:
+        status = index_service.file_status(rec["id"])["status"]
+        return {"file": rec, "status": status, "job_id": None, "deduplicated": True}
+    job = index_service.enqueue(rec["id"])
+    return {"file": rec, "status": job["status"], "job_id": job["id"], "deduplicated": False}
+
+
+def delete_files(file_ids: list[str]) -> dict:
+    """Delete files, their unshared chunks and unreferenced blobs; returns repo.delete_files()'s result."""
+    result = repo.delete_files(file_ids)
+    rag_service.forget_files(result["file_ids"])
+    rag_service.transfer_files(result["transferred"])
+    remove_blobs(result["orphaned_paths"])
+    return result
+
+
+def remove_blobs(paths: list[str]) -> None:
+    """Delete upload blobs that no files row references any more.
+
+    References are checked again under the blob lock: a duplicate upload may have adopted
+    the blob since the rows that pointed at it were deleted.
+    """
+    for path in paths:
+        with _blob_lock:
+            if repo.file_path_in_use(path):
+                continue
+            try:
+                Path(path).unlink(missing_ok=True)
+            except OSError:
+                logger.exception("could not remove upload %s", path)
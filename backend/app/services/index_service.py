@@ -0,0 +1,193 @@
+"""Background indexing: a persistent job queue in SQLite drained by worker threads.
+
+Job states: queued -> running -> indexed | failed. A failed attempt goes back to
+queued with an exponential backoff until INDEX_MAX_ATTEMPTS is reached. A running job
+holds a lease that its worker renews; jobs whose lease expired (the process died) are
+queued again.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from backend.app.core.config import (
+    INDEX_LEASE_SECONDS,
+    INDEX_MAX_ATTEMPTS,
+    INDEX_POLL_INTERVAL,
+    INDEX_RETRY_BASE_SECONDS,
+    INDEX_WORKERS,
+)
+from backend.app.db import repo
+from backend.app.services import rag_service
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(file_id: str) -> dict:
+    """Queue file_id for indexing and wake a worker; returns the job."""
+    job = repo.create_index_job(file_id)
+    if _pool is not None:
+        _pool.notify()
+    return job
+
+
+def file_status(file_id: str) -> dict | None:
+    """Indexing status of a file, or None if the file does not exist.
+
+    Duplicate uploads report the status of the file whose chunks they share.
+    """
+    f = repo.get_file(file_id)
+    if f is None:
+        return None
+    owner_id = f["chunk_file_id"] or f["id"]
+    job = repo.get_latest_index_job(owner_id)
+    chunks = repo.count_chunks_by_file(owner_id)
+    if job is None:
+        # Uploaded before the job queue existed: indexed inline, or not at all.
+        status, attempts, error = ("indexed" if chunks else "uploaded"), 0, None
+    else:
+        status, attempts, error = job["status"], job["attempts"], job["last_error"]
+    return {
+        "file_id": f["id"],
+        "filename": f["filename"],
+        "status": status,
+        "attempts": attempts,
+        "error": error,
+        "chunks": chunks if status == "indexed" else 0,
+        "shared_from": f["chunk_file_id"],
+        "created_at": f["created_at"],
+    }
+
+
+def process_next_job() -> bool:
+    """Claim and run one due job; returns False when nothing was due."""
+    job = repo.claim_index_job()
+    if job is None:
+        return False
+    _run(job)
+    return True
+
+
+def requeue_expired() -> int:
+    """Queue again the running jobs whose lease expired; returns jobs requeued."""
+    stale_before = (datetime.now(timezone.utc) - timedelta(seconds=INDEX_LEASE_SECONDS)).isoformat()
+    requeued = repo.requeue_running_index_jobs(stale_before)
+    if requeued:
+        logger.info("requeued %d indexing jobs with expired leases", requeued)
+    return requeued
+
+
+@contextmanager
+def _lease(job_id: str):
+    """Renew the job's lease from a helper thread while the block runs."""
+    done = threading.Event()
+
+    def renew() -> None:
+        while not done.wait(INDEX_LEASE_SECONDS / 3):
+            try:
+                repo.renew_index_job(job_id)
+            except Exception:
+                logger.exception("could not renew lease of indexing job %s", job_id)
+
+    t = threading.Thread(target=renew, name=f"index-lease-{job_id[:8]}", daemon=True)
+    t.start()
+    try:
+        yield
+    finally:
+        done.set()
+        t.join()
+
+
+def _run(job: dict) -> None:
+    file_id = job["file_id"]
+    f = repo.get_file(file_id)
+    if f is None:
+        repo.finish_index_job(job["id"], "failed", "file not found")
+        return
+    try:
+        # An earlier attempt may have committed chunks before its process stopped.
+        with _lease(job["id"]):
+            if repo.delete_chunks_by_file(file_id):
+                rag_service.forget_files([file_id])
+            rag_service.index_file(file_id=file_id, file_path=f["path"])
+    except Exception as e:
+        logger.exception("indexing attempt %d failed for file %s", job["attempts"], file_id)
+        if job["attempts"] >= INDEX_MAX_ATTEMPTS:
+            # Never leave a half-indexed file searchable: drop the windows already committed.
+            repo.delete_chunks_by_file(file_id)
+            rag_service.forget_files([file_id])
+            repo.finish_index_job(job["id"], "failed", str(e))
+        else:
+            delay = INDEX_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+            run_after = (datetime.now(timezone.utc) + timedelta(seconds=delay)).isoformat()
+            repo.finish_index_job(job["id"], "queued", str(e), run_after=run_after)
+    else:
+        repo.finish_index_job(job["id"], "indexed")
+
+
+class IndexWorkerPool:
+    """Daemon threads that drain the job queue, waking on notify() or every poll_interval."""
+
+    def __init__(self, workers: int, poll_interval: float = INDEX_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"index-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    def _loop(self) -> None:
+        next_sweep = time.monotonic() + INDEX_LEASE_SECONDS
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + INDEX_LEASE_SECONDS
+                    requeue_expired()
+                if process_next_job():
+                    continue
+            except Exception:
+                logger.exception("index worker error")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+_pool: IndexWorkerPool | None = None
+
+
+def start_workers(workers: int | None = None) -> None:
+    """Requeue jobs whose lease expired, then start the worker threads (app startup).
+
+    Running jobs with a live lease are left alone: another process may still be indexing them.
+    """
+    global _pool
+    requeue_expired()
+    n = INDEX_WORKERS if workers is None else workers
+    if _pool is not None or n <= 0:
+        return
+    _pool = IndexWorkerPool(n)
+    _pool.start()
+
+
+def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
@@ -1,37 +1,345 @@
 """RAG: file parse, chunk, embed, index, and retrieve."""
 from __future__ import annotations
 
-from backend.app.core.chunker import chunk_text
-from backend.app.core.config import RAG_TOP_K, UPLOADS_DIR
-from backend.app.core.embeddings import get_embedding, embedding_to_bytes
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+
+from backend.app.core import metrics
+from backend.app.core.ann_index import get_ann_index
+from backend.app.core.chunker import chunk_stream
+from backend.app.core.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_STORAGE,
+    RAG_CACHE_SIZE,
+    RAG_CACHE_TTL,
+    RAG_FTS_CANDIDATES,
+    RAG_FTS_PREFILTER,
+    RAG_RESCORE_FACTOR,
+    RAG_RETRIEVAL_MODE,
+    RAG_RRF_K,
+    RAG_TOP_K,
+    UPLOADS_DIR,
+)
+from backend.app.core.embeddings import get_embedding
+from backend.app.core.hybrid_search import fts_query, reciprocal_rank_fusion
+from backend.app.core.vector_search import CODECS, blobs_to_matrix, encode_codes, normalize_rows
 from backend.app.db import repo
-from backend.app.utils.file_parser import parse_file
+from backend.app.utils.file_parser import iter_text_segments
+
+logger = logging.getLogger(__name__)
+
+
+class _RetrievalCache:
+    """LRU of retrieval results keyed by (query, sorted file_ids, top_k), invalidated per file."""
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, tuple[float, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str, file_ids: list[str] | None, top_k: int) -> tuple:
+        return (query, tuple(sorted(set(file_ids))) if file_ids else None, top_k)
 
+    def get(self, key: tuple) -> list[dict] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return [dict(h) for h in entry[1]]
 
+    def put(self, key: tuple, hits: list[dict]) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, [dict(h) for h in hits])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, file_ids: list[str] | None = None) -> None:
+        """Drop entries that searched any of file_ids (or all files); None clears everything."""
+        with self._lock:
+            if file_ids is None:
+                self._entries.clear()
+                return
+            changed = set(file_ids)
+            for key in [k for k in self._entries if k[1] is None or changed.intersection(k[1])]:
+                del self._entries[key]
+
+
+_retrieval_cache = _RetrievalCache(RAG_CACHE_SIZE, RAG_CACHE_TTL)
+
+
+@metrics.timed("index_file")
 def index_file(file_id: str, file_path: str) -> None:
-    """Parse file, chunk, embed, and store chunks."""
-    text = parse_file(file_path)
-    chunks = chunk_text(text)
+    """Parse, chunk, embed and store a file, one window of chunks at a time.
+
+    Pages stream from the parser through the chunker, so memory is bounded by a window
+    of chunks (plus the float32 vectors kept for the ANN index), not by the document.
+    """
+    chunks = chunk_stream(iter_text_segments(file_path))
     emb = get_embedding()
-    for i, content in enumerate(chunks):
-        vec = emb.embed(content)
-        blob = embedding_to_bytes(vec)
-        repo.add_chunk(file_id=file_id, chunk_index=i, content=content, embedding=blob)
+    # Each window is large enough for the embedder to keep all of its concurrent batches busy.
+    window = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
+    chunk_ids: list[str] = []
+    vectors: list[np.ndarray] = []
+    while batch := list(islice(chunks, window)):
+        # Embed before opening the write transaction so network time never holds the DB lock.
+        batch_vectors = emb.embed_batch(batch)
+        # Stored unit-length, so a search scores rows by dot product alone.
+        matrix = normalize_rows(np.array(batch_vectors, dtype=np.float32, ndmin=2))
+        codec = _storage_codec()
+        codes = encode_codes(matrix, codec) if codec else None
+        with repo.transaction(write=True):
+            ids = repo.add_chunks(
+                file_id,
+                ((content, row.tobytes()) for content, row in zip(batch, matrix)),
+                start_index=len(chunk_ids),
+            )
+            if codes is not None:
+                repo.add_chunk_codes(file_id, ids, codes)
+        chunk_ids.extend(ids)
+        vectors.append(matrix)
+    metrics.INDEXED_CHUNKS.observe(len(chunk_ids))
+    if chunk_ids:
+        _add_to_ann_index(file_id, chunk_ids, np.vstack(vectors))
+    _retrieval_cache.invalidate([file_id])
+
+
+def _add_to_ann_index(file_id: str, chunk_ids: list[str], vectors: list[list[float]]) -> None:
+    # SQLite is the source of truth; a failed index update only means exact-scan fallback.
+    index = get_ann_index()
+    if index is None:
+        return
+    try:
+        index.add(file_id, chunk_ids, vectors)
+    except Exception:
+        logger.exception("ANN index update failed for file %s", file_id)
+
+
+def forget_files(file_ids: list[str]) -> None:
+    """Drop deleted files from the ANN index and the retrieval cache."""
+    if not file_ids:
+        return
+    _retrieval_cache.invalidate(file_ids)
+    index = get_ann_index()
+    if index is not None:
+        index.remove_files(file_ids)
+
+
+def transfer_files(transferred: dict[str, str]) -> None:
+    """Re-key index entries after chunk ownership moved from old to new file ids."""
+    if not transferred:
+        return
+    _retrieval_cache.invalidate(list(transferred) + list(transferred.values()))
+    index = get_ann_index()
+    if index is None:
+        return
+    index.remove_files(list(transferred))
+    for new_owner in transferred.values():
+        chunk_ids, blobs = repo.get_file_embeddings(new_owner)
+        if chunk_ids:
+            vectors = blobs_to_matrix(blobs, len(blobs[0]) // 4)
+            _add_to_ann_index(new_owner, chunk_ids, vectors)
+
+
+def rebuild_ann_index(nlist: int | None = None) -> int:
+    """Rebuild the ANN index from all chunk embeddings in SQLite; returns vectors indexed."""
+    index = get_ann_index()
+    if index is None:
+        raise RuntimeError("ANN index is disabled (ANN_ENABLED=0)")
+
+    # Only vectors of the current embedder's dimension can be compared with its queries.
+    # Its declared dim, not a probe embedding: the rebuild must work offline.
+    width = 4 * get_embedding().dim
+
+    def records():
+        for file_id, chunk_ids, blobs in repo.iter_file_embeddings():
+            keep = [i for i, b in enumerate(blobs) if len(b) == width]
+            yield (
+                file_id,
+                [chunk_ids[i] for i in keep],
+                blobs_to_matrix([blobs[i] for i in keep], width // 4),
+            )
+
+    count = index.rebuild(records(), nlist=nlist)
+    _retrieval_cache.invalidate()
+    return count
+
+
+def _storage_codec() -> str | None:
+    """Codec of the coarse-scan codes, or None when none are kept.
+
+    Codes only back the SQLite scan; with the ANN index enabled vector queries are answered
+    from it, so codes would cost storage and writes without ever being read.
+    """
+    if EMBEDDING_STORAGE in CODECS and get_ann_index() is None:
+        return EMBEDDING_STORAGE
+    return None
 
 
+def requantize(codec: str | None = None) -> int:
+    """Re-encode the coarse-scan codes of all chunks for codec (default EMBEDDING_STORAGE).
+
+    "float32" drops the codes. Runs one file per transaction; returns chunks encoded.
+    """
+    codec = codec or EMBEDDING_STORAGE
+    if codec in CODECS and get_ann_index() is not None:
+        raise RuntimeError(f"{codec} codes are only scanned with the ANN index disabled (ANN_ENABLED=0)")
+    if codec not in CODECS:
+        repo.delete_chunk_codes()
+        _retrieval_cache.invalidate()
+        return 0
+    count = 0
+    for file_id, chunk_ids, blobs in repo.iter_file_embeddings():
+        # A file's chunks share the embedder that wrote them, hence one dimension.
+        keep = [i for i, b in enumerate(blobs) if len(b) == len(blobs[0])]
+        with repo.transaction(write=True):
+            repo.delete_chunk_codes(file_id)
+            if keep:
+                matrix = blobs_to_matrix([blobs[i] for i in keep], len(blobs[0]) // 4)
+                repo.add_chunk_codes(file_id, [chunk_ids[i] for i in keep], encode_codes(matrix, codec))
+        count += len(keep)
+    _retrieval_cache.invalidate()
+    return count
+
+
+@metrics.timed("retrieve")
 def retrieve(
     query: str,
     file_ids: list[str] | None = None,
     top_k: int | None = None,
 ) -> list[dict]:
-    """Embed query, search chunks, return top_k chunks with content."""
+    """Embed query, search chunks, return top_k chunks with content (cached per query/files/top_k).
+
+    In hybrid mode (RAG_RETRIEVAL_MODE) cosine and BM25 rankings are fused, so exact
+    identifiers in the query find their chunks even when embeddings rank them low.
+    """
     k = top_k or RAG_TOP_K
-    emb = get_embedding()
-    query_vec = emb.embed(query)
-    rows = repo.search_chunks_by_embedding(file_ids=file_ids, query_embedding=query_vec, top_k=k)
+    owners = _resolve_owners(file_ids)
+    if owners is not None and not owners:
+        return []
+    owner_ids = sorted(set(owners.values())) if owners else None
+    key = _RetrievalCache.key(query, owner_ids, k)
+    hits = _retrieval_cache.get(key)
+    if hits is None:
+        query_vec = get_embedding().embed(query)
+        hits = _search(query, query_vec, owner_ids, k)
+        _retrieval_cache.put(key, hits)
+    return _cite_requested(hits, owners)
+
+
+@metrics.timed("retrieve")
+async def aretrieve(
+    query: str,
+    file_ids: list[str] | None = None,
+    top_k: int | None = None,
+) -> list[dict]:
+    """Async retrieve(): the query is embedded natively, SQLite work runs in a worker thread."""
+    k = top_k or RAG_TOP_K
+    owners = await asyncio.to_thread(_resolve_owners, file_ids)
+    if owners is not None and not owners:
+        return []
+    owner_ids = sorted(set(owners.values())) if owners else None
+    key = _RetrievalCache.key(query, owner_ids, k)
+    hits = _retrieval_cache.get(key)
+    if hits is None:
+        query_vec = await get_embedding().aembed(query)
+        hits = await asyncio.to_thread(_search, query, query_vec, owner_ids, k)
+        _retrieval_cache.put(key, hits)
+    return _cite_requested(hits, owners)
+
+
+def _resolve_owners(file_ids: list[str] | None) -> dict[str, str] | None:
+    """{requested file id: file id its chunks are stored under}, or None to search every file."""
+    if not file_ids:
+        return None
+    return repo.resolve_chunk_file_ids(list(dict.fromkeys(file_ids)))
+
+
+def _cite_requested(hits: list[dict], owners: dict[str, str] | None) -> list[dict]:
+    # Duplicate uploads share their original's chunks; cite the file id the caller asked about.
+    if not owners:
+        return hits
+    requested: dict[str, str] = {}
+    for fid, owner in owners.items():
+        requested.setdefault(owner, fid)
+    return [{**h, "file_id": requested.get(h["file_id"], h["file_id"])} for h in hits]
+
+
+@metrics.timed("search")
+def _search(query: str, query_vec: list[float], file_ids: list[str] | None, k: int) -> list[dict]:
+    if RAG_RETRIEVAL_MODE == "hybrid":
+        rows = _hybrid_search(query, query_vec, file_ids, k)
+    else:
+        rows = _vector_search(query_vec, file_ids, k)
     return [{"file_id": r["file_id"], "chunk_id": r["id"], "content": r["content"]} for r in rows]
 
 
+def _vector_search(query_vec: list[float], file_ids: list[str] | None, k: int) -> list[dict]:
+    index = get_ann_index()
+    if index is not None and index.covers(file_ids, len(query_vec)):
+        # Over-fetch a little: ids deleted since the index was written are dropped here.
+        ranked = index.search(query_vec, top_k=2 * k, file_ids=file_ids)
+        return repo.get_chunks_by_ids([cid for cid, _ in ranked])[:k]
+    codec = _storage_codec()
+    if codec:
+        return repo.search_chunks_by_code(
+            file_ids=file_ids, query_embedding=query_vec, top_k=k,
+            codec=codec, candidates=RAG_RESCORE_FACTOR * k,
+        )
+    return repo.search_chunks_by_embedding(file_ids=file_ids, query_embedding=query_vec, top_k=k)
+
+
+def _hybrid_search(query: str, query_vec: list[float], file_ids: list[str] | None, k: int) -> list[dict]:
+    lexical = _lexical_search(query, file_ids)
+    if not lexical:
+        return _vector_search(query_vec, file_ids, k)
+    if RAG_FTS_PREFILTER and len(lexical) >= k:
+        # Cosine over a few hundred candidates instead of every chunk of the selected files.
+        semantic = repo.search_chunks_by_embedding(
+            file_ids=None, query_embedding=query_vec, top_k=len(lexical), chunk_ids=lexical,
+        )
+    else:
+        semantic = _vector_search(query_vec, file_ids, 4 * k)
+    # Lexical ranking first: on equal fused scores an exact term match wins.
+    fused = reciprocal_rank_fusion([lexical, [r["id"] for r in semantic]], k=RAG_RRF_K)
+    return repo.get_chunks_by_ids(fused[:k])
+
+
+def _lexical_search(query: str, file_ids: list[str] | None) -> list[str]:
+    match = fts_query(query)
+    if match is None:
+        return []
+    try:
+        candidates = repo.search_chunks_fts(match, file_ids, RAG_FTS_CANDIDATES)
+    except sqlite3.OperationalError:
+        # No full-text index in this database (see init_db); vector ranking alone still works.
+        logger.debug("full-text search unavailable", exc_info=True)
+        return []
+    metrics.SCANNED_CHUNKS.observe(len(candidates), "fts")
+    return candidates
+
+
+def invalidate_retrieval_cache(file_ids: list[str] | None = None) -> None:
+    """Forget cached results touching file_ids (all results when None)."""
+    _retrieval_cache.invalidate(file_ids)
+
+
 def get_context_chunks(query: str, file_ids: list[str] | None = None, top_k: int | None = None) -> list[str]:
     """Return list of chunk content strings for prompt building."""
     hits = retrieve(query=query, file_ids=file_ids, top_k=top_k)
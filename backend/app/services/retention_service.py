@@ -0,0 +1,193 @@
+"""Retention: expire old sessions and uploads, sweep orphans, and compact the database.
+
+Deletes run in batches of RETENTION_BATCH_SIZE rows, each in its own short transaction,
+so chat and indexing writes are never blocked for long. A chunk-heavy file has its chunks
+drained batch by batch before its files row is removed.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from backend.app.core.config import (
+    RETENTION_BATCH_SIZE,
+    RETENTION_FILE_TTL_DAYS,
+    RETENTION_INTERVAL_HOURS,
+    RETENTION_ORPHAN_GRACE_SECONDS,
+    RETENTION_SESSION_TTL_DAYS,
+    RETENTION_VACUUM_PAGES,
+    UPLOADS_DIR,
+)
+from backend.app.db import database, repo
+from backend.app.services import file_service, rag_service, session_service
+
+logger = logging.getLogger(__name__)
+
+
+def _cutoff(days: float) -> str | None:
+    if days <= 0:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+def _orphan_blobs() -> list[Path]:
+    """Files under UPLOADS_DIR that no files row points at, older than the grace period.
+
+    The grace period covers uploads still being received (``*.part``) or registered.
+    """
+    if not UPLOADS_DIR.exists():
+        return []
+    known = {Path(p).resolve() for p in repo.list_file_paths()}
+    oldest = time.time() - RETENTION_ORPHAN_GRACE_SECONDS
+    orphans = []
+    for path in UPLOADS_DIR.iterdir():
+        try:
+            if path.is_file() and path.resolve() not in known and path.stat().st_mtime < oldest:
+                orphans.append(path)
+        except OSError:
+            continue  # removed while we looked
+    return orphans
+
+
+def find_garbage(session_ttl_days: float | None = None, file_ttl_days: float | None = None) -> dict:
+    """Count what collect_garbage() would delete, without deleting anything."""
+    sessions_before = _cutoff(RETENTION_SESSION_TTL_DAYS if session_ttl_days is None else session_ttl_days)
+    files_before = _cutoff(RETENTION_FILE_TTL_DAYS if file_ttl_days is None else file_ttl_days)
+    return {
+        "idle_sessions": len(repo.list_idle_sessions(sessions_before, -1)) if sessions_before else 0,
+        "expired_files": len(repo.list_unattached_files(files_before, -1)) if files_before else 0,
+        "orphan_files": len(repo.list_orphan_files(-1)),
+        "orphan_chunk_files": len(repo.list_orphan_chunk_file_ids(-1)),
+        "orphan_index_jobs": repo.count_orphan_index_jobs(),
+        "orphan_blobs": len(_orphan_blobs()),
+    }
+
+
+def _drain_chunks(file_ids: list[str], batch_size: int, unshared_only: bool = True) -> int:
+    deleted = 0
+    for file_id in file_ids:
+        while True:
+            n = repo.delete_chunk_batch(file_id, batch_size, unshared_only=unshared_only)
+            deleted += n
+            if n < batch_size:
+                break
+    return deleted
+
+
+def collect_garbage(
+    session_ttl_days: float | None = None,
+    file_ttl_days: float | None = None,
+    batch_size: int | None = None,
+) -> dict:
+    """Delete expired sessions and session-less uploads, then orphaned rows and blobs; returns counts."""
+    batch = batch_size or RETENTION_BATCH_SIZE
+    sessions_before = _cutoff(RETENTION_SESSION_TTL_DAYS if session_ttl_days is None else session_ttl_days)
+    files_before = _cutoff(RETENTION_FILE_TTL_DAYS if file_ttl_days is None else file_ttl_days)
+    report = dict.fromkeys(("sessions", "files", "chunks", "index_jobs", "blobs"), 0)
+
+    while sessions_before:
+        session_ids = repo.list_idle_sessions(sessions_before, batch)
+        for session_id in session_ids:
+            file_ids = repo.list_file_ids_by_session(session_id)
+            report["chunks"] += _drain_chunks(file_ids, batch)
+            if session_service.delete_session(session_id):
+                report["sessions"] += 1
+                report["files"] += len(file_ids)
+        if len(session_ids) < batch:
+            break
+
+    listings = [lambda: repo.list_orphan_files(batch)]
+    if files_before:
+        listings.insert(0, lambda: repo.list_unattached_files(files_before, batch))
+    for listing in listings:
+        while file_ids := listing():
+            report["chunks"] += _drain_chunks(file_ids, batch)
+            report["files"] += len(file_service.delete_files(file_ids)["file_ids"])
+            if len(file_ids) < batch:
+                break
+
+    while file_ids := repo.list_orphan_chunk_file_ids(batch):
+        report["chunks"] += _drain_chunks(file_ids, batch, unshared_only=False)
+        rag_service.forget_files(file_ids)
+    while n := repo.delete_orphan_index_jobs(batch):
+        report["index_jobs"] += n
+
+    blobs = [str(p) for p in _orphan_blobs()]
+    file_service.remove_blobs(blobs)
+    report["blobs"] = len(blobs)
+    return report
+
+
+def compact(vacuum_pages: int | None = None, full: bool = False) -> dict:
+    """Release free pages to the filesystem and refresh planner statistics.
+
+    full=True rewrites the database with VACUUM instead, which also enables incremental
+    vacuum on databases created before it was the default; writers wait until it finishes.
+    """
+    if full:
+        database.vacuum()
+        # VACUUM may renumber the chunk rowids the full-text index is keyed on.
+        repo.rebuild_chunks_fts()
+        released = None
+    else:
+        released = database.incremental_vacuum(RETENTION_VACUUM_PAGES if vacuum_pages is None else vacuum_pages)
+    database.optimize()
+    return {"pages_released": released, "full_vacuum": full}
+
+
+def run_retention(**kwargs) -> dict:
+    """collect_garbage() followed by an incremental compact(); what the background thread runs."""
+    report = collect_garbage(**kwargs)
+    report.update(compact())
+    if any(report[k] for k in ("sessions", "files", "chunks", "index_jobs", "blobs")):
+        logger.info("retention: %s", report)
+    return report
+
+
+class RetentionWorker:
+    """Daemon thread running run_retention() every interval seconds (first run one interval after start)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                run_retention()
+            except Exception:
+                logger.exception("retention run failed")
+
+
+_worker: RetentionWorker | None = None
+
+
+def start_background(interval_hours: float | None = None) -> None:
+    """Start the periodic retention thread (app startup); RETENTION_INTERVAL_HOURS=0 disables it."""
+    global _worker
+    hours = RETENTION_INTERVAL_HOURS if interval_hours is None else interval_hours
+    if _worker is not None or hours <= 0:
+        return
+    _worker = RetentionWorker(hours * 3600)
+    _worker.start()
+
+
+def stop_background() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
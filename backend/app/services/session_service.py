@@ -2,6 +2,8 @@
 from __future__ import annotations
 
 from backend.app.db import repo
+from backend.app.services import file_service, rag_service
+from backend.app.utils.cursor import decode_cursor, encode_cursor
 
 
 def create_session(title: str = "") -> dict:
@@ -9,22 +11,70 @@ def create_session(title: str = "") -> dict:
     return {"session_id": s["id"], "title": s["title"], "created_at": s["created_at"]}
 
 
-def list_sessions(limit: int = 50) -> list[dict]:
-    rows = repo.list_sessions(limit=limit)
-    return [
-        {"session_id": r["id"], "title": r["title"], "created_at": r["created_at"], "updated_at": r["updated_at"]}
-        for r in rows
+def list_sessions(limit: int = 50, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """One page of sessions, latest activity first, and the cursor of the next page (None at the end).
+
+    Raises ValueError for a malformed cursor.
+    """
+    after = decode_cursor(cursor, (str, str)) if cursor else None
+    rows = repo.list_sessions(limit=limit + 1, after=after)
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]["last_message_at"], page[-1]["id"]) if len(rows) > limit else None
+    items = [
+        {
+            "session_id": r["id"],
+            "title": r["title"],
+            "created_at": r["created_at"],
+            "updated_at": r["updated_at"],
+            "last_message_at": r["last_message_at"],
+        }
+        for r in page
     ]
+    return items, next_cursor
 
 
 def delete_session(session_id: str) -> bool:
-    """Delete session and its messages/files/chunks. Returns True if session existed."""
-    return repo.delete_session(session_id)
+    """Delete session and its messages/files/chunks. Returns True if session existed.
 
+    Chunks and upload blobs shared with other sessions' duplicate uploads are kept.
+    """
+    result = repo.delete_session(session_id)
+    if result is None:
+        return False
+    rag_service.forget_files(result["file_ids"])
+    rag_service.transfer_files(result["transferred"])
+    file_service.remove_blobs(result["orphaned_paths"])
+    return True
 
-def get_history(session_id: str, limit: int = 50, before: str | None = None) -> list[dict]:
-    rows = repo.list_messages(session_id=session_id, limit=limit, before=before)
-    return [
-        {"role": r["role"], "content": r["content"], "created_at": r["created_at"]}
-        for r in rows
-    ]
+
+def get_history(
+    session_id: str,
+    limit: int = 50,
+    cursor: str | None = None,
+    after: str | None = None,
+) -> dict:
+    """A page of history in conversation order, with cursors to continue from.
+
+    Without after: the latest limit messages (older than cursor, if given); next_cursor
+    fetches the page before them and is None at the start of the conversation. With after
+    (a newest_cursor from an earlier response): only messages written since, for polling.
+    newest_cursor always marks the newest message the client has now seen.
+    Raises ValueError for a malformed cursor.
+    """
+    if after:
+        (after_seq,) = decode_cursor(after, (int,))
+        rows = repo.list_messages(session_id=session_id, limit=limit, after_seq=after_seq)
+        next_cursor = None
+        newest = rows[-1]["seq"] if rows else after_seq
+    else:
+        before_seq = decode_cursor(cursor, (int,))[0] if cursor else None
+        rows = repo.list_messages(session_id=session_id, limit=limit + 1, before_seq=before_seq)
+        has_older = len(rows) > limit
+        rows = rows[-limit:] if has_older else rows
+        next_cursor = encode_cursor(rows[0]["seq"]) if has_older else None
+        newest = rows[-1]["seq"] if rows and before_seq is None else None
+    return {
+        "items": [{"role": r["role"], "content": r["content"], "created_at": r["created_at"]} for r in rows],
+        "next_cursor": next_cursor,
+        "newest_cursor": encode_cursor(newest) if newest is not None else None,
+    }
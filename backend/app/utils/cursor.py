@@ -0,0 +1,27 @@
+"""Opaque pagination cursors: a keyset position encoded as URL-safe base64 JSON."""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+
+
+def encode_cursor(*values: str | int) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, types: tuple[type, ...]) -> tuple:
+    """Decode a cursor made by encode_cursor whose values have the given types; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("invalid cursor") from None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(type(v) is t for v, t in zip(values, types))
+    ):
+        raise ValueError("invalid cursor")
+    return tuple(values)
@@ -1,25 +1,139 @@
 """Parse uploaded files to plain text (txt, pdf)."""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 
+from backend.app.core.config import PDF_PAGES_PER_TASK, PDF_PARALLEL_MIN_PAGES, PDF_PARSE_WORKERS
+
+TEXT_BLOCK_CHARS = 1 << 20
+PAGE_SEPARATOR = "\n\n"
+
+# One pool for the process, started on first use. Spawned workers don't inherit the
+# parent's threads, locks or SQLite connections (fork would copy them mid-use).
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
 
 def parse_file(path: str | Path) -> str:
     """Parse file to plain text. Supports .txt and .pdf."""
+    return "".join(iter_text_segments(path))
+
+
+def iter_text_segments(path: str | Path, workers: int | None = None) -> Iterator[str]:
+    """Yield the document text in order, a page (pdf) or block (txt) at a time.
+
+    Concatenated, the segments equal parse_file(path); pages after the first carry
+    their PAGE_SEPARATOR prefix. Only a bounded window of pages is held at once.
+    workers > 1 extracts large PDFs in a process pool (default PDF_PARSE_WORKERS).
+    """
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(str(path))
     suffix = path.suffix.lower()
     if suffix == ".txt":
-        return path.read_text(encoding="utf-8", errors="replace")
+        return _iter_txt_blocks(path)
     if suffix == ".pdf":
-        try:
-            import pdfplumber
-        except ImportError:
-            raise RuntimeError("pdfplumber is required for PDF parsing. Install with: uv add pdfplumber")
-        text_parts = []
-        with pdfplumber.open(path) as pdf:
+        return _iter_pdf_pages(path, PDF_PARSE_WORKERS if workers is None else workers)
+    raise ValueError(f"Unsupported file type: {suffix}. Use .txt or .pdf")
+
+
+def _iter_txt_blocks(path: Path) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as fh:
+        while block := fh.read(TEXT_BLOCK_CHARS):
+            yield block
+
+
+def _import_pdfplumber():
+    try:
+        import pdfplumber
+    except ImportError:
+        raise RuntimeError("pdfplumber is required for PDF parsing. Install with: uv add pdfplumber")
+    return pdfplumber
+
+
+def _extract_pages(path: str, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop); runs in pool workers, so it opens the PDF itself.
+
+    Only that range is loaded (pdfplumber numbers pages from 1), so each task costs its
+    own pages rather than the whole document's page list.
+    """
+    pdfplumber = _import_pdfplumber()
+    with pdfplumber.open(path, pages=range(start + 1, stop + 1)) as pdf:
+        out = []
+        for page in pdf.pages:
+            out.append(page.extract_text() or "")
+            page.close()  # drop the page's parsed objects once its text is out
+        return out
+
+
+def _iter_pdf_pages(path: Path, workers: int) -> Iterator[str]:
+    pdfplumber = _import_pdfplumber()
+    with pdfplumber.open(path) as pdf:
+        n_pages = len(pdf.pages)
+        if workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+            first = True
             for page in pdf.pages:
                 t = page.extract_text()
+                page.close()
                 if t:
-                    text_parts.append(t)
-        return "\n\n".join(text_parts)
-    raise ValueError(f"Unsupported file type: {suffix}. Use .txt or .pdf")
+                    yield t if first else PAGE_SEPARATOR + t
+                    first = False
+            return
+    first = True
+    for t in _extract_parallel(str(path), n_pages, workers):
+        if t:
+            yield t if first else PAGE_SEPARATOR + t
+            first = False
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            size = min(max(workers, PDF_PARSE_WORKERS), os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the PDF worker processes (app shutdown); the next parallel parse starts a new pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _extract_parallel(path: str, n_pages: int, workers: int) -> Iterator[str]:
+    """Page texts in order, extracted by page range across the shared process pool.
+
+    At most two ranges per worker are in flight, so finished-but-unconsumed pages stay bounded.
+    If the consumer stops early, ranges not yet started are cancelled.
+    """
+    step = max(1, PDF_PAGES_PER_TASK)
+    ranges = iter([(lo, min(lo + step, n_pages)) for lo in range(0, n_pages, step)])
+    workers = min(workers, os.cpu_count() or 1, -(-n_pages // step))
+    pool = _get_pool(workers)
+    pending: deque[Future] = deque()
+
+    def submit_next() -> None:
+        for lo, hi in ranges:
+            pending.append(pool.submit(_extract_pages, path, lo, hi))
+            return
+
+    try:
+        for _ in range(2 * workers):
+            submit_next()
+        while pending:
+            pages = pending.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        for fut in pending:
+            fut.cancel()
@@ -0,0 +1,69 @@
+"""Benchmark the SQLite work of one chat turn: one call per statement versus the unit-of-work path.
+
+    python -m benchmarks.bench_chat_turn --turns 2000
+
+The LLM is not called; each turn does only what chat_service does in the database:
+check the session, read recent history, set the title on the first turn, save the user
+message and then the assistant reply.
+"""
+from __future__ import annotations
+
+import argparse
+
+from benchmarks.common import time_call, use_temp_database
+
+use_temp_database()
+
+from backend.app.db import repo  # noqa: E402
+from backend.app.db.database import get_connection, init_db  # noqa: E402
+from backend.app.services import chat_service  # noqa: E402
+
+
+def legacy_turn(session_id: str, message: str) -> None:
+    """The original call sequence: each repo call in its own block, the title and each message a separate commit."""
+    if not repo.get_session(session_id):
+        raise ValueError("session not found")
+    history = repo.list_messages(session_id=session_id, limit=20)
+    if not history:
+        repo.update_session_title(session_id, message)
+    for role, content in (("user", message), ("assistant", "reply")):
+        repo.add_message(session_id=session_id, role=role, content=content)
+        repo.touch_session(session_id)
+
+
+def unit_of_work_turn(session_id: str, message: str) -> None:
+    """chat_service's path: one transaction for the user side, one for the reply."""
+    chat_service._open_turn(session_id, message)
+    repo.add_message(session_id=session_id, role="assistant", content="reply")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000, help="turns per timed run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--synchronous", default=None, help="override PRAGMA synchronous, e.g. FULL")
+    args = parser.parse_args()
+
+    init_db()
+    if args.synchronous:
+        # Single-threaded, so every block reuses this one pooled connection.
+        with get_connection() as conn:
+            conn.execute(f"PRAGMA synchronous = {args.synchronous}")
+    print(f"{'path':>14} {'per turn us':>12} {'turns/s':>10}")
+    results = {}
+    for name, turn in (("legacy", legacy_turn), ("unit of work", unit_of_work_turn)):
+        def run():
+            # A fresh session per run so the first-turn title update is part of every run.
+            sid = repo.create_session()["id"]
+            for i in range(args.turns):
+                turn(sid, f"question {i}")
+
+        stats = time_call(run, repeat=args.repeat)
+        per_turn_us = stats["median_ms"] * 1000.0 / args.turns
+        results[name] = per_turn_us
+        print(f"{name:>14} {per_turn_us:12.1f} {1e6 / per_turn_us:10.0f}")
+    print(f"speedup: {results['legacy'] / results['unit of work']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark the sentence-aware streaming chunker against the original character-window chunk_text.
+
+    python -m benchmarks.bench_chunker --mb 50
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from backend.app.core.chunker import chunk_text, iter_chunks  # noqa: E402
+from backend.app.core.config import CHUNK_OVERLAP, CHUNK_SIZE  # noqa: E402
+
+SENTENCES = [
+    "员工每年享有十五天带薪年假。",
+    "请假需要提前三个工作日在系统中提交申请！",
+    "报销单据须在费用发生后三十天内提交，逾期不予受理。",
+    "Employees must complete security training within 30 days of joining.",
+    "Version 2.5 of the handbook replaces all earlier editions.",
+    "是否可以远程办公？请咨询直属主管。",
+]
+
+
+def legacy_chunk_text(text: str, size: int, overlap: int) -> list[str]:
+    """The original implementation, kept verbatim as the baseline."""
+    if not text or not text.strip():
+        return []
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + size
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append(chunk.strip())
+        start = end - overlap
+        if start >= len(text):
+            break
+    return chunks
+
+
+def make_text(mb: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, n = [], 0
+    target = int(mb * 2**20)
+    while n < target:
+        paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 12))) + "\n\n"
+        parts.append(paragraph)
+        n += len(paragraph.encode("utf-8"))
+    return "".join(parts)
+
+
+def segments(text: str, block: int = 1 << 20):
+    for i in range(0, len(text), block):
+        yield text[i:i + block]
+
+
+def mid_sentence_share(chunks: list[str]) -> float:
+    ends = ("。", "！", "？", ".", "!", "?")
+    return sum(1 for c in chunks if not c.endswith(ends)) / max(1, len(chunks))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=50.0, help="UTF-8 size of the generated input")
+    parser.add_argument("--size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    args = parser.parse_args()
+
+    text = make_text(args.mb)
+    variants = [
+        ("legacy chunk_text", lambda: legacy_chunk_text(text, args.size, args.overlap)),
+        ("chunk_text (wrapper)", lambda: chunk_text(text, args.size, args.overlap)),
+        ("iter_chunks, 1 MiB segments", lambda: [c.text for c in iter_chunks(segments(text), args.size, args.overlap)]),
+    ]
+    print(f"{'variant':<28} {'seconds':>8} {'MB/s':>8} {'chunks':>8} {'mid-sentence':>13}")
+    for name, fn in variants:
+        t0 = time.perf_counter()
+        chunks = fn()
+        elapsed = time.perf_counter() - t0
+        print(
+            f"{name:<28} {elapsed:8.2f} {args.mb / elapsed:8.1f} {len(chunks):>8} {mid_sentence_share(chunks):12.1%}",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
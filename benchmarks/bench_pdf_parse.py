@@ -0,0 +1,78 @@
+"""Benchmark PDF parse + chunk: whole-document string vs page streaming (serial and process pool).
+
+    python -m benchmarks.bench_pdf_parse --pages 200 500 --workers 4 [--memory]
+
+--memory re-runs each variant under tracemalloc (much slower) to report peak Python
+allocations in this process; pool workers are not traced.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from backend.app.core.chunker import chunk_stream, chunk_text  # noqa: E402
+from backend.app.utils import file_parser  # noqa: E402
+from benchmarks.pdfgen import sample_pages, write_text_pdf  # noqa: E402
+
+
+def legacy_parse_and_chunk(path: Path) -> int:
+    """The pre-streaming path: join every page, then chunk the whole string."""
+    import pdfplumber
+
+    parts = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            t = page.extract_text()
+            if t:
+                parts.append(t)
+    return len(chunk_text("\n\n".join(parts)))
+
+
+def streaming_parse_and_chunk(path: Path, workers: int) -> int:
+    return sum(1 for _ in chunk_stream(file_parser.iter_text_segments(path, workers=workers)))
+
+
+def peak_mib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--lines-per-page", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--memory", action="store_true", help="also report peak traced memory")
+    args = parser.parse_args()
+
+    file_parser.PDF_PARALLEL_MIN_PAGES = 1
+    tmp = Path(tempfile.mkdtemp(prefix="chatbox-pdf-"))
+    print(f"{'pages':>6} {'variant':<22} {'seconds':>8} {'peak MiB':>9} {'chunks':>7}")
+    for n in args.pages:
+        path = write_text_pdf(tmp / f"doc_{n}.pdf", sample_pages(n, args.lines_per_page))
+        variants = [
+            ("legacy join + chunk", lambda: legacy_parse_and_chunk(path)),
+            ("stream, serial", lambda: streaming_parse_and_chunk(path, workers=1)),
+            (f"stream, {args.workers} processes", lambda: streaming_parse_and_chunk(path, workers=args.workers)),
+        ]
+        for name, fn in variants:
+            t0 = time.perf_counter()
+            chunks = fn()
+            elapsed = time.perf_counter() - t0
+            peak = f"{peak_mib(fn):9.1f}" if args.memory else f"{'-':>9}"
+            print(f"{n:>6} {name:<22} {elapsed:8.2f} {peak} {chunks:>7}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
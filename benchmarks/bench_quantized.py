@@ -0,0 +1,109 @@
+"""Benchmark quantized embedding storage (EMBEDDING_STORAGE) against the float32 scan.
+
+    python -m benchmarks.bench_quantized --chunks 100000 --dim 768
+
+For each storage mode this reports the bytes scanned per query, the database size,
+peak Python memory during a query, median query latency, and recall@k relative to the
+exact float32 ranking, with and without rescoring. The corpus is clustered, as real
+embeddings are, and each query is a perturbed corpus vector.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+os.environ["ANN_ENABLED"] = "0"  # codes only back the SQLite scan
+
+import numpy as np  # noqa: E402
+
+from backend.app.core.vector_search import CODECS, code_width, normalize_rows  # noqa: E402
+from backend.app.db import repo  # noqa: E402
+from backend.app.db.database import get_connection, init_db  # noqa: E402
+from backend.app.services import rag_service  # noqa: E402
+
+
+def clustered(n: int, dim: int, rng: np.random.Generator, clusters: int = 256) -> np.ndarray:
+    centroids = rng.standard_normal((clusters, dim), dtype=np.float32)
+    noise = rng.standard_normal((n, dim), dtype=np.float32)
+    return centroids[rng.integers(0, clusters, n)] + 0.7 * noise
+
+
+def fill_corpus(file_id: str, vectors: np.ndarray, batch: int = 20000) -> None:
+    body = "x" * 800
+    for lo in range(0, len(vectors), batch):
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO chunks (id, file_id, chunk_index, content, embedding, created_at) VALUES (?, ?, ?, ?, ?, '')",
+                ((f"c{i}", file_id, i, body, vectors[i].tobytes()) for i in range(lo, min(lo + batch, len(vectors)))),
+            )
+
+
+def db_mb() -> float:
+    with get_connection() as conn:
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return pages * conn.execute("PRAGMA page_size").fetchone()[0] / 2**20
+
+
+def run_queries(search, queries: list[list[float]]) -> tuple[list[list[str]], float, float]:
+    """(ids per query, median ms, peak traced MB of one query)."""
+    search(queries[0])  # warm the page cache
+    tracemalloc.start()
+    search(queries[0])
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    results, samples = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = search(q)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+        results.append([h["id"] for h in hits])
+    return results, statistics.median(samples), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--factor", type=int, default=8, help="candidates rescored = factor * top_k")
+    args = parser.parse_args()
+
+    init_db()
+    rng = np.random.default_rng(0)
+    f = repo.create_file(filename="bench.txt", path="bench.txt")
+    vectors = clustered(args.chunks, args.dim, rng)
+    fill_corpus(f["id"], normalize_rows(vectors.copy()))  # stored unit-length, as index_file does
+    picks = rng.integers(0, args.chunks, args.queries)
+    queries = [(vectors[i] + 0.5 * rng.standard_normal(args.dim, dtype=np.float32)).tolist() for i in picks]
+    k = args.top_k
+
+    exact, exact_ms, exact_peak = run_queries(
+        lambda q: repo.search_chunks_by_embedding([f["id"]], q, k), queries,
+    )
+    print(f"{'storage':>9} {'B/vector':>9} {'scan MB':>8} {'DB MB':>8} {'peak MB':>8} {'ms/query':>9} {'recall@' + str(k):>9}")
+    base_db = db_mb()
+    scan = args.chunks * args.dim * 4 / 2**20
+    print(f"{'float32':>9} {args.dim * 4:9d} {scan:8.1f} {base_db:8.1f} {exact_peak:8.1f} {exact_ms:9.2f} {1.0:9.3f}")
+    for codec in CODECS:
+        rag_service.requantize(codec)
+        width = code_width(args.dim, codec)
+        scan = args.chunks * width / 2**20
+        # x1 rescores only the coarse top_k, so its recall is that of the codes alone.
+        for factor in sorted({1, args.factor}):
+            got, ms, peak = run_queries(
+                lambda q: repo.search_chunks_by_code([f["id"]], q, k, codec=codec, candidates=factor * k), queries,
+            )
+            recall = statistics.mean(len(set(a) & set(b)) / k for a, b in zip(got, exact))
+            label = f"{codec} x{factor}"
+            print(f"{label:>9} {width:9d} {scan:8.1f} {db_mb():8.1f} {peak:8.1f} {ms:9.2f} {recall:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark repo.search_chunks_by_embedding against the old pure-Python cosine loop.
+
+    python -m benchmarks.bench_search --sizes 10000 100000 1000000 --dim 128
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import struct
+
+from benchmarks.common import time_call, use_temp_database
+
+use_temp_database()
+
+import numpy as np  # noqa: E402
+
+from backend.app.core.vector_search import normalize_rows  # noqa: E402
+from backend.app.db import repo  # noqa: E402
+from backend.app.db.database import get_connection, init_db  # noqa: E402
+
+
+def legacy_search(file_ids, query_embedding, top_k):
+    """The pre-NumPy implementation, kept verbatim as the baseline."""
+    with get_connection() as conn:
+        if file_ids:
+            placeholders = ",".join("?" * len(file_ids))
+            rows = conn.execute(
+                f"SELECT id, file_id, chunk_index, content, embedding FROM chunks WHERE file_id IN ({placeholders})",
+                file_ids,
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT id, file_id, chunk_index, content, embedding FROM chunks").fetchall()
+    results = []
+    for r in rows:
+        emb = r["embedding"]
+        if emb is None:
+            continue
+        vec = list(struct.unpack(f"{len(emb)//4}f", emb))
+        dot = sum(a * b for a, b in zip(query_embedding, vec))
+        norm_q = math.sqrt(sum(x * x for x in query_embedding)) or 1e-9
+        norm_v = math.sqrt(sum(x * x for x in vec)) or 1e-9
+        results.append((dot / (norm_q * norm_v), dict(r)))
+    results.sort(key=lambda x: -x[0])
+    return [r[1] for r in results[:top_k]]
+
+
+def fill_corpus(file_id: str, start: int, stop: int, dim: int, rng: np.random.Generator, batch: int = 20000) -> None:
+    """Insert chunks [start, stop) with random unit-length embeddings and ~800 chars of content."""
+    body = "x" * 800
+    for lo in range(start, stop, batch):
+        hi = min(lo + batch, stop)
+        vecs = normalize_rows(rng.standard_normal((hi - lo, dim), dtype=np.float32))
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO chunks (id, file_id, chunk_index, content, embedding, created_at) VALUES (?, ?, ?, ?, ?, '')",
+                ((f"c{i}", file_id, i, body, vecs[i - lo].tobytes()) for i in range(lo, hi)),
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max", type=int, default=1_000_000, help="skip the legacy loop above this size")
+    args = parser.parse_args()
+
+    init_db()
+    f = repo.create_file(filename="bench.txt", path="bench.txt")
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(args.dim).astype(np.float32).tolist()
+    loaded = 0
+    print(f"{'chunks':>10} {'numpy ms':>10} {'legacy ms':>10} {'speedup':>8}")
+    for size in sorted(args.sizes):
+        fill_corpus(f["id"], loaded, size, args.dim, rng)
+        loaded = size
+        new = time_call(lambda: repo.search_chunks_by_embedding([f["id"]], query, args.top_k), repeat=args.repeat)
+        if size <= args.legacy_max:
+            old = time_call(lambda: legacy_search([f["id"]], query, args.top_k), repeat=1, warmup=0)
+            old_ms = f"{old['median_ms']:10.1f}"
+            speedup = f"{old['median_ms'] / new['median_ms']:7.1f}x"
+        else:
+            old_ms, speedup = f"{'-':>10}", f"{'-':>8}"
+        print(f"{size:>10} {new['median_ms']:10.1f} {old_ms} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
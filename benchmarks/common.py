@@ -0,0 +1,39 @@
+"""Shared helpers: isolated temp database and simple timing."""
+from __future__ import annotations
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def use_temp_database() -> Path:
+    """Point the backend at a fresh temp DB / data dir. Call before importing backend modules."""
+    tmp = Path(tempfile.mkdtemp(prefix="chatbox-bench-"))
+    os.environ["DATABASE_URL"] = "sqlite:///" + str(tmp / "bench.db")
+    os.environ["DATA_DIR"] = str(tmp / "data")
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    return tmp
+
+
+def time_call(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> dict:
+    """Run fn repeat times after warmup; return timing stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "max_ms": max(samples),
+        "repeat": repeat,
+    }
@@ -0,0 +1,52 @@
+"""Write simple multi-page text PDFs without third-party dependencies (for benchmarks and tests)."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from pathlib import Path
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: str | Path, pages: Iterable[list[str]]) -> Path:
+    """Write one PDF page per item of pages (a list of ASCII lines, Helvetica 10pt)."""
+    path = Path(path)
+    objects: list[bytes] = []  # object n is objects[n - 1]
+    page_ids: list[int] = []
+    objects.append(b"")  # 1: catalog, filled in below
+    objects.append(b"")  # 2: page tree, filled in below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")  # 3
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+    return path
+
+
+def sample_pages(n_pages: int, lines_per_page: int = 60) -> Iterable[list[str]]:
+    for p in range(n_pages):
+        yield [f"Page {p} line {i}: the quick brown fox jumps over the lazy dog." for i in range(lines_per_page)]
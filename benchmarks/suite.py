@@ -0,0 +1,283 @@
+"""Offline microbenchmark suite for the RAG and persistence hot paths, with regression checks.
+
+    python -m benchmarks.suite                                   # quick scale, table only
+    python -m benchmarks.suite --scale full --json results.json
+    python -m benchmarks.suite --check benchmarks/thresholds.json --baseline previous.json
+
+Everything runs on a temp database with MockEmbedding and MockLLMClient, so no network
+or API key is needed. Every result has a stable id. --check exits with status 1 when a
+result crosses its absolute limit in the thresholds file. --baseline exits with status 1
+when a result is more than --max-slowdown times worse than in an earlier --json run.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from benchmarks.common import time_call, use_temp_database
+
+use_temp_database()
+
+import numpy as np  # noqa: E402
+
+from backend.app.core.chunker import chunk_text  # noqa: E402
+from backend.app.core.embeddings import (  # noqa: E402
+    LocalEmbedding,
+    MockEmbedding,
+    bytes_to_embedding,
+    embedding_to_bytes,
+    set_embedding,
+)
+from backend.app.core.llm_client import MockLLMClient, set_llm_client  # noqa: E402
+from backend.app.core.vector_search import normalize_rows  # noqa: E402
+from backend.app.db import repo  # noqa: E402
+from backend.app.db.database import get_connection, init_db  # noqa: E402
+from backend.app.services import chat_service, rag_service  # noqa: E402
+
+SCALES = {
+    "quick": {
+        "chunk_mb": 5,
+        "codec_vectors": 20_000,
+        "embed_texts": 2_000,
+        "search_chunks": [1_000, 10_000, 100_000],
+        "index_chunks": 2_000,
+        "sessions": 10_000,
+        "messages": 10_000,
+        "chat_turns": 200,
+    },
+    "full": {
+        "chunk_mb": 50,
+        "codec_vectors": 200_000,
+        "embed_texts": 20_000,
+        "search_chunks": [1_000, 10_000, 100_000, 1_000_000],
+        "index_chunks": 20_000,
+        "sessions": 100_000,
+        "messages": 10_000,
+        "chat_turns": 1_000,
+    },
+}
+
+SENTENCES = [
+    "员工每年享有十五天带薪年假。",
+    "请假需要提前三个工作日在系统中提交申请！",
+    "报销单据须在费用发生后三十天内提交，逾期不予受理。",
+    "Employees must complete security training within 30 days of joining.",
+    "Version 2.5 of the handbook replaces all earlier editions.",
+]
+
+
+def _result(bench_id: str, metric: str, value: float, better: str = "lower", **params) -> dict:
+    return {"id": bench_id, "metric": metric, "value": round(value, 4), "better": better, "params": params}
+
+
+def _text(chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, n = [], 0
+    while n < chars:
+        paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 12))) + "\n\n"
+        parts.append(paragraph)
+        n += len(paragraph)
+    return "".join(parts)
+
+
+def bench_chunk_text(scale: dict, dim: int) -> Iterator[dict]:
+    text = _text(int(scale["chunk_mb"] * 2**20 / 2))  # CJK-heavy text: ~2 UTF-8 bytes per char
+    mb = len(text.encode("utf-8")) / 2**20
+    stats = time_call(lambda: chunk_text(text), repeat=3)
+    yield _result(f"chunk_text/mb={scale['chunk_mb']}", "mb_per_s", mb / (stats["median_ms"] / 1000), "higher")
+
+
+def bench_embedding_codec(scale: dict, dim: int) -> Iterator[dict]:
+    n = scale["codec_vectors"]
+    vectors = np.random.default_rng(0).standard_normal((n, dim), dtype=np.float32).tolist()
+    blobs = [embedding_to_bytes(v) for v in vectors]
+    encode = time_call(lambda: [embedding_to_bytes(v) for v in vectors], repeat=3)
+    decode = time_call(lambda: [bytes_to_embedding(b) for b in blobs], repeat=3)
+    yield _result(f"embedding_to_bytes/dim={dim}", "us_per_vector", encode["median_ms"] * 1000 / n, dim=dim)
+    yield _result(f"bytes_to_embedding/dim={dim}", "us_per_vector", decode["median_ms"] * 1000 / n, dim=dim)
+
+
+def bench_local_embedding(scale: dict, dim: int) -> Iterator[dict]:
+    n = scale["embed_texts"]
+    text = _text(n * 700, seed=2)
+    texts = [text[i * 700:(i + 1) * 700] for i in range(n)]
+    stats = time_call(lambda: LocalEmbedding(dim=dim).embed_batch(texts), repeat=3)
+    yield _result(f"local_embedding/dim={dim}", "chunks_per_s", n / (stats["median_ms"] / 1000), "higher", dim=dim)
+
+
+def _fill_chunks(file_id: str, start: int, stop: int, dim: int, rng: np.random.Generator) -> None:
+    body = _text(800)[:800]
+    for lo in range(start, stop, 20_000):
+        hi = min(lo + 20_000, stop)
+        vecs = normalize_rows(rng.standard_normal((hi - lo, dim), dtype=np.float32))
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO chunks (id, file_id, chunk_index, content, embedding, created_at) VALUES (?, ?, ?, ?, ?, '')",
+                ((f"{file_id}-{i}", file_id, i, body, vecs[i - lo].tobytes()) for i in range(lo, hi)),
+            )
+
+
+def bench_search(scale: dict, dim: int) -> Iterator[dict]:
+    f = repo.create_file(filename="bench.txt", path="bench.txt")
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(dim).astype(np.float32).tolist()
+    loaded = 0
+    for size in sorted(scale["search_chunks"]):
+        _fill_chunks(f["id"], loaded, size, dim, rng)
+        loaded = size
+        stats = time_call(lambda: repo.search_chunks_by_embedding([f["id"]], query, 5), repeat=5)
+        yield _result(f"search_chunks_by_embedding/chunks={size}", "median_ms", stats["median_ms"], chunks=size, dim=dim)
+    repo.delete_chunk_batch(f["id"], -1)
+
+
+def bench_index_file(scale: dict, dim: int) -> Iterator[dict]:
+    n = scale["index_chunks"]
+    path = Path(tempfile.mkdtemp(prefix="chatbox-bench-")) / "doc.txt"
+    path.write_text(_text(n * 700, seed=1), encoding="utf-8")
+    f = repo.create_file(filename="doc.txt", path=str(path))
+    t0 = time.perf_counter()
+    rag_service.index_file(f["id"], str(path))
+    elapsed = time.perf_counter() - t0
+    indexed = repo.count_chunks_by_file(f["id"])
+    yield _result(f"index_file/chunks={n}", "chunks_per_s", indexed / elapsed, "higher", chunks=indexed, dim=dim)
+
+    session_id = repo.create_session()["id"]
+    turns = scale["chat_turns"]
+    for use_rag in (False, True):
+        file_ids = [f["id"]] if use_rag else None
+
+        def run():
+            for i in range(turns):
+                chat_service.chat(session_id, f"第 {i} 个问题：年假有几天？", use_rag=use_rag, file_ids=file_ids)
+
+        stats = time_call(run, repeat=1, warmup=0)
+        name = "chat_turn_rag" if use_rag else "chat_turn"
+        yield _result(f"{name}/turns={turns}", "ms_per_turn", stats["median_ms"] / turns, turns=turns)
+
+
+def bench_sessions(scale: dict, dim: int) -> Iterator[dict]:
+    n = scale["sessions"]
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO sessions (id, title, created_at, updated_at, last_message_at) VALUES (?, '', ?, ?, ?)",
+            ((str(uuid.uuid4()), ts, ts, ts) for ts in (f"2024-01-01T00:00:{i:09d}" for i in range(n))),
+        )
+    first = time_call(lambda: repo.list_sessions(limit=50), repeat=20)
+    middle = repo.list_sessions(limit=n // 2)[-1]
+    deep = time_call(lambda: repo.list_sessions(limit=50, after=(middle["last_message_at"], middle["id"])), repeat=20)
+    yield _result(f"list_sessions/first_page/sessions={n}", "median_ms", first["median_ms"], sessions=n)
+    yield _result(f"list_sessions/deep_page/sessions={n}", "median_ms", deep["median_ms"], sessions=n)
+
+    m = scale["messages"]
+    session_id = repo.create_session()["id"]
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO messages (id, session_id, role, content, created_at, seq) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (str(uuid.uuid4()), session_id, "user" if i % 2 else "assistant", SENTENCES[i % 5], f"t{i:09d}", i + 1)
+                for i in range(m)
+            ),
+        )
+    latest = time_call(lambda: repo.list_messages(session_id, limit=50), repeat=20)
+    older = time_call(lambda: repo.list_messages(session_id, limit=50, before_seq=m // 2), repeat=20)
+    poll = time_call(lambda: repo.list_messages(session_id, limit=50, after_seq=m - 5), repeat=20)
+    yield _result(f"list_messages/latest/messages={m}", "median_ms", latest["median_ms"], messages=m)
+    yield _result(f"list_messages/middle/messages={m}", "median_ms", older["median_ms"], messages=m)
+    yield _result(f"list_messages/poll/messages={m}", "median_ms", poll["median_ms"], messages=m)
+
+
+BENCHES: dict[str, Callable[[dict, int], Iterator[dict]]] = {
+    "chunk_text": bench_chunk_text,
+    "embedding_codec": bench_embedding_codec,
+    "local_embedding": bench_local_embedding,
+    "search": bench_search,
+    "index_file": bench_index_file,
+    "sessions": bench_sessions,
+}
+
+
+def _worse(result: dict, limit: float) -> bool:
+    return result["value"] > limit if result["better"] == "lower" else result["value"] < limit
+
+
+def check_thresholds(results: list[dict], thresholds: dict) -> list[str]:
+    """Failures against {id: {"max": x} or {"min": x}}; ids not in this run are skipped."""
+    failures = []
+    for r in results:
+        limit = thresholds.get(r["id"])
+        if limit is None:
+            continue
+        bound = limit.get("max" if r["better"] == "lower" else "min")
+        if bound is not None and _worse(r, bound):
+            failures.append(f"{r['id']}: {r['value']} {r['metric']} crosses threshold {bound}")
+    return failures
+
+
+def check_baseline(results: list[dict], baseline: list[dict], max_slowdown: float) -> list[str]:
+    """Failures for results more than max_slowdown times worse than the same id in baseline."""
+    previous = {r["id"]: r["value"] for r in baseline}
+    failures = []
+    for r in results:
+        old = previous.get(r["id"])
+        if not old:
+            continue
+        limit = old * max_slowdown if r["better"] == "lower" else old / max_slowdown
+        if _worse(r, limit):
+            failures.append(f"{r['id']}: {r['value']} {r['metric']} vs baseline {old}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHES), help="run a subset")
+    parser.add_argument("--dim", type=int, default=128, help="embedding dimension of the synthetic vectors")
+    parser.add_argument("--json", type=Path, help="write results here")
+    parser.add_argument("--check", type=Path, help="thresholds file to enforce")
+    parser.add_argument("--baseline", type=Path, help="earlier --json output to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.3)
+    args = parser.parse_args()
+
+    init_db()
+    set_embedding(MockEmbedding(dim=args.dim))
+    set_llm_client(MockLLMClient())
+    scale = SCALES[args.scale]
+    results = []
+    print(f"{'benchmark':<48} {'value':>12}  metric", flush=True)
+    for name in args.only or BENCHES:
+        for r in BENCHES[name](scale, args.dim):
+            results.append(r)
+            print(f"{r['id']:<48} {r['value']:12.3f}  {r['metric']}", flush=True)
+
+    if args.json:
+        meta = {
+            "scale": args.scale,
+            "dim": args.dim,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        args.json.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+
+    failures = []
+    if args.check:
+        failures += check_thresholds(results, json.loads(args.check.read_text()))
+    if args.baseline:
+        failures += check_baseline(results, json.loads(args.baseline.read_text())["results"], args.max_slowdown)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
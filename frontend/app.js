@@ -130,25 +130,45 @@ function appendLoadingBubble(container) {
   return div;
 }
 
-function appendAssistantBubbleWithTyping(container, fullText, onComplete) {
+function appendAssistantBubble(container) {
   const div = document.createElement('div');
   div.className = 'msg assistant';
   div.innerHTML = '<div class="role">assistant</div><div class="content"></div>';
-  const contentEl = div.querySelector('.content');
   container.appendChild(div);
-  const TYPING_INTERVAL = 25;
-  let index = 0;
-  function tick() {
-    if (index >= fullText.length) {
-      if (onComplete) onComplete();
-      return;
+  return div.querySelector('.content');
+}
+
+// POST to an SSE endpoint and call onEvent(name, data) for each event as it arrives.
+async function streamEvents(path, body, onEvent) {
+  const res = await fetch(`${API_BASE}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok) {
+    const t = await res.text();
+    throw new Error(t || res.statusText);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) >= 0) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let name = 'message';
+      let data = '';
+      block.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) name = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      onEvent(name, data ? JSON.parse(data) : {});
     }
-    index += 1;
-    contentEl.textContent = fullText.slice(0, index);
-    container.scrollTop = container.scrollHeight;
-    setTimeout(tick, TYPING_INTERVAL);
   }
-  setTimeout(tick, TYPING_INTERVAL);
 }
 
 function escapeHtml(s) {
@@ -192,24 +212,33 @@ document.getElementById('chatForm').addEventListener('submit', async (e) => {
   const loadingEl = appendLoadingBubble(container);
 
   try {
-    const data = await api('/api/chat', {
-      method: 'POST',
-      body: JSON.stringify({
-        session_id: currentSessionId,
-        message,
-        use_rag: useRag,
-        file_ids: uploadedFileIds,
-      }),
-    });
-    loadingEl.remove();
-    appendAssistantBubbleWithTyping(container, data.assistant_message || '', () => {
-      loadSessions().then(() => {
-        const activeLi = document.querySelector(`#sessionList li[data-session-id="${currentSessionId}"]`);
-        if (activeLi) {
-          const label = activeLi.querySelector('.session-label');
-          if (label) document.getElementById('sessionTitle').textContent = label.textContent || '未命名会话';
+    let contentEl = null;
+    let text = '';
+    await streamEvents('/api/chat/stream', {
+      session_id: currentSessionId,
+      message,
+      use_rag: useRag,
+      file_ids: uploadedFileIds,
+    }, (name, data) => {
+      if (name === 'token') {
+        if (!contentEl) {
+          loadingEl.remove();
+          contentEl = appendAssistantBubble(container);
         }
-      });
+        text += data.delta;
+        contentEl.textContent = text;
+        container.scrollTop = container.scrollHeight;
+      } else if (name === 'error') {
+        throw new Error(data.detail || 'stream error');
+      }
+    });
+    if (!contentEl) loadingEl.remove();
+    loadSessions().then(() => {
+      const activeLi = document.querySelector(`#sessionList li[data-session-id="${currentSessionId}"]`);
+      if (activeLi) {
+        const label = activeLi.querySelector('.session-label');
+        if (label) document.getElementById('sessionTitle').textContent = label.textContent || '未命名会话';
+      }
     });
   } catch (err) {
     loadingEl.remove();
@@ -229,16 +258,36 @@ document.getElementById('fileInput').addEventListener('change', async (e) => {
   status.textContent = '上传中...';
   const form = new FormData();
   form.append('file', file);
+  if (currentSessionId) form.append('session_id', currentSessionId);
   try {
     const res = await fetch(`${API_BASE}/api/files`, { method: 'POST', body: form });
     if (!res.ok) throw new Error(await res.text());
     const data = await res.json();
     uploadedFileIds.push(data.file_id);
-    status.textContent = `已上传: ${data.filename}`;
+    status.textContent = `已上传，索引中: ${data.filename}`;
+    const info = await waitForIndexing(data.file_id);
+    if (info.status === 'indexed') {
+      status.textContent = `已索引: ${info.filename}`;
+    } else if (info.status === 'uploaded') {
+      status.textContent = `已上传（未索引）: ${info.filename}`;
+    } else {
+      status.textContent = `索引失败: ${info.filename}${info.error ? '（' + info.error + '）' : ''}`;
+    }
   } catch (err) {
     status.textContent = '上传失败: ' + err.message;
   }
   e.target.value = '';
 });
 
+async function waitForIndexing(fileId) {
+  for (;;) {
+    const res = await fetch(`${API_BASE}/api/files/${encodeURIComponent(fileId)}`);
+    if (!res.ok) throw new Error(await res.text());
+    const info = await res.json();
+    // "uploaded" is the legacy state of files stored before the job queue: nothing is pending.
+    if (['indexed', 'failed', 'uploaded'].includes(info.status)) return info;
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+}
+
 loadSessions();
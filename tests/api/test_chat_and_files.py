@@ -1,9 +1,16 @@
 """Chat/files API behavior tests."""
+import hashlib
+import json
 import uuid
+from pathlib import Path
 
 from fastapi.testclient import TestClient
 
+from backend.app.core.config import UPLOADS_DIR
+from backend.app.core.llm_client import MockLLMClient, set_llm_client
+from backend.app.db import repo
 from backend.app.main import app
+from backend.app.services import index_service
 
 client = TestClient(app)
 
@@ -27,16 +34,114 @@ def test_upload_rejects_unsupported_extension():
     assert "Unsupported file type" in r.json()["detail"]
 
 
-def test_upload_returns_uploaded_when_indexing_fails(monkeypatch):
+def test_upload_queues_indexing_and_reports_status(monkeypatch):
     def _boom(*args, **kwargs):
         raise RuntimeError("index fail")
 
-    monkeypatch.setattr("backend.app.api.routes_files.rag_service.index_file", _boom)
+    monkeypatch.setattr("backend.app.services.index_service.rag_service.index_file", _boom)
+    monkeypatch.setattr("backend.app.services.index_service.INDEX_MAX_ATTEMPTS", 1)
     r = client.post(
         "/api/files",
         files={"file": ("note.txt", b"hello world", "text/plain")},
     )
     assert r.status_code == 200
     body = r.json()
-    assert body["status"] == "uploaded"
-    assert body["indexed"] is False
+    assert body["status"] == "queued"
+    assert body["job_id"]
+
+    assert client.get(f"/api/files/{body['file_id']}").json()["status"] == "queued"
+    while index_service.process_next_job():
+        pass
+    status = client.get(f"/api/files/{body['file_id']}").json()
+    assert status["status"] == "failed"
+    assert status["error"] == "index fail"
+
+
+def test_upload_streams_to_disk_with_sha256(monkeypatch):
+    monkeypatch.setattr("backend.app.api.routes_files.UPLOAD_BLOCK_SIZE", 4)
+    data = b"streamed upload body"
+    r = client.post("/api/files", files={"file": ("big.txt", data, "text/plain")})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["size_bytes"] == len(data)
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+    rec = repo.get_file(body["file_id"])
+    assert Path(rec["path"]).read_bytes() == data
+    assert rec["content_hash"] == body["sha256"]
+
+
+def test_upload_rejected_once_over_limit_leaves_no_file(monkeypatch):
+    monkeypatch.setattr("backend.app.api.routes_files.UPLOAD_BLOCK_SIZE", 4)
+    monkeypatch.setattr("backend.app.api.routes_files.MAX_BYTES", 10)
+    before = set(UPLOADS_DIR.iterdir()) if UPLOADS_DIR.exists() else set()
+    r = client.post("/api/files", files={"file": ("big.txt", b"x" * 64, "text/plain")})
+    assert r.status_code == 400
+    assert "File too large" in r.json()["detail"]
+    assert set(UPLOADS_DIR.iterdir()) == before
+
+
+def test_upload_rejected_by_content_length_before_body_is_read(monkeypatch):
+    monkeypatch.setattr("backend.app.api.routes_files.MAX_BYTES", 10)
+    saved = []
+    monkeypatch.setattr("backend.app.api.routes_files._save_upload", lambda *a: saved.append(a))
+    r = client.post("/api/files", files={"file": ("big.txt", b"x" * 128 * 1024, "text/plain")})
+    assert r.status_code == 400
+    assert "File too large" in r.json()["detail"]
+    assert saved == []
+
+
+def test_upload_to_unknown_session_is_rejected():
+    r = client.post(
+        "/api/files",
+        data={"session_id": str(uuid.uuid4())},
+        files={"file": ("note.txt", b"hello", "text/plain")},
+    )
+    assert r.status_code == 404
+
+
+def test_file_status_unknown_file():
+    r = client.get(f"/api/files/{uuid.uuid4()}")
+    assert r.status_code == 404
+
+
+def _sse_events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_chat_stream_emits_tokens_then_citations_and_usage():
+    sid = client.post("/api/sessions", json={}).json()["session_id"]
+    set_llm_client(MockLLMClient(fixed_response="Streamed test reply.", prompt_tokens=7, completion_tokens=3))
+    r = client.post("/api/chat/stream", json={"session_id": sid, "message": "hello"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(r.text)
+    names = [e for e, _ in events]
+    assert names[-2:] == ["citations", "done"]
+    assert set(names[:-2]) == {"token"} and len(names) > 3
+    assert "".join(d["delta"] for e, d in events if e == "token") == "Streamed test reply."
+    assert events[-1][1]["token_usage"] == {"prompt": 7, "completion": 3, "cached": 0}
+    history = client.get(f"/api/history?session_id={sid}").json()["items"]
+    assert [m["role"] for m in history] == ["user", "assistant"]
+    assert history[-1]["content"] == "Streamed test reply."
+
+
+def test_chat_stream_requires_existing_session():
+    r = client.post("/api/chat/stream", json={"session_id": str(uuid.uuid4()), "message": "hi"})
+    assert r.status_code == 404
+
+
+def test_chat_reports_server_timing_and_metrics():
+    sid = client.post("/api/sessions", json={}).json()["session_id"]
+    set_llm_client(MockLLMClient(fixed_response="Timed reply."))
+    r = client.post("/api/chat", json={"session_id": sid, "message": "hello"})
+    assert r.status_code == 200
+    stages = {part.split(";")[0] for part in r.headers["Server-Timing"].split(", ")}
+    assert {"chat", "db", "llm"} <= stages
+
+    body = client.get("/metrics").text
+    assert 'chatbox_stage_seconds_count{stage="llm"}' in body
+    assert 'chatbox_db_seconds_count{op="_open_turn"}' in body
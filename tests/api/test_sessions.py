@@ -28,13 +28,24 @@ def test_list_sessions():
     assert isinstance(data["items"], list)
 
 
+def test_list_sessions_cursor():
+    for title in ("p1", "p2"):
+        client.post("/api/sessions", json={"title": title})
+    first = client.get("/api/sessions?limit=1").json()
+    assert len(first["items"]) == 1 and first["next_cursor"]
+    second = client.get(f"/api/sessions?limit=1&cursor={first['next_cursor']}").json()
+    assert second["items"][0]["session_id"] != first["items"][0]["session_id"]
+    assert client.get("/api/sessions?cursor=bogus").status_code == 400
+
+
 def test_get_history():
     r = client.post("/api/sessions", json={})
     assert r.status_code == 200
     sid = r.json()["session_id"]
     r2 = client.get(f"/api/history?session_id={sid}")
     assert r2.status_code == 200
-    assert "items" in r2.json()
+    assert r2.json() == {"items": [], "next_cursor": None, "newest_cursor": None}
+    assert client.get(f"/api/history?session_id={sid}&after=bogus").status_code == 400
 
 
 def test_delete_session():
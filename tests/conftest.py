@@ -10,6 +10,7 @@ import pytest
 _fd, _temp_db = tempfile.mkstemp(suffix=".db")
 os.close(_fd)
 os.environ["DATABASE_URL"] = "sqlite:///" + _temp_db
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="chatbox-data-")
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
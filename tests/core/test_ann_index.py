@@ -0,0 +1,85 @@
+"""IVF ANN index tests."""
+import numpy as np
+import pytest
+
+from backend.app.core.ann_index import IVFIndex
+
+
+def _unit(rng, n, dim=16):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _add(index, file_id, vectors):
+    ids = [f"{file_id}-{i}" for i in range(len(vectors))]
+    index.add(file_id, ids, vectors)
+    return ids
+
+
+def test_untrained_index_is_exact(tmp_path):
+    rng = np.random.default_rng(1)
+    index = IVFIndex(tmp_path, min_train_size=10_000)
+    vecs = _unit(rng, 50)
+    ids = _add(index, "f1", vecs)
+    hits = index.search(vecs[7].tolist(), top_k=3)
+    assert not index.is_trained
+    assert hits[0][0] == ids[7]
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_file_filter_and_remove(tmp_path):
+    rng = np.random.default_rng(2)
+    index = IVFIndex(tmp_path, min_train_size=10_000)
+    a, b = _unit(rng, 20), _unit(rng, 20)
+    _add(index, "a", a)
+    ids_b = _add(index, "b", b)
+    hits = index.search(a[0].tolist(), top_k=5, file_ids=["b"])
+    assert {cid for cid, _ in hits} <= set(ids_b)
+    assert index.covers(["a", "b"], dim=16)
+    index.remove_files(["a"])
+    assert not index.covers(["a"], dim=16)
+    assert len(index) == 20
+    assert not (tmp_path / "segments" / "a.npz").exists()
+
+
+def test_trains_and_probes_with_good_recall(tmp_path):
+    rng = np.random.default_rng(3)
+    index = IVFIndex(tmp_path, nlist=16, nprobe=4, min_train_size=2000)
+    vecs = _unit(rng, 2400)
+    for f in range(4):
+        _add(index, f"f{f}", vecs[f * 600:(f + 1) * 600])
+    assert index.is_trained
+    queries = vecs[rng.choice(len(vecs), 50, replace=False)] + 0.05 * _unit(rng, 50)
+    found = 0
+    for q in queries:
+        exact = set(np.argsort(-(vecs @ (q / np.linalg.norm(q))))[:5])
+        hits = index.search(q.tolist(), top_k=5)
+        found += len(exact & {int(cid.split("-")[0][1:]) * 600 + int(cid.split("-")[1]) for cid, _ in hits})
+    assert found / (5 * len(queries)) > 0.7
+    # Full probe is exact.
+    q = queries[0]
+    exact = np.argsort(-(vecs @ (q / np.linalg.norm(q))))[0]
+    top = index.search(q.tolist(), top_k=1, nprobe=16)[0][0]
+    assert int(top.split("-")[0][1:]) * 600 + int(top.split("-")[1]) == exact
+
+
+def test_persists_and_reloads(tmp_path):
+    rng = np.random.default_rng(4)
+    vecs = _unit(rng, 300)
+    first = IVFIndex(tmp_path, nlist=8, min_train_size=100)
+    ids = _add(first, "f", vecs)
+    second = IVFIndex(tmp_path, nlist=8, min_train_size=100)
+    assert second.is_trained is False  # lazily loaded on first use
+    assert second.covers(["f"], dim=16) and second.is_trained
+    assert second.search(vecs[5].tolist(), top_k=1, nprobe=8)[0][0] == ids[5]
+
+
+def test_rebuild_replaces_contents(tmp_path):
+    rng = np.random.default_rng(5)
+    index = IVFIndex(tmp_path, min_train_size=10_000)
+    _add(index, "old", _unit(rng, 10))
+    count = index.rebuild([("new", ["n0", "n1"], _unit(rng, 2))], nlist=2)
+    assert count == 2
+    assert index.is_trained
+    assert not index.covers(["old"], dim=16)
+    assert {cid for cid, _ in index.search(_unit(rng, 1)[0].tolist(), top_k=5, nprobe=2)} == {"n0", "n1"}
@@ -1,6 +1,6 @@
 """Chunker tests."""
 import pytest
-from backend.app.core.chunker import chunk_text
+from backend.app.core.chunker import chunk_stream, chunk_text, iter_chunks
 
 
 def test_chunk_empty():
@@ -31,3 +31,32 @@ def test_chunk_overlap_behavior():
     assert len(chunks) == 3
     assert chunks[0][-20:] == chunks[1][:20]
     assert chunks[1][-20:] == chunks[2][:20]
+
+
+def test_chunk_stream_matches_chunk_text_across_segments():
+    text = "  " + "".join(f"段落{i}。" * 7 + "\n\n" for i in range(40)) + "  "
+    segments = [text[i:i + 37] for i in range(0, len(text), 37)]
+    assert list(chunk_stream(segments, chunk_size=120, overlap=15)) == chunk_text(text, chunk_size=120, overlap=15)
+
+
+def test_chunks_end_at_sentence_boundaries_with_offsets():
+    text = "今天天气很好。我们去公园散步吧！你觉得怎么样？" * 4
+    chunks = list(iter_chunks([text], chunk_size=30, overlap=10, tolerance=0.3))
+    assert all(c.text.endswith(("。", "！", "？")) for c in chunks)
+    assert all(text[c.start:c.end] == c.text for c in chunks)
+    # The overlap starts at a sentence start rather than mid-sentence.
+    assert chunks[1].text.startswith("今天天气很好。")
+    assert chunks[1].start < chunks[0].end
+
+
+def test_latin_period_needs_following_space():
+    text = "Pi is 3.14159 roughly. Next sentence here."
+    chunks = list(iter_chunks([text], chunk_size=25, overlap=0, tolerance=0.5))
+    assert chunks[0].text == "Pi is 3.14159 roughly."
+
+
+def test_hard_cut_when_no_boundary_within_tolerance():
+    text = "甲" * 50 + "。" + "乙" * 100
+    chunks = list(iter_chunks([text], chunk_size=40, overlap=5, tolerance=0.1))
+    assert len(chunks[0].text) == 40
+    assert chunks[0].text[-5:] == chunks[1].text[:5]
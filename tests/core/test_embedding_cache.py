@@ -0,0 +1,81 @@
+"""Embedding cache tests."""
+import pytest
+
+from backend.app.core.embedding_cache import EmbeddingCache, set_embedding_cache, text_hash
+from backend.app.core.embeddings import BaseEmbedding
+from backend.app.db import repo
+from backend.app.db.database import get_connection
+
+
+class CountingEmbedding(BaseEmbedding):
+    provider = "counting"
+    model = "v1"
+    dim = 2
+
+    def __init__(self):
+        self.calls = []
+
+    def _embed_batch(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+
+@pytest.fixture
+def cache(app_db):
+    c = EmbeddingCache(memory_items=100, max_rows=1000)
+    set_embedding_cache(c)
+    yield c
+    set_embedding_cache(None)
+
+
+def test_repeated_texts_hit_memory_then_sqlite(cache):
+    emb = CountingEmbedding()
+    assert emb.embed_batch(["aa", "bbb", "aa"]) == [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]]
+    assert emb.calls == [["aa", "bbb"]]
+    assert emb.embed("bbb") == [3.0, 0.5]
+    assert cache.memory_hits == 1
+    cache.clear_memory()
+    assert emb.embed("aa") == [2.0, 0.5]
+    assert cache.persistent_hits == 1
+    assert len(emb.calls) == 1
+
+
+def test_namespace_separates_models(cache):
+    first, second = CountingEmbedding(), CountingEmbedding()
+    second.model = "v2"
+    first.embed("same text")
+    second.embed("same text")
+    assert len(second.calls) == 1
+
+
+def test_memory_tier_is_lru_bounded(app_db):
+    c = EmbeddingCache(memory_items=2, persistent=False)
+    c.put_many("ns", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    assert c.get_many("ns", ["a", "b", "c"]) == [None, [2.0], [3.0]]
+    assert c.memory_evictions == 1
+    assert c.stats()["misses"] == 1
+
+
+def test_persistent_tier_evicts_least_recently_used(app_db):
+    before = repo.count_cached_embeddings()
+    c = EmbeddingCache(memory_items=1000, max_rows=before + 10)
+    c.put_many("evict", [f"t{i}" for i in range(20)], [[float(i)] for i in range(20)])
+    assert c.persistent_evictions > 0
+    assert repo.count_cached_embeddings() <= before + 10
+
+
+def test_persistent_hits_refresh_last_used_at_at_most_once_per_interval(app_db):
+    c = EmbeddingCache(memory_items=100, touch_interval=3600)
+    c.put_many("touch", ["old", "new"], [[1.0], [2.0]])
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE embedding_cache SET last_used_at = '2000-01-01' WHERE namespace = 'touch' AND text_hash = ?",
+            (text_hash("old"),),
+        )
+        stamps = dict(conn.execute("SELECT text_hash, last_used_at FROM embedding_cache WHERE namespace = 'touch'"))
+    c.clear_memory()
+    assert c.get_many("touch", ["old", "new"]) == [[1.0], [2.0]]
+    with get_connection() as conn:
+        after = dict(conn.execute("SELECT text_hash, last_used_at FROM embedding_cache WHERE namespace = 'touch'"))
+    assert after[text_hash("old")] > "2000-01-01"
+    assert after[text_hash("new")] == stamps[text_hash("new")]
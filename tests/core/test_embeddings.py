@@ -0,0 +1,72 @@
+"""Embedding client tests against a local stub Gemini server."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.app.core.embeddings import GeminiEmbedding
+
+
+class _StubGemini(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    requests: list = []
+    peers: set = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append((self.path, body))
+        type(self).peers.add(self.client_address)
+        texts = [r["content"]["parts"][0]["text"] for r in body["requests"]]
+        out = json.dumps({"embeddings": [{"values": [float(len(t)), 1.0]} for t in texts]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    _StubGemini.requests = []
+    _StubGemini.peers = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGemini)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1beta"
+    server.shutdown()
+    server.server_close()
+
+
+def test_embed_batch_uses_batch_endpoint_in_order(stub_server):
+    emb = GeminiEmbedding(api_key="k", model="m", base_url=stub_server, batch_size=3, concurrency=2)
+    texts = ["a" * n for n in range(1, 11)]
+    vecs = emb.embed_batch(texts)
+    emb.close()
+    assert [v[0] for v in vecs] == [float(n) for n in range(1, 11)]
+    assert len(_StubGemini.requests) == 4
+    path, body = _StubGemini.requests[0]
+    assert path.startswith("/v1beta/models/m:batchEmbedContents?key=k")
+    assert body["requests"][0]["model"] == "models/m"
+    # Pooled keep-alive client: no more connections than the concurrency limit.
+    assert len(_StubGemini.peers) <= 2
+
+
+def test_embed_single_text(stub_server):
+    emb = GeminiEmbedding(api_key="k", model="m", base_url=stub_server)
+    assert emb.embed("hello") == [5.0, 1.0]
+    assert emb.embed_batch([]) == []
+    emb.close()
+
+
+async def test_aembed_batch_matches_sync_order(stub_server):
+    emb = GeminiEmbedding(api_key="k", model="m", base_url=stub_server, batch_size=3, concurrency=2)
+    texts = ["b" * n for n in range(1, 8)]  # not cached by the sync tests above
+    vecs = await emb.aembed_batch(texts)
+    assert [v[0] for v in vecs] == [float(n) for n in range(1, 8)]
+    assert len(_StubGemini.requests) == 3
+    assert await emb.aembed("hoy") == [3.0, 1.0]
+    emb.close()
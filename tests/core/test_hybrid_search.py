@@ -0,0 +1,19 @@
+"""FTS query building and rank fusion."""
+from backend.app.core.hybrid_search import fts_query, reciprocal_rank_fusion
+
+
+def test_fts_query_quotes_words_and_splits_cjk_into_trigrams():
+    assert fts_query('Error ERR-4021 "x"') == '"error" OR "err-4021"'
+    assert fts_query("退款政策") == '"退款政" OR "款政策"'
+
+
+def test_fts_query_without_searchable_terms():
+    assert fts_query("年假 is ok") is None
+    assert fts_query("") is None
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+    assert fused[0] == "c"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused.index("a") < fused.index("d")
@@ -0,0 +1,134 @@
+"""LLM client helpers and provider request/usage handling (local stub server)."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.app.core.llm_deepseek import DeepSeekLLMClient
+from backend.app.core.llm_gemini import GeminiLLMClient
+from backend.app.core.llm_client import (
+    BaseLLMClient,
+    LLMResponse,
+    MockLLMClient,
+    aiter_sse_json,
+    iter_sse_json,
+)
+
+
+def test_iter_sse_json_stops_at_done():
+    lines = ['data: {"a": 1}', "", ": keep-alive", 'data: {"a": 2}', "data: [DONE]", 'data: {"a": 3}']
+    assert list(iter_sse_json(lines)) == [{"a": 1}, {"a": 2}]
+
+
+def test_default_stream_wraps_complete():
+    class OneShot(BaseLLMClient):
+        def complete(self, prompt):
+            return LLMResponse(content="whole", prompt_tokens=2, completion_tokens=1, cached_tokens=1)
+
+    chunks = list(OneShot().stream("p"))
+    assert [(c.delta, c.prompt_tokens, c.completion_tokens, c.cached_tokens) for c in chunks] == [("whole", 2, 1, 1)]
+    chunks = list(OneShot().chat_stream([{"role": "user", "content": "p"}]))
+    assert chunks[-1].cached_tokens == 1
+
+
+def test_mock_stream_reports_usage_last():
+    chunks = list(MockLLMClient(fixed_response="a b c", prompt_tokens=4, completion_tokens=2).stream("p"))
+    assert "".join(c.delta for c in chunks) == "a b c"
+    assert (chunks[-1].prompt_tokens, chunks[-1].completion_tokens) == (4, 2)
+
+
+async def test_default_async_methods_wrap_sync():
+    class OneShot(BaseLLMClient):
+        def complete(self, prompt):
+            return LLMResponse(content="whole", prompt_tokens=2, completion_tokens=1, cached_tokens=1)
+
+    resp = await OneShot().acomplete("p")
+    assert resp.content == "whole"
+    chunks = [c async for c in OneShot().astream("p")]
+    assert [c.delta for c in chunks] == ["whole"]
+    chunks = [c async for c in OneShot().achat_stream([{"role": "user", "content": "p"}])]
+    assert (chunks[-1].prompt_tokens, chunks[-1].cached_tokens) == (2, 1)
+
+
+async def test_aiter_sse_json_stops_at_done():
+    async def lines():
+        for line in ['data: {"a": 1}', "", 'data: [DONE]', 'data: {"a": 2}']:
+            yield line
+
+    assert [obj async for obj in aiter_sse_json(lines())] == [{"a": 1}]
+
+
+class _StubProvider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    bodies: list = []
+    reply: dict = {}
+
+    def do_POST(self):
+        type(self).bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        out = json.dumps(type(self).reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_provider():
+    _StubProvider.bodies = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubProvider)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+MESSAGES = [
+    {"role": "system", "content": "sys"},
+    {"role": "user", "content": "q1"},
+    {"role": "assistant", "content": "a1"},
+    {"role": "user", "content": "q2"},
+]
+
+
+def test_deepseek_sends_role_tagged_messages_and_reports_cache_hits(stub_provider):
+    _StubProvider.reply = {
+        "choices": [{"message": {"content": "ok"}}],
+        "usage": {"prompt_tokens": 40, "completion_tokens": 2, "prompt_cache_hit_tokens": 32},
+    }
+    client = DeepSeekLLMClient(api_key="k", model="m")
+    client.base_url = stub_provider
+    resp = client.chat(MESSAGES)
+    assert (resp.content, resp.prompt_tokens, resp.cached_tokens) == ("ok", 40, 32)
+    assert _StubProvider.bodies[0]["messages"] == MESSAGES
+
+
+def test_gemini_uses_system_instruction_and_model_role(stub_provider):
+    _StubProvider.reply = {
+        "candidates": [{"content": {"parts": [{"text": "ok"}]}}],
+        "usageMetadata": {"promptTokenCount": 40, "candidatesTokenCount": 2, "cachedContentTokenCount": 32},
+    }
+    client = GeminiLLMClient(api_key="k", model="m")
+    client.base_url = stub_provider
+    resp = client.chat(MESSAGES)
+    assert (resp.content, resp.cached_tokens) == ("ok", 32)
+    body = _StubProvider.bodies[0]
+    assert body["systemInstruction"] == {"parts": [{"text": "sys"}]}
+    assert [c["role"] for c in body["contents"]] == ["user", "model", "user"]
+
+
+def test_default_chat_flattens_messages_for_prompt_only_clients():
+    prompts = []
+
+    class PromptOnly(BaseLLMClient):
+        def complete(self, prompt):
+            prompts.append(prompt)
+            return LLMResponse(content="x")
+
+    PromptOnly().chat(MESSAGES)
+    assert prompts == ["sys\n\n【对话历史】\n用户: q1\n助手: a1\n\n【用户最新问题】\nq2"]
@@ -0,0 +1,55 @@
+"""Offline hashed n-gram embedding."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend.app.core import embeddings
+from backend.app.core.embeddings import LocalEmbedding, MockEmbedding, get_embedding, set_embedding
+
+TEXTS = ["员工每年享有十五天带薪年假。", "年假有几天？", "Security training is due in 30 days.", "security training deadline"]
+
+
+def test_similar_texts_score_higher():
+    mat = LocalEmbedding(dim=256).embed_matrix(TEXTS)
+    assert mat.shape == (4, 256)
+    assert np.allclose(np.linalg.norm(mat, axis=1), 1.0, atol=1e-5)
+    sims = mat @ mat.T
+    assert sims[0, 1] > sims[0, 2] and sims[0, 1] > sims[0, 3]
+    assert sims[2, 3] > sims[2, 0] and sims[2, 3] > sims[2, 1]
+
+
+def test_batch_matches_single_texts_and_empty_text_is_zero():
+    emb = LocalEmbedding(dim=64)
+    batch = emb.embed_batch(["", *TEXTS, "x"])
+    assert batch[0] == [0.0] * 64
+    assert batch[1:-1] == [emb.embed(t) for t in TEXTS]
+    assert batch[-1] == emb.embed("X")
+
+
+def test_vectors_are_identical_across_processes():
+    code = (
+        "import json; from backend.app.core.embeddings import LocalEmbedding;"
+        f"print(json.dumps(LocalEmbedding(dim=32).embed_batch({TEXTS!r})))"
+    )
+    env = {**os.environ, "PYTHONHASHSEED": "12345"}
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True,
+        cwd=Path(__file__).resolve().parents[2],
+    )
+    assert json.loads(out.stdout) == LocalEmbedding(dim=32).embed_batch(TEXTS)
+
+
+@pytest.mark.parametrize(
+    ("provider", "key", "expected"),
+    [("local", "k", LocalEmbedding), ("gemini", "", LocalEmbedding), ("mock", "", MockEmbedding)],
+)
+def test_provider_selection(monkeypatch, provider, key, expected):
+    monkeypatch.setattr(embeddings, "EMBEDDING_PROVIDER", provider)
+    monkeypatch.setattr(embeddings, "LLM_API_KEY", key)
+    set_embedding(None)
+    assert type(get_embedding()) is expected
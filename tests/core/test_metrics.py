@@ -0,0 +1,29 @@
+"""Histograms, stage timing and the Server-Timing header value."""
+from backend.app.core import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("test_seconds", "Test.", (0.1, 1.0), ("op",))
+    for value in (0.05, 0.5, 5.0):
+        h.observe(value, "read")
+
+    lines = h.render()
+    assert 'test_seconds_bucket{op="read",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{op="read",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{op="read"} 3' in lines
+    assert h.count("read") == 3 and h.count("write") == 0
+
+
+def test_stages_add_up_per_request():
+    with metrics.request_timings() as timings:
+        with metrics.stage("unit"):
+            pass
+        metrics.add_timing("db", 0.002)
+        metrics.add_timing("db", 0.001)
+    metrics.add_timing("db", 1.0)  # outside any request: ignored
+
+    assert set(timings) == {"unit", "db"}
+    assert abs(timings["db"] - 0.003) < 1e-9
+    assert metrics.server_timing({"db": 0.003, "llm": 0.8405}) == "db;dur=3.0, llm;dur=840.5"
+    assert metrics.STAGE_SECONDS.count("unit") >= 1
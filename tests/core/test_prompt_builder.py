@@ -0,0 +1,73 @@
+"""Prompt builder and token budget tests."""
+from backend.app.core.prompt_builder import (
+    build_budgeted_prompt,
+    build_chat_messages,
+    build_chat_prompt,
+    build_rag_prompt,
+    flatten_messages,
+)
+from backend.app.core.tokens import CJKTokenEstimator, TokenEstimator, count_tokens, set_token_estimator
+
+
+def test_cjk_text_counts_more_tokens_per_char_than_latin():
+    est = CJKTokenEstimator()
+    assert est.count("你好世界") == 4
+    assert est.count("abcdefgh") == 2
+    assert est.count("") == 0
+
+
+def test_estimator_is_pluggable():
+    class WordCount(TokenEstimator):
+        def count(self, text):
+            return len(text.split())
+
+    set_token_estimator(WordCount())
+    try:
+        assert count_tokens("a b c") == 3
+    finally:
+        set_token_estimator(None)
+
+
+def test_within_budget_matches_unbudgeted_prompt():
+    history = [{"role": "user", "content": "第一问"}, {"role": "assistant", "content": "第一答"}]
+    out = build_budgeted_prompt("第二问", history, ["片段A", "片段B"], max_tokens=10_000)
+    assert out.prompt == build_rag_prompt("第二问", ["片段A", "片段B"], history)
+    assert not out.truncated
+    chat = build_budgeted_prompt("第二问", history, max_tokens=10_000)
+    assert chat.prompt == build_chat_prompt("第二问", history)
+
+
+def test_history_is_trimmed_oldest_first():
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"消息{i}" * 20} for i in range(30)]
+    out = build_budgeted_prompt("最新问题", history, max_tokens=400)
+    assert out.tokens <= 400
+    assert 0 < len(out.history_messages) < 30
+    assert out.history_messages == history[-len(out.history_messages):]
+    assert out.dropped_history == 30 - len(out.history_messages)
+    assert "最新问题" in out.prompt
+
+
+def test_context_kept_best_first_and_dropped_chunks_reported():
+    chunks = ["最相关" * 50, "次相关" * 50, "不太相关" * 200]
+    out = build_budgeted_prompt("问题", [], chunks, max_tokens=500)
+    assert out.tokens <= 500
+    assert out.context_indices == [0, 1]
+    assert out.dropped_context == 1
+
+
+def test_context_share_leaves_room_for_history():
+    history = [{"role": "user", "content": "历史" * 30}]
+    chunks = ["内容" * 100] * 5
+    out = build_budgeted_prompt("问题", history, chunks, max_tokens=700, context_share=0.6)
+    assert out.history_messages == history
+    assert out.dropped_context > 0
+    assert out.tokens <= 700
+
+
+def test_messages_keep_a_byte_stable_prefix_across_turns():
+    history = [{"role": "user", "content": "第一问"}, {"role": "assistant", "content": "第一答"}]
+    turn1 = build_chat_messages("第一问", [])
+    turn2 = build_chat_messages("第二问", history)
+    assert turn2[:len(turn1)] == turn1
+    assert turn2[-1] == {"role": "user", "content": "第二问"}
+    assert flatten_messages(turn2) == build_chat_prompt("第二问", history)
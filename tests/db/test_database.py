@@ -0,0 +1,137 @@
+"""Connection pool and schema migration tests."""
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from backend.app.db import repo
+from backend.app.db.database import (
+    ConnectionPool,
+    _add_missing_columns,
+    _create_fts,
+    _normalize_stored_embeddings,
+    get_connection,
+)
+from backend.app.db.models import added_column_backfill_sql
+
+
+def test_pragmas_applied(app_db):
+    with get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_connection_reused_and_nested_blocks_share_it(app_db):
+    with get_connection() as outer:
+        with get_connection() as inner:
+            assert inner is outer
+    with get_connection() as again:
+        assert again is outer
+
+
+def test_error_rolls_back_whole_block(app_db):
+    with pytest.raises(RuntimeError):
+        with get_connection():
+            s = repo.create_session(title="rolled back")
+            raise RuntimeError("boom")
+    assert repo.get_session(s["id"]) is None
+
+
+def test_pool_is_bounded_and_closes(tmp_path):
+    pool = ConnectionPool(tmp_path / "p.db", size=2, timeout=0.05)
+    a, b = pool.acquire(), pool.acquire()
+    with pytest.raises(Exception, match="timed out"):
+        pool.acquire()
+    pool.release(a)
+    assert pool.acquire() is a
+    pool.release(a)
+    pool.release(b)
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_concurrent_writers(app_db):
+    errors = []
+
+    def work():
+        try:
+            for _ in range(20):
+                s = repo.create_session(title="t")
+                repo.add_message(session_id=s["id"], role="user", content="hi")
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def test_missing_columns_are_added_to_old_databases(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.execute(
+        "CREATE TABLE files (id TEXT PRIMARY KEY, session_id TEXT, filename TEXT NOT NULL,"
+        " mime_type TEXT, path TEXT NOT NULL, created_at TEXT NOT NULL)"
+    )
+    _add_missing_columns(conn)
+    _add_missing_columns(conn)  # idempotent
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(files)")}
+    assert {"content_hash", "size_bytes"} <= columns
+    conn.close()
+
+
+def test_session_and_message_columns_are_backfilled(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.executescript(
+        """CREATE TABLE sessions (id TEXT PRIMARY KEY, title TEXT, created_at TEXT, updated_at TEXT);
+        CREATE TABLE messages (id TEXT PRIMARY KEY, session_id TEXT, role TEXT, content TEXT, created_at TEXT);
+        INSERT INTO sessions VALUES ('quiet', '', '2024-01-01', '2024-01-01');
+        INSERT INTO sessions VALUES ('busy', '', '2024-01-02', '2024-01-02');
+        INSERT INTO messages VALUES ('m1', 'busy', 'user', 'hi', '2024-03-01');
+        INSERT INTO messages VALUES ('m2', 'busy', 'assistant', 'hello', '2024-03-02');
+        INSERT INTO messages VALUES ('m0', 'busy', 'user', 'earlier', '2024-02-01');"""
+    )
+    _add_missing_columns(conn)
+    conn.executescript(added_column_backfill_sql())
+    rows = dict(conn.execute("SELECT id, last_message_at FROM sessions").fetchall())
+    assert rows == {"quiet": "2024-01-01", "busy": "2024-03-02"}
+    seqs = dict(conn.execute("SELECT id, seq FROM messages").fetchall())
+    assert seqs == {"m0": 1, "m1": 2, "m2": 3}
+    conn.close()
+
+
+def test_full_text_index_backfills_existing_chunks(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.execute("CREATE TABLE chunks (id TEXT PRIMARY KEY, file_id TEXT, content TEXT NOT NULL)")
+    conn.execute("INSERT INTO chunks VALUES ('c1', 'f1', 'refund policy for ORD-77 orders')")
+    _create_fts(conn)
+    _create_fts(conn)  # idempotent
+    conn.execute("INSERT INTO chunks VALUES ('c2', 'f1', 'shipping times')")
+    matched = conn.execute(
+        "SELECT c.id FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid"
+        " WHERE chunks_fts MATCH '\"ord-77\" OR \"shipping\"' ORDER BY c.id"
+    ).fetchall()
+    assert [r[0] for r in matched] == ["c1", "c2"]
+    conn.close()
+
+
+def test_stored_embeddings_are_normalized_once(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.execute("CREATE TABLE chunks (id TEXT PRIMARY KEY, embedding BLOB)")
+    conn.execute("INSERT INTO chunks VALUES ('c1', ?)", (np.array([3.0, 4.0], dtype=np.float32).tobytes(),))
+    conn.execute("INSERT INTO chunks VALUES ('c2', NULL)")
+    _normalize_stored_embeddings(conn)
+    blob = conn.execute("SELECT embedding FROM chunks WHERE id = 'c1'").fetchone()[0]
+    assert np.frombuffer(blob, dtype=np.float32).tolist() == pytest.approx([0.6, 0.8])
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    # Marked done: rows written afterwards are left as they are.
+    conn.execute("UPDATE chunks SET embedding = ? WHERE id = 'c1'", (np.array([3.0, 4.0], dtype=np.float32).tobytes(),))
+    _normalize_stored_embeddings(conn)
+    blob = conn.execute("SELECT embedding FROM chunks WHERE id = 'c1'").fetchone()[0]
+    assert np.frombuffer(blob, dtype=np.float32).tolist() == [3.0, 4.0]
+    conn.close()
@@ -0,0 +1,25 @@
+"""Chunk persistence tests."""
+import pytest
+
+from backend.app.db import repo
+
+
+def test_add_chunks_streams_in_order(app_db):
+    f = repo.create_file(filename="bulk.txt", path="/tmp/bulk.txt")
+    ids = repo.add_chunks(f["id"], ((f"part {i}", bytes(8)) for i in range(100)))
+    rows = repo.list_chunks_by_file(f["id"])
+    assert [r["id"] for r in rows] == ids
+    assert [r["chunk_index"] for r in rows] == list(range(100))
+    assert rows[42]["content"] == "part 42"
+
+
+def test_add_chunks_is_all_or_nothing(app_db):
+    f = repo.create_file(filename="bad.txt", path="/tmp/bad.txt")
+
+    def chunks():
+        yield "ok", None
+        raise RuntimeError("embedder died")
+
+    with pytest.raises(RuntimeError):
+        repo.add_chunks(f["id"], chunks())
+    assert repo.list_chunks_by_file(f["id"]) == []
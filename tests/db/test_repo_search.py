@@ -0,0 +1,71 @@
+"""Vector search in repo."""
+import numpy as np
+import pytest
+
+from backend.app.core.vector_search import encode_codes, normalize
+from backend.app.db import repo
+from backend.app.db.database import get_connection
+
+
+def _file_with_chunks(vectors: list[list[float]]) -> str:
+    f = repo.create_file(filename="v.txt", path="/tmp/v.txt")
+    for i, vec in enumerate(vectors):
+        repo.add_chunk(file_id=f["id"], chunk_index=i, content=f"chunk {i}", embedding=normalize(vec).tobytes())
+    return f["id"]
+
+
+def test_search_ranks_by_cosine(app_db):
+    fid = _file_with_chunks([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [2.0, 2.0, 0.0], [0.0, 0.0, 5.0]])
+    hits = repo.search_chunks_by_embedding(file_ids=[fid], query_embedding=[1.0, 0.1, 0.0], top_k=2)
+    assert [h["content"] for h in hits] == ["chunk 0", "chunk 2"]
+    assert hits[0]["score"] > hits[1]["score"]
+    assert hits[0]["file_id"] == fid and hits[0]["chunk_index"] == 0
+
+
+def test_search_skips_mismatched_dimensions(app_db):
+    fid = _file_with_chunks([[1.0, 0.0], [1.0, 0.0, 0.0]])
+    hits = repo.search_chunks_by_embedding(file_ids=[fid], query_embedding=[1.0, 0.0, 0.0], top_k=5)
+    assert [h["content"] for h in hits] == ["chunk 1"]
+
+
+def test_search_top_k_larger_than_corpus(app_db):
+    fid = _file_with_chunks([[0.0, 1.0], [1.0, 0.0]])
+    hits = repo.search_chunks_by_embedding(file_ids=[fid], query_embedding=[1.0, 0.0], top_k=10)
+    assert [h["content"] for h in hits] == ["chunk 1", "chunk 0"]
+
+
+def test_full_text_index_follows_inserts_and_deletes(app_db):
+    fid = _file_with_chunks([[1.0, 0.0], [0.0, 1.0]])
+    repo.add_chunk(file_id=fid, chunk_index=2, content="error ERR-4021 on login")
+    hits = repo.search_chunks_fts('"err-4021"', [fid], limit=5)
+    assert [c["content"] for c in repo.get_chunks_by_ids(hits)] == ["error ERR-4021 on login"]
+    assert len(repo.search_chunks_fts('"chunk"', [fid], limit=5)) == 2
+    repo.delete_chunks_by_file(fid)
+    assert repo.search_chunks_fts('"err-4021" OR "chunk"', [fid], limit=5) == []
+
+
+def test_search_restricted_to_chunk_ids(app_db):
+    fid = _file_with_chunks([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]])
+    ids = [c["id"] for c in repo.list_chunks_by_file(fid)]
+    hits = repo.search_chunks_by_embedding(None, [1.0, 0.0], top_k=5, chunk_ids=ids[1:])
+    assert [h["content"] for h in hits] == ["chunk 1", "chunk 2"]
+    assert repo.search_chunks_by_embedding(None, [1.0, 0.0], top_k=5, chunk_ids=[]) == []
+
+
+def test_code_search_rescores_candidates_and_scans_uncoded_files(app_db):
+    coded = _file_with_chunks([[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 1.0]])
+    uncoded = _file_with_chunks([[0.9, 0.1, 0.0]])
+    chunks = repo.list_chunks_by_file(coded)
+    vectors = np.array([[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    repo.add_chunk_codes(coded, [c["id"] for c in chunks], encode_codes(vectors, "int8"))
+
+    hits = repo.search_chunks_by_code([coded, uncoded], [1.0, 0.0, 0.0], top_k=3, codec="int8", candidates=2)
+    assert [(h["file_id"], h["content"]) for h in hits] == [
+        (coded, "chunk 0"), (uncoded, "chunk 0"), (coded, "chunk 1"),
+    ]
+    assert hits[0]["score"] == pytest.approx(1.0) and hits[2]["score"] == pytest.approx(0.6)
+    assert "embedding" not in hits[0]
+
+    repo.delete_chunks_by_file(coded)
+    with get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM chunk_codes WHERE file_id = ?", (coded,)).fetchone()[0] == 0
@@ -1,6 +1,8 @@
 """Chat service tests (mock LLM)."""
 import pytest
 from backend.app.core.llm_client import BaseLLMClient, LLMResponse, set_llm_client
+from backend.app.core.tokens import count_tokens
+from backend.app.db import repo
 from backend.app.services import chat_service
 from backend.app.services import session_service
 
@@ -28,6 +30,18 @@ def test_chat_no_rag(db):
     assert out["citations"] == []
 
 
+def test_user_turn_is_written_atomically(db, monkeypatch):
+    s = session_service.create_session(title="")
+
+    def fail(**kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(repo, "add_message", fail)
+    with pytest.raises(RuntimeError):
+        chat_service.chat(session_id=s["session_id"], message="First question", use_rag=False)
+    assert repo.get_session(s["session_id"])["title"] == ""
+
+
 def test_chat_with_rag_empty_files(db):
     s = session_service.create_session(title="RAG")
     out = chat_service.chat(session_id=s["session_id"], message="Hi", use_rag=True, file_ids=[])
@@ -48,3 +62,48 @@ def test_chat_prompt_includes_recent_history(db):
     assert "用户: 第一问" in latest_prompt
     assert "助手: Captured reply." in latest_prompt
     assert "【用户最新问题】\n第二问" in latest_prompt
+
+
+def test_rag_chat_retrieves_once_per_turn(db, monkeypatch):
+    calls = []
+
+    def fake_retrieve(query, file_ids=None, top_k=None):
+        calls.append(query)
+        return [{"file_id": "f1", "chunk_id": "c1", "content": "参考片段"}]
+
+    monkeypatch.setattr(chat_service.rag_service, "retrieve", fake_retrieve)
+    cap = CaptureLLMClient()
+    set_llm_client(cap)
+    s = session_service.create_session(title="RAG once")
+    out = chat_service.chat(session_id=s["session_id"], message="问题", use_rag=True, file_ids=["f1"])
+    assert calls == ["问题"]
+    assert out["citations"] == [{"file_id": "f1", "chunk_id": "c1"}]
+    assert "参考片段" in cap.prompts[-1]
+
+
+async def test_achat_saves_both_messages(db):
+    s = session_service.create_session(title="Async")
+    out = await chat_service.achat(session_id=s["session_id"], message="Hi", use_rag=False)
+    assert out["assistant_message"] == "Test reply."
+    assert out["token_usage"] == {"prompt": 5, "completion": 3, "cached": 0}
+    roles = [m["role"] for m in session_service.get_history(s["session_id"])["items"]]
+    assert roles == ["user", "assistant"]
+
+
+async def test_achat_stream_yields_tokens_then_done(db):
+    s = session_service.create_session(title="Async stream")
+    events = [e async for e in await chat_service.achat_stream(session_id=s["session_id"], message="Hi")]
+    names = [name for name, _ in events]
+    assert names[-2:] == ["citations", "done"]
+    assert "".join(d["delta"] for name, d in events if name == "token") == "Test reply."
+
+
+def test_prompt_stays_bounded_in_long_sessions(db, monkeypatch):
+    monkeypatch.setattr("backend.app.core.prompt_builder.MAX_PROMPT_TOKENS", 300)
+    cap = CaptureLLMClient()
+    set_llm_client(cap)
+    s = session_service.create_session(title="Long")
+    for i in range(12):
+        chat_service.chat(session_id=s["session_id"], message=f"第{i}个很长的问题" * 10, use_rag=False)
+    assert count_tokens(cap.prompts[-1]) <= 300
+    assert "第11个很长的问题" in cap.prompts[-1]
@@ -0,0 +1,123 @@
+"""Content-addressed uploads: duplicates share chunks; storage is reference-counted."""
+import hashlib
+import uuid
+from pathlib import Path
+
+import pytest
+
+from backend.app.core.ann_index import IVFIndex, set_ann_index
+from backend.app.core.config import UPLOADS_DIR
+from backend.app.db import repo
+from backend.app.services import file_service, index_service, rag_service, session_service
+
+
+@pytest.fixture
+def ann_index(tmp_path):
+    index = IVFIndex(tmp_path / "faiss", min_train_size=10_000)
+    set_ann_index(index)
+    yield index
+    set_ann_index(None)
+
+
+@pytest.fixture
+def content():
+    return f"员工手册 {uuid.uuid4()}\n\n请假需要提前申请。".encode("utf-8")
+
+
+def _upload(content: bytes, session_id: str | None = None) -> dict:
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = UPLOADS_DIR / f"{uuid.uuid4().hex}.part"
+    tmp.write_bytes(content)
+    return file_service.store_upload(
+        tmp,
+        filename="handbook.txt",
+        content_hash=hashlib.sha256(content).hexdigest(),
+        size_bytes=len(content),
+        session_id=session_id,
+    )
+
+
+def _drain():
+    while index_service.process_next_job():
+        pass
+
+
+def test_duplicate_upload_shares_chunks_without_reindexing(app_db, content, monkeypatch):
+    first = _upload(content)
+    _drain()
+    calls = []
+    monkeypatch.setattr(index_service.rag_service, "index_file", lambda **kw: calls.append(kw))
+
+    second = _upload(content)
+    assert second["deduplicated"] is True
+    assert second["job_id"] is None
+    assert second["status"] == "indexed"
+    assert second["file"]["path"] == first["file"]["path"]
+    _drain()
+    assert calls == []
+    assert repo.count_chunks_by_file(second["file"]["id"]) == 0
+
+    hits = rag_service.retrieve("请假", file_ids=[second["file"]["id"]], top_k=1)
+    assert [h["file_id"] for h in hits] == [second["file"]["id"]]
+
+
+def test_deleting_owner_session_transfers_chunks(app_db, content, ann_index):
+    s1 = session_service.create_session(title="one")["session_id"]
+    s2 = session_service.create_session(title="two")["session_id"]
+    first = _upload(content, session_id=s1)
+    _drain()
+    second = _upload(content, session_id=s2)
+    owner_chunks = repo.count_chunks_by_file(first["file"]["id"])
+
+    assert session_service.delete_session(s1)
+    survivor = repo.get_file(second["file"]["id"])
+    assert survivor["chunk_file_id"] is None
+    assert repo.count_chunks_by_file(survivor["id"]) == owner_chunks
+    assert Path(survivor["path"]).exists()
+    assert ann_index.covers([survivor["id"]], dim=8)
+    assert index_service.file_status(survivor["id"])["status"] == "indexed"
+    hits = rag_service.retrieve("请假", file_ids=[survivor["id"]], top_k=1)
+    assert [h["file_id"] for h in hits] == [survivor["id"]]
+
+
+def test_deleting_last_reference_removes_chunks_and_blob(app_db, content):
+    s1 = session_service.create_session(title="one")["session_id"]
+    s2 = session_service.create_session(title="two")["session_id"]
+    first = _upload(content, session_id=s1)
+    _drain()
+    second = _upload(content, session_id=s2)
+    path = Path(first["file"]["path"])
+
+    session_service.delete_session(s2)
+    assert path.exists()
+    assert repo.count_chunks_by_file(first["file"]["id"]) > 0
+    session_service.delete_session(s1)
+    assert not path.exists()
+    assert repo.count_chunks_by_file(first["file"]["id"]) == 0
+    assert repo.get_file(second["file"]["id"]) is None
+
+
+def test_failed_original_is_not_shared(app_db, content, monkeypatch):
+    def boom(file_id, file_path):
+        raise RuntimeError("parse error")
+
+    monkeypatch.setattr(index_service.rag_service, "index_file", boom)
+    monkeypatch.setattr(index_service, "INDEX_MAX_ATTEMPTS", 1)
+    _upload(content)
+    _drain()
+    retry = _upload(content)
+    assert retry["deduplicated"] is False
+    assert retry["job_id"] is not None
+
+
+def test_blob_adopted_after_delete_is_not_removed(app_db, content):
+    first = _upload(content)
+    path = Path(first["file"]["path"])
+    orphaned = repo.delete_files([first["file"]["id"]])["orphaned_paths"]
+    assert orphaned == [str(path)]
+
+    # A duplicate upload lands between the row delete and the unlink.
+    second = _upload(content)
+    file_service.remove_blobs(orphaned)
+    assert path.exists()
+    assert repo.get_file(second["file"]["id"])["path"] == str(path)
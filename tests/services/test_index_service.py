@@ -0,0 +1,143 @@
+"""Background indexing job queue."""
+import time
+
+import pytest
+
+from backend.app.core.embeddings import MockEmbedding, set_embedding
+from backend.app.db import repo
+from backend.app.services import index_service, rag_service
+
+
+@pytest.fixture
+def txt_file(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("第一段内容。\n\n第二段内容。", encoding="utf-8")
+    return repo.create_file(filename="doc.txt", path=str(path))
+
+
+def _drain():
+    while index_service.process_next_job():
+        pass
+
+
+def test_job_indexes_file(app_db, txt_file):
+    job = index_service.enqueue(txt_file["id"])
+    assert job["status"] == "queued"
+    _drain()
+    status = index_service.file_status(txt_file["id"])
+    assert status["status"] == "indexed"
+    assert status["attempts"] == 1
+    assert status["chunks"] == repo.count_chunks_by_file(txt_file["id"]) > 0
+
+
+def test_failed_attempt_is_retried_with_backoff(app_db, txt_file, monkeypatch):
+    real_index_file = index_service.rag_service.index_file
+    calls = []
+
+    def flaky(file_id, file_path):
+        calls.append(file_id)
+        if len(calls) == 1:
+            raise RuntimeError("provider down")
+        real_index_file(file_id=file_id, file_path=file_path)
+
+    monkeypatch.setattr(index_service.rag_service, "index_file", flaky)
+    monkeypatch.setattr(index_service, "INDEX_RETRY_BASE_SECONDS", 3600)
+    index_service.enqueue(txt_file["id"])
+    _drain()
+    job = repo.get_latest_index_job(txt_file["id"])
+    assert (job["status"], job["attempts"], job["last_error"]) == ("queued", 1, "provider down")
+    assert job["run_after"] > job["updated_at"]  # not due yet
+
+    monkeypatch.setattr(index_service, "INDEX_RETRY_BASE_SECONDS", 0)
+    repo.finish_index_job(job["id"], "queued", job["last_error"], run_after=job["updated_at"])
+    _drain()
+    assert index_service.file_status(txt_file["id"])["status"] == "indexed"
+
+
+def test_gives_up_after_max_attempts(app_db, txt_file, monkeypatch):
+    def boom(file_id, file_path):
+        raise RuntimeError("bad pdf")
+
+    monkeypatch.setattr(index_service.rag_service, "index_file", boom)
+    monkeypatch.setattr(index_service, "INDEX_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(index_service, "INDEX_MAX_ATTEMPTS", 3)
+    index_service.enqueue(txt_file["id"])
+    _drain()
+    status = index_service.file_status(txt_file["id"])
+    assert (status["status"], status["attempts"], status["error"]) == ("failed", 3, "bad pdf")
+
+
+def test_running_job_with_live_lease_is_not_requeued(app_db, txt_file):
+    index_service.enqueue(txt_file["id"])
+    claimed = repo.claim_index_job()
+    index_service.start_workers(workers=0)  # e.g. a second process starting up
+    job = repo.get_latest_index_job(txt_file["id"])
+    assert (job["status"], job["attempts"]) == ("running", 1)
+    repo.finish_index_job(claimed["id"], "indexed")
+
+
+def test_lease_is_renewed_while_indexing(app_db, txt_file, monkeypatch):
+    index_service.enqueue(txt_file["id"])
+    claimed = repo.claim_index_job()
+    monkeypatch.setattr(index_service, "INDEX_LEASE_SECONDS", 0.03)
+    with index_service._lease(claimed["id"]):
+        time.sleep(0.1)
+    assert repo.get_latest_index_job(txt_file["id"])["updated_at"] > claimed["updated_at"]
+    repo.finish_index_job(claimed["id"], "indexed")
+
+
+def test_interrupted_jobs_are_requeued_on_startup(app_db, txt_file, monkeypatch):
+    index_service.enqueue(txt_file["id"])
+    claimed = repo.claim_index_job()
+    assert claimed["status"] == "running"
+    monkeypatch.setattr(index_service, "INDEX_LEASE_SECONDS", 0)  # the owner stopped renewing
+    index_service.start_workers(workers=0)
+    assert repo.get_latest_index_job(txt_file["id"])["status"] == "queued"
+    _drain()
+    # The rerun replaces, rather than duplicates, any chunks a crashed attempt left behind.
+    index_service.enqueue(txt_file["id"])
+    before = repo.count_chunks_by_file(txt_file["id"])
+    _drain()
+    assert repo.count_chunks_by_file(txt_file["id"]) == before
+
+
+def test_worker_pool_drains_queue(app_db, txt_file):
+    pool = index_service.IndexWorkerPool(workers=2, poll_interval=0.05)
+    pool.start()
+    try:
+        index_service.enqueue(txt_file["id"])
+        pool.notify()
+        for _ in range(100):
+            if index_service.file_status(txt_file["id"])["status"] == "indexed":
+                break
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+    assert index_service.file_status(txt_file["id"])["status"] == "indexed"
+
+
+def test_final_failure_removes_partially_indexed_chunks(app_db, tmp_path, monkeypatch):
+    path = tmp_path / "long.txt"
+    path.write_text("\n\n".join(f"第{i}段。" + "内容" * 390 for i in range(8)), encoding="utf-8")
+    f = repo.create_file(filename="long.txt", path=str(path))
+
+    class FailingOnThirdBatch(MockEmbedding):
+        calls = 0
+
+        def _embed_batch(self, texts):
+            type(self).calls += 1
+            if self.calls == 3:
+                raise RuntimeError("provider down")
+            return super()._embed_batch(texts)
+
+    set_embedding(FailingOnThirdBatch(dim=8))
+    monkeypatch.setattr(index_service.rag_service, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(index_service.rag_service, "EMBEDDING_CONCURRENCY", 1)
+    monkeypatch.setattr(index_service, "INDEX_MAX_ATTEMPTS", 1)
+    index_service.enqueue(f["id"])
+    _drain()
+
+    assert FailingOnThirdBatch.calls == 3
+    assert index_service.file_status(f["id"])["status"] == "failed"
+    assert repo.count_chunks_by_file(f["id"]) == 0
+    assert rag_service.retrieve(query="内容", file_ids=[f["id"]]) == []
@@ -0,0 +1,125 @@
+"""RAG service tests (mock embedding)."""
+import pytest
+
+from backend.app.core.ann_index import IVFIndex, set_ann_index
+from backend.app.db import repo
+from backend.app.db.database import get_connection
+from backend.app.services import rag_service
+
+
+@pytest.fixture
+def ann_index(tmp_path):
+    index = IVFIndex(tmp_path / "faiss", min_train_size=10_000)
+    set_ann_index(index)
+    yield index
+    set_ann_index(None)
+
+
+def _indexed_file(tmp_path, text: str) -> str:
+    path = tmp_path / "doc.txt"
+    path.write_text(text, encoding="utf-8")
+    rec = repo.create_file(filename="doc.txt", path=str(path))
+    rag_service.index_file(file_id=rec["id"], file_path=str(path))
+    return rec["id"]
+
+
+def test_index_file_updates_ann_index(app_db, tmp_path, ann_index):
+    fid = _indexed_file(tmp_path, "alpha " * 400)
+    assert ann_index.covers([fid], dim=8)
+    assert len(ann_index) == len(repo.list_chunks_by_file(fid))
+    hits = rag_service.retrieve(query="alpha", file_ids=[fid], top_k=2)
+    assert len(hits) == 2
+    assert all(h["file_id"] == fid for h in hits)
+
+
+def test_forget_files_falls_back_to_exact_scan(app_db, tmp_path, ann_index):
+    fid = _indexed_file(tmp_path, "beta " * 100)
+    rag_service.forget_files([fid])
+    assert not ann_index.covers([fid], dim=8)
+    hits = rag_service.retrieve(query="beta", file_ids=[fid], top_k=1)
+    assert [h["file_id"] for h in hits] == [fid]
+
+
+def test_rebuild_ann_index_from_sqlite(app_db, tmp_path, ann_index):
+    fid = _indexed_file(tmp_path, "gamma " * 2000)
+    ann_index.remove_files([fid])
+    assert rag_service.rebuild_ann_index() >= 1
+    assert ann_index.covers([fid], dim=8)
+
+
+def test_rebuild_ann_index_does_not_call_the_embedder(app_db, tmp_path, ann_index, monkeypatch):
+    fid = _indexed_file(tmp_path, "delta " * 400)
+    embedder = rag_service.get_embedding()
+    monkeypatch.setattr(embedder, "embed", lambda text: pytest.fail("embedding call during rebuild"))
+    assert rag_service.rebuild_ann_index() >= 1
+    assert ann_index.covers([fid], dim=8)
+
+
+def test_retrieve_results_are_cached_until_file_changes(app_db, tmp_path, ann_index, monkeypatch):
+    fid = _indexed_file(tmp_path, "delta " * 100)
+    calls = []
+    real = rag_service.get_embedding()
+    monkeypatch.setattr(rag_service, "get_embedding", lambda: calls.append(1) or real)
+    first = rag_service.retrieve(query="delta?", file_ids=[fid], top_k=1)
+    assert rag_service.retrieve(query="delta?", file_ids=[fid], top_k=1) == first
+    assert len(calls) == 1
+    rag_service.forget_files([fid])
+    rag_service.retrieve(query="delta?", file_ids=[fid], top_k=1)
+    assert len(calls) == 2
+
+
+def test_hybrid_retrieval_finds_exact_identifiers(app_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_service, "RAG_RETRIEVAL_MODE", "hybrid")
+    text = " ".join(f"Routine note number {i} about the weekly schedule." for i in range(60))
+    text += " Login fails with code ERR-4021 when the token expired."
+    fid = _indexed_file(tmp_path, text)
+    hits = rag_service.retrieve(query="what does ERR-4021 mean", file_ids=[fid], top_k=1)
+    assert "ERR-4021" in hits[0]["content"]
+
+
+def test_fts_prefilter_limits_vector_scan_to_candidates(app_db, tmp_path, monkeypatch):
+    fid = _indexed_file(tmp_path, "omega " * 300 + "sigma " * 300)
+    monkeypatch.setattr(rag_service, "RAG_RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(rag_service, "RAG_FTS_PREFILTER", True)
+    scanned = []
+    real = repo.search_chunks_by_embedding
+    monkeypatch.setattr(
+        repo, "search_chunks_by_embedding", lambda **kw: scanned.append(kw["chunk_ids"]) or real(**kw),
+    )
+    hits = rag_service.retrieve(query="sigma", file_ids=[fid], top_k=1)
+    assert "sigma" in hits[0]["content"]
+    assert scanned and set(scanned[0]) < {c["id"] for c in repo.list_chunks_by_file(fid)}
+
+
+def test_quantized_storage_scans_codes_and_requantizes(app_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_service, "get_ann_index", lambda: None)
+    monkeypatch.setattr(rag_service, "EMBEDDING_STORAGE", "int8")
+    fid = _indexed_file(tmp_path, "kappa " * 400)
+    n = len(repo.list_chunks_by_file(fid))
+
+    def codes() -> int:
+        with get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunk_codes WHERE file_id = ?", (fid,)).fetchone()[0]
+
+    assert n > 1 and codes() == n
+    scanned = []
+    real = repo.search_chunks_by_code
+    monkeypatch.setattr(repo, "search_chunks_by_code", lambda **kw: scanned.append(kw["codec"]) or real(**kw))
+    monkeypatch.setattr(rag_service, "RAG_RETRIEVAL_MODE", "vector")
+    hits = rag_service.retrieve(query="kappa", file_ids=[fid], top_k=2)
+    assert scanned == ["int8"] and len(hits) == 2
+
+    assert rag_service.requantize("float32") == 0 and codes() == 0
+    assert rag_service.requantize("int8") >= n and codes() == n
+
+
+def test_quantized_storage_is_inert_while_ann_answers_queries(app_db, tmp_path, monkeypatch, ann_index):
+    monkeypatch.setattr(rag_service, "EMBEDDING_STORAGE", "int8")
+    monkeypatch.setattr(rag_service, "RAG_RETRIEVAL_MODE", "vector")
+    fid = _indexed_file(tmp_path, "lambda " * 400)
+    with get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM chunk_codes WHERE file_id = ?", (fid,)).fetchone()[0] == 0
+    monkeypatch.setattr(repo, "search_chunks_by_code", lambda **kw: pytest.fail("codes scanned"))
+    assert len(rag_service.retrieve(query="lambda", file_ids=[fid], top_k=2)) == 2
+    with pytest.raises(RuntimeError, match="ANN_ENABLED=0"):
+        rag_service.requantize("int8")
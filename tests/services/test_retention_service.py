@@ -0,0 +1,110 @@
+"""Retention: TTL expiry, orphan sweeping and compaction."""
+import hashlib
+import os
+import time
+import uuid
+
+from backend.app.core.config import UPLOADS_DIR
+from backend.app.core.embeddings import embedding_to_bytes
+from backend.app.db import repo
+from backend.app.db.database import get_connection
+from backend.app.services import file_service, index_service, retention_service, session_service
+
+LONG_AGO = "2000-01-01T00:00:00+00:00"
+
+
+def _upload(session_id: str | None = None) -> dict:
+    content = f"retention {uuid.uuid4()}\n\n旧文件内容。".encode("utf-8")
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = UPLOADS_DIR / f"{uuid.uuid4().hex}.part"
+    tmp.write_bytes(content)
+    out = file_service.store_upload(
+        tmp,
+        filename="old.txt",
+        content_hash=hashlib.sha256(content).hexdigest(),
+        size_bytes=len(content),
+        session_id=session_id,
+    )
+    while index_service.process_next_job():
+        pass
+    return out["file"]
+
+
+def _backdate(sql: str, *params) -> None:
+    with get_connection() as conn:
+        conn.execute(sql, params)
+
+
+def _copy_of(file: dict) -> tuple:
+    content = open(file["path"], "rb").read()
+    tmp = UPLOADS_DIR / f"{uuid.uuid4().hex}.part"
+    tmp.write_bytes(content)
+    return tmp, "copy.txt", file["content_hash"], len(content)
+
+
+def test_idle_sessions_expire_and_shared_chunks_survive(app_db):
+    old = session_service.create_session(title="old")["session_id"]
+    fresh = session_service.create_session(title="fresh")["session_id"]
+    original = _upload(old)
+    duplicate = file_service.store_upload(*_copy_of(original), session_id=fresh)["file"]
+    _backdate("UPDATE sessions SET last_message_at = ? WHERE id = ?", LONG_AGO, old)
+
+    assert retention_service.find_garbage(session_ttl_days=1)["idle_sessions"] >= 1
+    report = retention_service.collect_garbage(session_ttl_days=1, batch_size=2)
+
+    assert report["sessions"] >= 1
+    assert repo.get_session(old) is None and repo.get_session(fresh) is not None
+    assert repo.get_file(original["id"]) is None
+    assert repo.count_chunks_by_file(duplicate["id"]) > 0
+    assert os.path.exists(duplicate["path"])
+
+
+def test_expired_unattached_uploads_are_deleted_in_batches(app_db):
+    old = _upload()
+    kept = _upload()
+    assert repo.count_chunks_by_file(old["id"]) > 0
+    _backdate("UPDATE files SET created_at = ? WHERE id = ?", LONG_AGO, old["id"])
+
+    report = retention_service.collect_garbage(file_ttl_days=1, batch_size=1)
+
+    assert report["files"] >= 1
+    assert repo.get_file(old["id"]) is None
+    assert repo.count_chunks_by_file(old["id"]) == 0
+    assert not os.path.exists(old["path"])
+    assert repo.get_file(kept["id"]) is not None
+
+
+def test_orphan_chunks_and_blobs_are_swept(app_db):
+    ghost = str(uuid.uuid4())
+    with get_connection() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        repo.add_chunk(file_id=ghost, chunk_index=0, content="left behind", embedding=embedding_to_bytes([1.0]))
+    finally:
+        with get_connection() as conn:
+            conn.execute("PRAGMA foreign_keys = ON")
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    stale = UPLOADS_DIR / f"{uuid.uuid4().hex}.txt"
+    stale.write_text("nobody points here")
+    old = time.time() - 2 * 86400
+    os.utime(stale, (old, old))
+    in_flight = UPLOADS_DIR / f"{uuid.uuid4().hex}.part"
+    in_flight.write_text("still uploading")
+
+    found = retention_service.find_garbage()
+    assert found["orphan_chunk_files"] >= 1 and found["orphan_blobs"] >= 1
+
+    report = retention_service.collect_garbage()
+    assert report["chunks"] >= 1 and report["blobs"] >= 1
+    assert repo.count_chunks_by_file(ghost) == 0
+    assert not stale.exists()
+    assert in_flight.exists()
+    in_flight.unlink()
+
+
+def test_compact_releases_free_pages(app_db):
+    f = repo.create_file(filename="big.txt", path="/tmp/big.txt")
+    repo.add_chunks(f["id"], (("x" * 4000, None) for _ in range(300)))
+    repo.delete_files([f["id"]])
+    report = retention_service.compact(vacuum_pages=100_000)
+    assert report["pages_released"] > 0
@@ -20,23 +20,72 @@ def test_create_session(db):
 def test_list_sessions(db):
     session_service.create_session(title="A")
     session_service.create_session(title="B")
-    items = session_service.list_sessions(limit=10)
+    items, _ = session_service.list_sessions(limit=10)
     assert len(items) >= 2
     titles = [s["title"] for s in items]
     assert "A" in titles and "B" in titles
 
 
+def test_list_sessions_pages_by_last_message(db):
+    older = session_service.create_session(title="older")
+    newer = session_service.create_session(title="newer")
+    repo.add_message(session_id=older["session_id"], role="user", content="bump")
+    seen, cursor = [], None
+    while True:
+        items, cursor = session_service.list_sessions(limit=3, cursor=cursor)
+        seen.extend(items)
+        if cursor is None:
+            break
+    ids = [s["session_id"] for s in seen]
+    assert len(ids) == len(set(ids))
+    assert ids[:2] == [older["session_id"], newer["session_id"]]
+    assert [s["last_message_at"] for s in seen] == sorted((s["last_message_at"] for s in seen), reverse=True)
+
+
+def test_list_sessions_rejects_malformed_cursor(db):
+    with pytest.raises(ValueError):
+        session_service.list_sessions(cursor="not-a-cursor")
+
+
 def test_get_history_empty(db):
     s = session_service.create_session(title="H")
-    items = session_service.get_history(session_id=s["session_id"])
-    assert items == []
+    page = session_service.get_history(session_id=s["session_id"])
+    assert page == {"items": [], "next_cursor": None, "newest_cursor": None}
 
 
 def test_get_history_after_messages(db):
     s = session_service.create_session(title="H")
     repo.add_message(session_id=s["session_id"], role="user", content="hi")
     repo.add_message(session_id=s["session_id"], role="assistant", content="hello")
-    items = session_service.get_history(session_id=s["session_id"])
+    items = session_service.get_history(session_id=s["session_id"])["items"]
     assert len(items) == 2
     assert items[0]["role"] == "user" and items[0]["content"] == "hi"
     assert items[1]["role"] == "assistant" and items[1]["content"] == "hello"
+
+
+def test_history_pages_backwards_without_gaps_or_repeats(db):
+    s = session_service.create_session(title="Paged")
+    for i in range(7):  # written within microseconds of each other
+        repo.add_message(session_id=s["session_id"], role="user", content=f"m{i}")
+    seen, cursor = [], None
+    while True:
+        page = session_service.get_history(session_id=s["session_id"], limit=3, cursor=cursor)
+        seen[:0] = [m["content"] for m in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"m{i}" for i in range(7)]
+
+
+def test_history_polls_only_newer_messages(db):
+    s = session_service.create_session(title="Poll")
+    repo.add_message(session_id=s["session_id"], role="user", content="first")
+    newest = session_service.get_history(session_id=s["session_id"])["newest_cursor"]
+    idle = session_service.get_history(session_id=s["session_id"], after=newest)
+    assert idle["items"] == [] and idle["newest_cursor"] == newest
+    repo.add_message(session_id=s["session_id"], role="assistant", content="second")
+    page = session_service.get_history(session_id=s["session_id"], after=newest)
+    assert [m["content"] for m in page["items"]] == ["second"]
+    assert page["newest_cursor"] != newest
+    with pytest.raises(ValueError):
+        session_service.get_history(session_id=s["session_id"], after="bogus")
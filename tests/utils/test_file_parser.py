@@ -0,0 +1,52 @@
+"""File parser tests (txt and locally generated PDFs)."""
+import pytest
+
+from backend.app.utils import file_parser
+from backend.app.utils.file_parser import iter_text_segments, parse_file
+from benchmarks.pdfgen import sample_pages, write_text_pdf
+
+
+def test_txt_segments_concatenate_to_whole_text(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_parser, "TEXT_BLOCK_CHARS", 7)
+    path = tmp_path / "a.txt"
+    path.write_text("第一段。\n\nsecond paragraph!", encoding="utf-8")
+    segments = list(iter_text_segments(path))
+    assert len(segments) > 1
+    assert "".join(segments) == parse_file(path) == "第一段。\n\nsecond paragraph!"
+
+
+def test_pdf_pages_stream_in_order(tmp_path):
+    path = write_text_pdf(tmp_path / "a.pdf", sample_pages(3, lines_per_page=2))
+    pages = list(iter_text_segments(path))
+    assert len(pages) == 3
+    assert pages[0].startswith("Page 0 line 0")
+    assert pages[1].startswith("\n\nPage 1 line 0")
+    assert "".join(pages) == parse_file(path)
+
+
+def test_parallel_extraction_matches_serial(tmp_path, monkeypatch):
+    path = write_text_pdf(tmp_path / "big.pdf", sample_pages(9, lines_per_page=3))
+    monkeypatch.setattr(file_parser, "PDF_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(file_parser, "PDF_PAGES_PER_TASK", 2)
+    serial = list(iter_text_segments(path, workers=1))
+    try:
+        parallel = list(iter_text_segments(path, workers=2))
+        pool = file_parser._pool
+        assert list(iter_text_segments(path, workers=2)) == parallel
+        assert file_parser._pool is pool  # one pool, reused across documents
+    finally:
+        file_parser.shutdown_pool()
+    assert parallel == serial
+
+
+def test_page_range_task_extracts_only_its_pages(tmp_path):
+    path = write_text_pdf(tmp_path / "r.pdf", sample_pages(6, lines_per_page=1))
+    pages = file_parser._extract_pages(str(path), 2, 5)
+    assert [p.split(" line")[0] for p in pages] == ["Page 2", "Page 3", "Page 4"]
+
+
+def test_unsupported_suffix(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_text("x")
+    with pytest.raises(ValueError):
+        parse_file(path)